@@ -1,10 +1,20 @@
+import io
 import os
+import time
 import streamlit as st
 from pathlib import Path
 
-from transcriber import transcribe_audio
-from grammar import correct_grammar
-from summarizer import summarize_text
+import models
+import metrics
+import inference
+import grammar
+from recorder import save_uploaded_audio
+from jobs import get_queue, QueueFullError, QUEUED, RUNNING, FAILED
+from results import get_store
+from memo import get_memo
+from pipeline import apply_edit
+
+POLL_SECONDS = 1.0
 
 # ======================================================
 # ENVIRONMENT DETECTION
@@ -33,11 +43,73 @@ st.set_page_config(
 st.title("🎤 Voice Note Summarizer")
 st.caption("Record / Upload → Transcribe → Correct Grammar → Summarize")
 
+# Models load on first use; start loading them in the background
+# now that the page is up so the first request doesn't wait as long
+if models.PREWARM_MODELS:
+    models.prewarm()
+
+# Prometheus endpoint (only when METRICS_PORT is set)
+metrics.start_http_server()
+
+def _model_status():
+    # The inference server's models when one is configured, else ours
+    if not inference.enabled():
+        return models.load_state(), models.memory_usage(), None
+    try:
+        health = inference.health()
+        return health["models"], health["memory"], f"Served by {inference.INFERENCE_URL}"
+    except Exception as e:
+        return {}, None, f"Inference server unavailable: {e}"
+
+with st.sidebar.expander("Model status"):
+    model_states, memory, server_note = _model_status()
+    if server_note:
+        st.caption(server_note)
+    for name, info in model_states.items():
+        line = f"**{name}**: {info['state']}"
+        if info["load_seconds"] is not None:
+            line += f" ({info['load_seconds']} s)"
+        if info["memory_mb"] is not None:
+            line += f" · {info['memory_mb']:.0f} MB"
+        st.write(line)
+        if info["error"]:
+            st.caption(info["error"])
+    if memory:
+        budget = f" of {memory['budget_mb']:.0f} MB budget" if memory["budget_mb"] else ""
+        st.caption(f"Models: {memory['models_mb']:.0f} MB{budget} · process RSS: {memory['rss_mb']} MB")
+
+with st.sidebar.expander("Job queue"):
+    depth = get_queue().depth()
+    st.write(f"Waiting: {depth['queued']} · Running: {depth['running']}")
+
+# ======================================================
+# SEARCH PAST NOTES
+# ======================================================
+
+with st.sidebar:
+    st.subheader("🔎 Search notes")
+    query = st.text_input("Words in transcript or summary", key="search_query")
+    store = get_store()
+    found = store.search(query, limit=10)
+    if not found:
+        st.caption("No matching notes." if query else "No notes saved yet.")
+    for note in found:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(note["created_at"]))
+        with st.expander(f"{when} · {Path(note['audio_path'] or '').name or note['source']}"):
+            if note.get("snippet"):
+                st.markdown(note["snippet"])
+            st.markdown(f"**Summary:** {note['summary']}")
+            st.markdown(f"**Corrected:** {note['corrected']}")
+            if note["models"]:
+                st.caption(", ".join(f"{k}: {v}" for k, v in note["models"].items()))
+    st.caption(f"{store.count()} notes stored")
+
 # Create folders
 Path("uploads").mkdir(exist_ok=True)
 Path("output").mkdir(exist_ok=True)
 
 audio_path = None
+audio_hash = None
 
 st.markdown("---")
 
@@ -57,8 +129,12 @@ if IS_LOCAL and audiorecorder:
         # Limit to 7 seconds
         recorded_audio = recorded_audio[:7000]
 
-        audio_path = "uploads/recorded_audio.wav"
-        recorded_audio.export(audio_path, format="wav")
+        # Stored under a content-hash name like uploads, so two
+        # sessions recording at once never overwrite each other
+        buffer = io.BytesIO()
+        buffer.name = "recording.wav"
+        recorded_audio.export(buffer, format="wav")
+        audio_path, audio_hash = save_uploaded_audio(buffer)
 
         st.audio(audio_path)
 
@@ -79,46 +155,121 @@ uploaded = st.file_uploader(
 )
 
 if uploaded:
-    audio_path = f"uploads/{uploaded.name}"
-
-    with open(audio_path, "wb") as f:
-        f.write(uploaded.read())
-
-    st.success("File uploaded successfully")
-    st.audio(audio_path)
+    # Save each upload once, not on every rerun
+    saved = st.session_state.get("saved_upload")
+    if saved is None or saved[0] != uploaded.file_id:
+        try:
+            saved = (uploaded.file_id, *save_uploaded_audio(uploaded))
+            st.session_state["saved_upload"] = saved
+        except ValueError as e:
+            saved = None
+            st.error(str(e))
+
+    if saved:
+        _, audio_path, audio_hash = saved
+        st.success("File uploaded successfully")
+        st.audio(audio_path)
 
 # ======================================================
-# 3️⃣ PROCESS AUDIO
+# 3️⃣ PROCESS AUDIO (BACKGROUND JOB)
 # ======================================================
 
+# The pipeline runs on the job queue's worker, not in this script run;
+# the job id lives in the URL so a page refresh picks the job back up
+job_queue = get_queue()
+
 if audio_path:
+    try:
+        st.query_params["job"] = job_queue.submit(audio_path, audio_hash)
+    except QueueFullError as e:
+        st.error(str(e))
+
+job_id = st.query_params.get("job")
+job = job_queue.get(job_id) if job_id else None
+
+if job and job["status"] in (QUEUED, RUNNING):
     st.markdown("---")
-    st.info("Processing audio — please wait (10–30 seconds)...")
+    if job["status"] == QUEUED:
+        st.info(f"Queued — {job['position']} job(s) ahead of yours...")
+    else:
+        st.info(f"Processing audio — {job['stage'] or 'starting'}...")
+    st.progress(job["progress"])
 
-    # Transcription
-    transcript = transcribe_audio(audio_path)
+    time.sleep(POLL_SECONDS)
+    st.rerun()
 
-    # Grammar correction
-    corrected = correct_grammar(transcript)
+elif job and job["status"] == FAILED:
+    st.markdown("---")
+    st.error(f"Processing failed: {job['error']}")
 
-    # Summarization
-    summary = summarize_text(corrected)
+elif job:
+    st.markdown("---")
+    # A hand-edited version of this note, if the user made one
+    edited_key = f"edited_{job['id']}"
+    result = st.session_state.get(edited_key, job["result"])
+    transcript = result["transcript"]
+    corrected = result["corrected"]
+    summary = result["summary"]
 
     # Display results
     st.markdown("### 📝 Transcript")
     st.write(transcript)
 
+    if result["segments"]:
+        with st.expander("Speech segments"):
+            for seg in result["segments"]:
+                tier = f" _({seg['tier']})_" if seg.get("tier") else ""
+                st.write(f"`{seg['start']:.1f}s – {seg['end']:.1f}s` {seg['text']}{tier}")
+
+    with st.expander("✏️ Fix transcript mistakes"):
+        with st.form(f"edit_{job['id']}"):
+            new_transcript = st.text_area("Transcript", transcript, height=200)
+            submitted = st.form_submit_button("Update corrected text and summary")
+        if submitted and new_transcript.strip() and new_transcript.strip() != transcript:
+            with st.spinner("Updating..."):
+                result = apply_edit(result, new_transcript)
+            st.session_state[edited_key] = result
+            get_store().add(audio_path=job["audio_path"], source="edit", **{
+                k: result[k] for k in ("audio_hash", "transcript", "corrected", "summary", "models", "timings")
+            })
+            st.rerun()
+        if result.get("edited"):
+            st.caption(f"Last edit re-corrected {result['changed_sentences']} sentence(s).")
+
+    if result.get("duplicate_of"):
+        st.info("This recording sounds the same as an earlier note, so its results were reused.")
+
     st.markdown("### ✨ Grammar Corrected")
     st.write(corrected)
 
     st.markdown("### 📌 Summary")
     st.write(summary)
 
-    # Save output
-    out_path = f"output/result_{Path(audio_path).stem}.txt"
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write("Transcript:\n" + transcript)
-        f.write("\n\nGrammar Corrected:\n" + corrected)
-        f.write("\n\nSummary:\n" + summary)
-
-    st.success(f"Results saved → {out_path}")
+    with st.expander("⏱️ Timing breakdown"):
+        rows = []
+        for stage, t in result["timings"].items():
+            rows.append({
+                "stage": stage,
+                "wall (s)": t["wall"],
+                "cpu (s)": t["cpu"],
+                "source": "cache" if t.get("cached") else "model",
+            })
+        st.table(rows)
+        st.caption(f"Queued {job['started_at'] - job['created_at']:.1f} s before starting.")
+        totals = metrics.stage_summary()
+        if totals:
+            st.caption("Averages since server start: " + ", ".join(
+                f"{name} {v.get('mean_wall', 0)} s × {v['count']}" for name, v in totals.items()
+            ))
+        skip_rate = grammar.skip_rate()
+        if skip_rate is not None:
+            st.caption(f"Sentences that skipped grammar correction: {skip_rate:.0%}")
+        memo_cache = get_memo()
+        if memo_cache:
+            st.caption("Memo cache hit rate: " + ", ".join(
+                f"{ns} {s['hit_rate']:.0%} ({s['entries']} entries)"
+                for ns, s in memo_cache.stats().items() if s["hit_rate"] is not None
+            ))
+
+    # The job worker already saved the result to the results store
+    st.success("Results saved — search for them in the sidebar.")
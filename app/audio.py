@@ -0,0 +1,210 @@
+# audio.py
+import os
+import tempfile
+import subprocess
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+SAMPLE_RATE = 16000  # what Whisper expects
+SUPPORTED_EXTS = (".wav", ".mp3", ".flac", ".ogg", ".m4a")
+
+# Optional on-disk cache of decoded arrays, keyed by file hash
+AUDIO_CACHE = os.getenv("AUDIO_CACHE", "0") == "1"
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "cache/audio")
+
+# Block size for streaming decode (stream_audio)
+STREAM_BLOCK_S = 10
+
+# ======================================================
+# DECODING
+# ======================================================
+
+def find_audio_files(inputs, exts=SUPPORTED_EXTS) -> list:
+    """
+    Expands files and folders (searched recursively) into a sorted
+    list of audio file paths.
+    """
+    files = []
+    for item in inputs:
+        p = Path(item)
+        if p.is_file():
+            files.append(p)
+        elif p.is_dir():
+            files.extend(f for f in sorted(p.rglob("*")) if f.suffix.lower() in exts)
+    return [str(f) for f in files]
+
+def decode_audio(path: str, sampling_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decodes any ffmpeg-readable file (wav/mp3/flac/ogg/m4a) straight
+    into a mono float32 array at the given sampling rate, without
+    writing an intermediate WAV. Files soundfile reads natively at that
+    rate don't need ffmpeg.
+    """
+    native = _open_native(path, sampling_rate)
+    if native is not None:
+        with native:
+            data = native.read(dtype="float32", always_2d=True)
+        audio = data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+        if audio.size == 0:
+            raise ValueError(f"No audio decoded from {path}")
+        return audio
+
+    cmd = [
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", path,
+        "-ac", "1", "-ar", str(sampling_rate),
+        "-f", "f32le", "pipe:1",
+    ]
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    except FileNotFoundError as e:
+        raise RuntimeError("ffmpeg was not found; it is needed to decode audio files.") from e
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg could not decode {path}: {e.stderr.decode(errors='ignore').strip()}") from e
+
+    audio = np.frombuffer(proc.stdout, dtype=np.float32)
+    if audio.size == 0:
+        raise ValueError(f"No audio decoded from {path}")
+    return audio
+
+def _cache_path(path: str, sampling_rate: int, cache_dir: str) -> str:
+    from cache import hash_file
+
+    return os.path.join(cache_dir, f"{hash_file(path)}_{sampling_rate}.npy")
+
+def load_audio(path: str, sampling_rate: int = SAMPLE_RATE, use_cache: bool = None,
+               cache_dir: str = AUDIO_CACHE_DIR) -> np.ndarray:
+    """
+    Decodes an audio file to a mono float32 array, going through the
+    on-disk array cache when it is enabled (AUDIO_CACHE=1).
+    """
+    use_cache = AUDIO_CACHE if use_cache is None else use_cache
+    if not use_cache:
+        return decode_audio(path, sampling_rate)
+
+    cached = _cache_path(path, sampling_rate, cache_dir)
+    if os.path.exists(cached):
+        try:
+            return np.load(cached)
+        except (OSError, ValueError):
+            pass  # corrupt entry; decode again
+
+    audio = decode_audio(path, sampling_rate)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{cached}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            np.save(f, audio)
+        os.replace(tmp, cached)
+    except OSError as e:
+        print("Audio cache write error:", e)
+    return audio
+
+def _load_one(args):
+    path, sampling_rate, use_cache, cache_dir = args
+    try:
+        return path, load_audio(path, sampling_rate, use_cache, cache_dir), None
+    except Exception as e:
+        return path, None, str(e)
+
+def load_many(paths: list, workers: int = None, sampling_rate: int = SAMPLE_RATE,
+              use_cache: bool = None, cache_dir: str = AUDIO_CACHE_DIR):
+    """
+    Decodes many files across a pool of worker processes.
+    Yields (path, array, error) in input order; array is None and
+    error is set when a file could not be decoded.
+    """
+    jobs = [(p, sampling_rate, use_cache, cache_dir) for p in paths]
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield _load_one(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_load_one, jobs)
+
+def duration_seconds(audio: np.ndarray, sampling_rate: int = SAMPLE_RATE) -> float:
+    return len(audio) / float(sampling_rate)
+
+# ======================================================
+# STREAMING DECODE
+# ======================================================
+
+def file_duration(path: str):
+    """
+    Duration of an audio file in seconds from its header (nothing is
+    decoded), or None if it can't be determined.
+    """
+    try:
+        import soundfile as sf
+        return sf.info(path).duration
+    except Exception:
+        pass
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+           "-of", "default=noprint_wrappers=1:nokey=1", path]
+    try:
+        out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+        return float(out.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+def _open_native(path: str, sampling_rate: int):
+    # Files libsndfile reads natively at the target rate need no ffmpeg
+    # and no resampling; None for everything else
+    try:
+        import soundfile as sf
+        f = sf.SoundFile(path)
+    except (ImportError, RuntimeError):
+        return None
+    if f.samplerate != sampling_rate:
+        f.close()
+        return None
+    return f
+
+def _stream_ffmpeg(path: str, sampling_rate: int, block: int):
+    cmd = [
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", path,
+        "-ac", "1", "-ar", str(sampling_rate),
+        "-f", "f32le", "pipe:1",
+    ]
+    # stderr goes to a file, not a pipe nobody reads while stdout is
+    # drained: a chatty ffmpeg would fill the pipe and block forever
+    stderr = tempfile.TemporaryFile()
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+    except FileNotFoundError as e:
+        stderr.close()
+        raise RuntimeError("ffmpeg was not found; it is needed to decode audio files.") from e
+    try:
+        while True:
+            # Blocks until a full block is read or ffmpeg is done
+            data = proc.stdout.read(block * 4)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+        if proc.wait() != 0:
+            stderr.seek(0)
+            raise RuntimeError(f"ffmpeg could not decode {path}: "
+                               f"{stderr.read().decode(errors='ignore').strip()}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        stderr.close()
+
+def stream_audio(path: str, sampling_rate: int = SAMPLE_RATE, block_s: float = STREAM_BLOCK_S):
+    """
+    Decodes an audio file block by block, yielding mono float32 arrays
+    of block_s seconds (the last one shorter). Memory use does not
+    depend on the length of the recording.
+    """
+    block = int(block_s * sampling_rate)
+    native = _open_native(path, sampling_rate)
+    if native is None:
+        yield from _stream_ffmpeg(path, sampling_rate, block)
+        return
+    with native:
+        for data in native.blocks(blocksize=block, dtype="float32", always_2d=True):
+            yield data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
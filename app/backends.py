@@ -0,0 +1,58 @@
+# backends.py
+import os
+
+# ======================================================
+# INFERENCE BACKEND CONFIG
+# ======================================================
+# Which runtime the seq2seq models (Whisper, T5, DistilBART) run on:
+#   torch - full-precision PyTorch (default)
+#   int8  - PyTorch with dynamic int8 quantization of Linear layers
+#   onnx  - ONNX Runtime via optimum (exported on first load)
+
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+BACKENDS = ("torch", "int8", "onnx")
+
+if INFERENCE_BACKEND not in BACKENDS:
+    raise ValueError(
+        f"INFERENCE_BACKEND must be one of {', '.join(BACKENDS)}, got '{INFERENCE_BACKEND}'"
+    )
+
+def _load_torch(model_id: str, kind: str):
+    from transformers import AutoModelForSeq2SeqLM, AutoModelForSpeechSeq2Seq
+
+    cls = AutoModelForSpeechSeq2Seq if kind == "speech" else AutoModelForSeq2SeqLM
+    return cls.from_pretrained(model_id)
+
+def _load_int8(model_id: str, kind: str):
+    import torch
+
+    model = _load_torch(model_id, kind)
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _load_onnx(model_id: str, kind: str):
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTModelForSpeechSeq2Seq
+    except ImportError as e:
+        raise RuntimeError(
+            "INFERENCE_BACKEND=onnx requires optimum[onnxruntime]. Install it in your environment."
+        ) from e
+
+    cls = ORTModelForSpeechSeq2Seq if kind == "speech" else ORTModelForSeq2SeqLM
+    return cls.from_pretrained(model_id, export=True)
+
+_LOADERS = {"torch": _load_torch, "int8": _load_int8, "onnx": _load_onnx}
+
+def load_model(model_id: str, kind: str = "text"):
+    """
+    Loads a seq2seq model on the configured backend.
+    kind is "speech" for Whisper, "text" for T5 / BART.
+    """
+    return _LOADERS[INFERENCE_BACKEND](model_id, kind)
+
+def pipeline_device():
+    """
+    The device argument for transformers.pipeline: CPU for PyTorch,
+    left to ONNX Runtime otherwise.
+    """
+    return -1 if INFERENCE_BACKEND != "onnx" else None
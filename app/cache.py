@@ -0,0 +1,121 @@
+# cache.py
+import os
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+
+# ======================================================
+# CACHE CONFIG
+# ======================================================
+
+# Lives next to output/ so results survive app restarts
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "cache/results")
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+
+_READ_BLOCK = 1 << 20  # 1 MiB
+
+# ======================================================
+# HASHING
+# ======================================================
+
+def hash_file(path: str) -> str:
+    """
+    SHA-256 of a file's bytes, read in blocks so large audio
+    never sits in memory at once.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def make_key(stage: str, content_hash: str, settings: dict) -> str:
+    """
+    Cache key for one pipeline stage: the stage name, the hash of its
+    input and the model settings that produced the output.
+    """
+    blob = json.dumps(
+        {"stage": stage, "input": content_hash, "settings": settings},
+        sort_keys=True
+    )
+    return f"{stage}-{hash_text(blob)}"
+
+# ======================================================
+# DISK CACHE WITH LRU EVICTION
+# ======================================================
+
+class ResultCache:
+    """
+    Small on-disk key/value store for stage results.
+
+    One JSON file per entry; the file's mtime is the last access
+    time, so the least recently used entries are evicted first once
+    max_entries is exceeded.
+    """
+
+    def __init__(self, root: str = RESULT_CACHE_DIR, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return value
+
+    def set(self, key: str, value) -> None:
+        # Write to a temp file and rename so readers never see half a file
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "value": value}, f)
+            os.replace(tmp, self._path(key))
+        except OSError as e:
+            print("Result cache write error:", e)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".json"):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+        entries.sort()
+        for _, path in entries[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".json"):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
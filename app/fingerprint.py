@@ -0,0 +1,252 @@
+# fingerprint.py
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+import metrics
+from audio import SAMPLE_RATE, STREAM_BLOCK_S, stream_audio, file_duration
+
+# ======================================================
+# FINGERPRINT CONFIG
+# ======================================================
+# The same note re-encoded (wav -> mp3, flac -> wav, re-uploaded from a
+# phone) has a different byte hash but the same sound. Notes are
+# fingerprinted from their decoded 16 kHz audio with spectral-peak
+# landmarks (pairs of peaks hashed by their frequencies and time gap)
+# and indexed, so a re-encoded duplicate is found before ASR runs.
+
+FINGERPRINT_DEDUP = os.getenv("FINGERPRINT_DEDUP", "1") == "1"
+FINGERPRINT_DB = os.getenv("FINGERPRINT_DB", "cache/fingerprints.db")
+
+# Only the start of a note is fingerprinted: enough evidence to tell
+# notes apart, and it keeps both the work and the index size bounded
+MAX_FINGERPRINT_S = 120
+
+N_FFT = 512
+HOP = 256                  # 16 ms frames
+PEAKS_PER_SECOND = 8
+PEAK_NEIGHBORHOOD = (15, 9)  # frequency bins x frames
+PEAK_RANGE = 7.0           # natural-log magnitude below the block's loudest peak
+FAN_OUT = 4                # targets paired with each anchor peak
+MAX_DT = 63                # frames between anchor and target
+
+# A candidate must share this many time-consistent landmarks, and this
+# share of the query's landmarks, and have about the same duration
+MIN_MATCHES = 20
+MIN_MATCH_RATIO = 0.05
+DURATION_TOLERANCE = 0.03
+MAX_QUERY_HASHES = 600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    audio_hash TEXT NOT NULL UNIQUE,
+    duration REAL,
+    landmarks INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS landmarks (
+    hash INTEGER NOT NULL,
+    note_id INTEGER NOT NULL,
+    t INTEGER NOT NULL,
+    PRIMARY KEY (hash, note_id, t)
+) WITHOUT ROWID;
+"""
+
+# ======================================================
+# LANDMARKS
+# ======================================================
+
+def _spectrogram(audio: np.ndarray) -> np.ndarray:
+    if len(audio) < N_FFT:
+        return np.zeros((N_FFT // 2 + 1, 0), dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(audio, N_FFT)[::HOP]
+    spec = np.abs(np.fft.rfft(frames * np.hanning(N_FFT).astype(np.float32), axis=1))
+    return np.log(spec.T + 1e-6).astype(np.float32)
+
+def _peaks(spec: np.ndarray) -> list:
+    """(frame, bin) of local maxima, the strongest PEAKS_PER_SECOND per second."""
+    n_bins, n_frames = spec.shape
+    df, dt = PEAK_NEIGHBORHOOD
+    if n_frames < dt:
+        return []
+    padded = np.pad(spec, ((df // 2, df // 2), (dt // 2, dt // 2)), mode="constant",
+                    constant_values=spec.min())
+    # A 2-D max filter is separable: frequency first, then time
+    local_max = np.lib.stride_tricks.sliding_window_view(padded, df, axis=0).max(axis=-1)
+    local_max = np.lib.stride_tricks.sliding_window_view(local_max, dt, axis=1).max(axis=-1)
+    # Ignore peaks more than ~60 dB below the loudest one, so the codec's
+    # noise floor (float vs 16-bit vs mp3) does not add or remove peaks
+    candidates = (spec == local_max) & (spec > spec.max() - PEAK_RANGE)
+    bins, frames = np.nonzero(candidates)
+    if len(frames) == 0:
+        return []
+    keep = max(1, int(PEAKS_PER_SECOND * n_frames * HOP / SAMPLE_RATE))
+    strongest = np.argsort(spec[bins, frames])[::-1][:keep]
+    return sorted(zip(frames[strongest].tolist(), bins[strongest].tolist()))
+
+def landmarks(audio: np.ndarray, offset: int = 0) -> list:
+    """
+    [(hash, frame), ...] for 16 kHz mono audio: each peak paired with
+    the next FAN_OUT peaks, hashed from both frequencies and the gap.
+    offset (in frames) is added to every frame index.
+    """
+    peaks = _peaks(_spectrogram(audio))
+    out = []
+    for i, (t1, f1) in enumerate(peaks):
+        for t2, f2 in peaks[i + 1:i + 1 + FAN_OUT]:
+            gap = t2 - t1
+            if 0 < gap <= MAX_DT:
+                out.append(((f1 << 15) | (f2 << 6) | gap, t1 + offset))
+    return out
+
+def _fingerprint_blocks(blocks):
+    found, frames_done, total = [], 0, 0
+    limit = MAX_FINGERPRINT_S * SAMPLE_RATE
+    for block in blocks:
+        block = block[:limit - total]
+        found.extend(landmarks(block, offset=frames_done))
+        frames_done += len(block) // HOP
+        total += len(block)
+        if total >= limit:
+            break
+    return found, total
+
+def fingerprint_file(path: str):
+    """
+    Landmarks of the first MAX_FINGERPRINT_S of a file, decoded block
+    by block, and the file's duration (None if unknown).
+    """
+    found, total = _fingerprint_blocks(stream_audio(path, SAMPLE_RATE))
+    duration = file_duration(path)
+    if duration is None and total < MAX_FINGERPRINT_S * SAMPLE_RATE:
+        duration = total / SAMPLE_RATE
+    return found, duration
+
+def fingerprint_audio(audio: np.ndarray):
+    """fingerprint_file for already decoded 16 kHz mono audio."""
+    block = int(STREAM_BLOCK_S * SAMPLE_RATE)
+    found, _ = _fingerprint_blocks(audio[i:i + block] for i in range(0, len(audio), block))
+    return found, len(audio) / SAMPLE_RATE
+
+# ======================================================
+# INDEX
+# ======================================================
+
+class FingerprintIndex:
+    def __init__(self, db_path: str = FINGERPRINT_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def add(self, audio_hash: str, marks: list, duration: float = None) -> None:
+        """Indexes a note's landmarks under its audio (byte) hash."""
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            if conn.execute("SELECT 1 FROM notes WHERE audio_hash = ?", (audio_hash,)).fetchone():
+                conn.execute("COMMIT")
+                return
+            note_id = conn.execute(
+                "INSERT INTO notes (audio_hash, duration, landmarks, created_at) VALUES (?, ?, ?, ?)",
+                (audio_hash, duration, len(marks), time.time())
+            ).lastrowid
+            conn.executemany("INSERT OR IGNORE INTO landmarks (hash, note_id, t) VALUES (?, ?, ?)",
+                             [(h, note_id, t) for h, t in set(marks)])
+            conn.execute("COMMIT")
+
+    def match(self, marks: list, duration: float = None, exclude_hash: str = None):
+        """
+        The audio hash of an indexed note that sounds the same, or None.
+        Candidates are scored by how many query landmarks line up at one
+        consistent time offset; each lookup is an index seek per hash,
+        so cost does not grow with the number of notes.
+        """
+        if not marks:
+            return None
+        step = max(1, len(marks) // MAX_QUERY_HASHES)
+        query = {}
+        for h, t in marks[::step]:
+            query.setdefault(h, []).append(t)
+
+        offsets = {}  # note_id -> {time offset: count}
+        hashes = list(query)
+        with self._connect() as conn:
+            for i in range(0, len(hashes), 500):
+                part = hashes[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT hash, note_id, t FROM landmarks WHERE hash IN ({', '.join('?' * len(part))})",
+                    part
+                )
+                for h, note_id, t in rows:
+                    counts = offsets.setdefault(note_id, {})
+                    for tq in query[h]:
+                        counts[t - tq] = counts.get(t - tq, 0) + 1
+
+            needed = max(MIN_MATCHES, MIN_MATCH_RATIO * sum(len(v) for v in query.values()))
+            scored = sorted(
+                ((max(counts.values()), note_id) for note_id, counts in offsets.items()), reverse=True
+            )
+            for score, note_id in scored:
+                if score < needed:
+                    break
+                audio_hash, known = conn.execute(
+                    "SELECT audio_hash, duration FROM notes WHERE id = ?", (note_id,)
+                ).fetchone()
+                if audio_hash == exclude_hash:
+                    continue
+                if duration and known and abs(known - duration) > DURATION_TOLERANCE * max(known, duration):
+                    continue
+                return audio_hash
+        return None
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """The process-wide fingerprint index, or None when FINGERPRINT_DEDUP=0."""
+    global _index
+    if not FINGERPRINT_DEDUP:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = FingerprintIndex()
+        return _index
+
+def find_duplicate(audio_path: str, audio_hash: str, timings: dict = None, audio: np.ndarray = None):
+    """
+    Fingerprints a file (or audio, its decoded samples, if given),
+    indexes it under audio_hash and returns the audio hash of an
+    earlier note that sounds the same (or None).
+    Never raises: dedup is an optimization.
+    """
+    index = get_index()
+    if index is None:
+        return None
+    try:
+        with metrics.stage("fingerprint", timings):
+            marks, duration = fingerprint_file(audio_path) if audio is None else fingerprint_audio(audio)
+            duplicate = index.match(marks, duration, exclude_hash=audio_hash)
+            index.add(audio_hash, marks, duration)
+    except Exception as e:
+        print("Fingerprint error:", e)
+        return None
+    metrics.inc("vns_fingerprint_lookups_total", result="duplicate" if duplicate else "new")
+    return duplicate
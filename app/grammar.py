@@ -1,29 +1,273 @@
 # grammar.py
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+import os
+import re
 
-print("⏳ Loading Grammar Correction Model (vennify/t5-base-grammar-correction)...")
+import models
+import backends
+import metrics
+import inference
+import memo
+from text_utils import split_sentences, chunk_sentences
 
-tokenizer = AutoTokenizer.from_pretrained("vennify/t5-base-grammar-correction")
-model = AutoModelForSeq2SeqLM.from_pretrained("vennify/t5-base-grammar-correction")
+GRAMMAR_MODEL = os.getenv("GRAMMAR_MODEL", "vennify/t5-base-grammar-correction")
+MAX_LENGTH = 256
 
-def correct_grammar(text: str) -> str:
+# Long transcripts are corrected in sentence-aligned chunks.
+# Bigger batches are faster per chunk but need more memory.
+BATCH_SIZE = int(os.getenv("GRAMMAR_BATCH_SIZE", "8"))
+MAX_CHUNK_TOKENS = int(os.getenv("GRAMMAR_MAX_CHUNK_TOKENS", "128"))
+
+PREFIX = "fix: "
+
+# Sentences that already look well-formed skip the model. Each sentence
+# gets a 0..1 "needs correction" score from cheap checks; only those
+# scoring at least GRAMMAR_SKIP_THRESHOLD go to T5. 0 corrects every
+# sentence, higher values skip more.
+SKIP_THRESHOLD = float(os.getenv("GRAMMAR_SKIP_THRESHOLD", "0.3"))
+
+# Text arriving in pieces (ASR segments) is corrected in runs of whole
+# sentences, each sent once it holds this many sentences for the model
+STREAM_RUN_SENTENCES = int(os.getenv("GRAMMAR_STREAM_RUN_SENTENCES", "24"))
+
+def _load_grammar():
+    from transformers import AutoTokenizer
+
+    print(f"⏳ Loading Grammar Correction Model ({GRAMMAR_MODEL}, {backends.INFERENCE_BACKEND})...")
+    tokenizer = AutoTokenizer.from_pretrained(GRAMMAR_MODEL)
+    model = backends.load_model(GRAMMAR_MODEL, "text")
+    return tokenizer, model
+
+models.register("grammar", _load_grammar)
+
+def model_settings() -> dict:
     """
-    Corrects grammar using a T5 model.
-    Always returns corrected text (never crashes).
+    Everything that changes the corrected text for a given transcript.
+    Used to key cached results.
+    """
+    return {
+        "model": models.model_tag(GRAMMAR_MODEL),
+        "max_length": MAX_LENGTH,
+        "max_chunk_tokens": MAX_CHUNK_TOKENS,
+        "skip_threshold": SKIP_THRESHOLD,
+    }
+
+# ======================================================
+# SKIP HEURISTIC
+# ======================================================
+
+_SUSPECT_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r"\b(\w+) \1\b",                                 # repeated word
+    r"\b(he|she|it) (go|do|have|are|were|don't)\b",   # agreement
+    r"\b(i|you|we|they) (is|was|has|does|doesn't)\b",
+    r"\b(could|should|would|must) of\b",
+    r"\b(dont|cant|wont|didnt|doesnt|isnt|wasnt|im|ive|alot)\b",
+    # "a" before a vowel sound; "a user", "a European", "a one-off" are fine
+    r"\ba (?!u[bcdfgklmnprstvz][aeiou]|eu|onc?e\b)[aeiou]\w",
+    r"\b(um+|uh+|erm|you know)\b",                    # fillers
+)]
+_LOWERCASE_I = re.compile(r"(^|\s)i(\s|'|$)")
+
+def correction_score(sentence: str) -> float:
+    """
+    How likely a sentence needs the grammar model, from 0 (looks
+    clean) to 1. Whisper output is usually capitalized and punctuated,
+    so most sentences score 0.
+    """
+    s = sentence.strip()
+    if not s:
+        return 0.0
+    score = 0.0
+    if not s[0].isupper() and not s[0].isdigit():
+        score += 0.4
+    if s[-1] not in ".!?\"'":
+        score += 0.3
+    if _LOWERCASE_I.search(s):
+        score += 0.4
+    if len(s.split()) > 30 and "," not in s:
+        score += 0.3   # run-on sentence
+    score += 0.5 * sum(1 for p in _SUSPECT_PATTERNS if p.search(s))
+    return min(score, 1.0)
+
+def plan_correction(text: str, tokenizer, max_chunk_tokens: int = MAX_CHUNK_TOKENS,
+                    threshold: float = SKIP_THRESHOLD, known: dict = None) -> list:
+    """
+    Splits text into [(needs_model, text), ...] in order: runs of
+    flagged sentences packed into chunks that fit the model input, and
+    clean sentences passed through as they are. Flagged sentences found
+    in known ({normalized sentence: corrected}) are replaced by their
+    correction instead of going to the model.
+    """
+    def count_tokens(s):
+        return len(tokenizer.encode(s, add_special_tokens=False))
+
+    known = known or {}
+    parts, flagged, n_flagged = [], [], 0
+    for sentence in split_sentences(text):
+        needs = correction_score(sentence) >= threshold
+        n_flagged += needs
+        if needs and memo.normalize(sentence) not in known:
+            flagged.append(sentence)
+            continue
+        parts.extend((True, c) for c in chunk_sentences(flagged, count_tokens, max_chunk_tokens))
+        flagged = []
+        parts.append((False, known[memo.normalize(sentence)] if needs else sentence))
+    parts.extend((True, c) for c in chunk_sentences(flagged, count_tokens, max_chunk_tokens))
+
+    # Sentences on both routes, not chunks, so skip_rate compares like with like
+    metrics.inc("vns_grammar_sentences_total", len(split_sentences(text)) - n_flagged, route="skipped")
+    metrics.inc("vns_grammar_sentences_total", n_flagged, route="model")
+    return parts
+
+def skip_rate():
+    """Share of transcript sentences that skipped the model so far, or None."""
+    counts = metrics.counter_values("vns_grammar_sentences_total")
+    skipped = counts.get((("route", "skipped"),), 0)
+    total = skipped + counts.get((("route", "model"),), 0)
+    return round(skipped / total, 3) if total else None
+
+def split_into_chunks(text: str, tokenizer, max_chunk_tokens: int = MAX_CHUNK_TOKENS) -> list:
+    """
+    Splits text into sentence-aligned chunks that fit the model input.
+    """
+    def count_tokens(s):
+        return len(tokenizer.encode(s, add_special_tokens=False))
+
+    return chunk_sentences(split_sentences(text), count_tokens, max_chunk_tokens)
+
+def correct_chunks(chunks: list, batch_size: int = BATCH_SIZE) -> list:
+    """
+    Corrects a list of chunks in padded batches, one generate call
+    per batch. Returns the corrected chunks in the same order.
     """
+    corrected = []
+    with models.use("grammar") as (tokenizer, model):
+        for i in range(0, len(chunks), batch_size):
+            batch = [PREFIX + c for c in chunks[i:i + batch_size]]
+            inputs = tokenizer(batch, return_tensors="pt", padding=True)
+            output = model.generate(**inputs, max_length=MAX_LENGTH)
+            decoded = [s.strip() for s in tokenizer.batch_decode(output, skip_special_tokens=True)]
+            metrics.tokens(
+                "correct",
+                input_tokens=sum(len(tokenizer.encode(c)) for c in batch),
+                output_tokens=sum(len(tokenizer.encode(c)) for c in decoded),
+            )
+            corrected.extend(decoded)
+    return corrected
+
+def _fallback(text: str) -> str:
+    # simple autocorrect
+    text = text.strip()
+    if not text:
+        return text
+    text = text[0].upper() + text[1:]
+    if text[-1] not in ".!?":
+        text += "."
+    return text
+
+def _memo_settings() -> dict:
+    return {"model": models.model_tag(GRAMMAR_MODEL), "max_length": MAX_LENGTH}
+
+def _remember_sentences(chunks: list, outputs: list) -> None:
+    # A chunk's correction can be split back into its sentences only if
+    # the model kept the sentence count; otherwise nothing is memoized
+    pairs = []
+    for chunk, output in zip(chunks, outputs):
+        sources, fixed = split_sentences(chunk), split_sentences(output)
+        if len(sources) == len(fixed):
+            pairs.extend(zip(sources, fixed))
+    memo.remember("grammar", _memo_settings(), pairs)
+
+def correct_grammar_many(texts: list, batch_size: int = BATCH_SIZE,
+                         max_chunk_tokens: int = MAX_CHUNK_TOKENS) -> list:
+    """
+    Corrects several texts at once: the chunks of all texts share the
+    same padded batches. Each flagged sentence is looked up in the memo
+    cache first, so only sentences not corrected before are packed into
+    chunks for the model. Returns one corrected text per input, in
+    order (never crashes). Runs on the inference server when one is
+    configured.
+    """
+    if inference.enabled():
+        try:
+            return inference.call("correct", texts)
+        except inference.ServerUnavailable as e:
+            print(f"{e}; correcting locally")
+            metrics.fallback("correct", "server_unavailable")
+        except Exception as e:
+            print("Grammar correction error:", e)
+            metrics.fallback("correct", "error")
+            return [_fallback(t or "") for t in texts]
+
     try:
-        inp = "fix: " + text
-        inputs = tokenizer(inp, return_tensors="pt")
-        output = model.generate(**inputs, max_length=256)
-        corrected = tokenizer.decode(output[0], skip_special_tokens=True)
-        return corrected.strip()
+        tokenizer, _ = models.get_model("grammar")
+        flagged = list(dict.fromkeys(
+            s for t in texts for s in split_sentences(t or "") if correction_score(s) >= SKIP_THRESHOLD
+        ))
+        known = memo.lookup("grammar", _memo_settings(), flagged)
+        per_text = [plan_correction(t or "", tokenizer, max_chunk_tokens, known=known) for t in texts]
+        chunks = list(dict.fromkeys(c for parts in per_text for needs, c in parts if needs))
+        outputs = correct_chunks(chunks, batch_size)
+        _remember_sentences(chunks, outputs)
+        corrected = dict(zip(chunks, outputs))
     except Exception as e:
         print("Grammar correction error:", e)
-        # fallback: simple autocorrect
-        text = text.strip()
-        if not text:
-            return text
-        text = text[0].upper() + text[1:]
-        if text[-1] not in ".!?":
-            text += "."
-        return text
+        metrics.fallback("correct", "error")
+        return [_fallback(t or "") for t in texts]
+
+    return [
+        " ".join(corrected[c] if needs else c for needs, c in parts).strip()
+        for parts in per_text
+    ]
+
+def correct_grammar(text: str, batch_size: int = BATCH_SIZE,
+                    max_chunk_tokens: int = MAX_CHUNK_TOKENS) -> str:
+    """
+    Corrects grammar using a T5 model.
+    Always returns corrected text (never crashes).
+    """
+    return correct_grammar_many([text], batch_size, max_chunk_tokens)[0]
+
+def correct_stream(pieces, batch_size: int = BATCH_SIZE, stopwatch=None,
+                   run_sentences: int = STREAM_RUN_SENTENCES):
+    """
+    Corrects text that arrives in pieces (e.g. ASR segments), yielding
+    corrected text in order while later pieces are still coming.
+
+    Pieces are buffered into whole sentences. A run is cut after a
+    sentence that skips the model, where no chunk can continue, and is
+    corrected with correct_grammar_many once it holds run_sentences
+    flagged sentences, so its chunks share batches; joined with spaces,
+    the output matches correct_grammar on the whole text. Only a run
+    of run_sentences flagged sentences with no clean one is cut
+    mid-run. Time spent correcting is added to stopwatch, if given.
+    """
+    stopwatch = stopwatch or metrics.Stopwatch()
+
+    def correct(sentences):
+        if not any(needs for _, needs in sentences):
+            metrics.inc("vns_grammar_sentences_total", len(sentences), route="skipped")
+            return " ".join(s for s, _ in sentences)
+        with stopwatch.timing():
+            return correct_grammar_many([" ".join(s for s, _ in sentences)], batch_size)[0]
+
+    tail, ready = "", []  # unfinished last sentence; (sentence, needs model) not yet corrected
+    for piece in pieces:
+        sentences = split_sentences(f"{tail} {piece or ''}")
+        if not sentences:
+            continue
+        tail = sentences.pop()
+        ready.extend((s, correction_score(s) >= SKIP_THRESHOLD) for s in sentences)
+
+        cut = max((i + 1 for i, (_, needs) in enumerate(ready) if not needs), default=0)
+        flagged = sum(needs for _, needs in ready[:cut])
+        if len(ready) - cut >= run_sentences:
+            cut = len(ready)
+        elif not cut or 0 < flagged < run_sentences:
+            continue
+        yield correct(ready[:cut])
+        ready = ready[cut:]
+
+    if tail:
+        ready.append((tail, correction_score(tail) >= SKIP_THRESHOLD))
+    if ready:
+        yield correct(ready)
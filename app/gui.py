@@ -1,47 +1,48 @@
+import models
+import metrics
 from recorder import record_audio
-from transcriber import transcribe_audio
-from grammar import correct_grammar
-from summarizer import summarize_text
+from pipeline import process_audio
+from results import get_store
 import os
 os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 
-OUTPUT_DIR = "output"
-SUMMARIES_DIR = "summaries"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-os.makedirs(SUMMARIES_DIR, exist_ok=True)
-
 def run_pipeline():
     print("\n============================")
     print("🎤 VOICE NOTE SUMMARIZER APP")
     print("============================")
 
+    # Load models in the background while the user is speaking
+    models.prewarm()
+
     # 1. Record audio
     print("🎙️ Preparing to record... (Speak for 10 seconds)")
-    audio_file = record_audio(duration=10)
-
-
-    # 2. Transcribe
-    text = transcribe_audio(audio_file)
+    audio_file, audio = record_audio(duration=10)
 
-    # 3. Grammar correction
-    corrected = correct_grammar(text)
 
-    # 4. Summarization
-    summary = summarize_text(corrected)
+    # 2-4. Transcribe -> grammar correction -> summarization
+    # (overlapped: correction starts on the first transcribed segments;
+    # the recording is still in memory, so the file isn't read back)
+    result = process_audio(audio_file, audio=audio)
+    text, corrected, summary = result["transcript"], result["corrected"], result["summary"]
+    timings = result["timings"]
 
     # Save outputs
-    out_file = os.path.join(OUTPUT_DIR, "result.txt")
-    sum_file = os.path.join(SUMMARIES_DIR, "summary.txt")
+    store = get_store()
+    store.add(audio_path=audio_file, source="cli", **{
+        k: result[k] for k in ("audio_hash", "transcript", "corrected", "summary", "models", "timings")
+    })
 
-    with open(out_file, "w", encoding="utf-8") as f:
-        f.write("Original:\n" + text + "\n\nCorrected:\n" + corrected)
+    print("\n📝 Transcript:", text)
+    print("✨ Corrected:", corrected)
+    print("📌 Summary:", summary)
 
-    with open(sum_file, "w", encoding="utf-8") as f:
-        f.write(summary)
+    print("\n⏱️ Timing breakdown:")
+    for stage, t in timings.items():
+        cpu = "   n/a" if t["cpu"] is None else f"{t['cpu']:6.2f}"
+        print(f"   {stage:<10} wall {t['wall']:.2f} s   cpu {cpu} s")
 
     print("\n✅ All outputs saved successfully!")
-    print(f"📄 Full text: {out_file}")
-    print(f"📄 Summary: {sum_file}")
+    print(f"🗂️ Results store: {store.db_path}")
 
 if __name__ == "__main__":
     run_pipeline()
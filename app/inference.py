@@ -0,0 +1,84 @@
+# inference.py
+import os
+import json
+import base64
+import socket
+import http.client
+from urllib.parse import urlparse
+
+import numpy as np
+
+# ======================================================
+# INFERENCE SERVER CLIENT
+# ======================================================
+# With INFERENCE_URL set, the stage functions send their model calls
+# to a shared inference server (see inference_server.py) instead of
+# loading the models in this process:
+#   INFERENCE_URL=http://127.0.0.1:8765
+#   INFERENCE_URL=unix:///tmp/voice-note-inference.sock
+
+INFERENCE_URL = os.getenv("INFERENCE_URL", "")
+TIMEOUT_S = float(os.getenv("INFERENCE_TIMEOUT_S", "600"))
+
+class ServerUnavailable(ConnectionError):
+    pass
+
+def enabled() -> bool:
+    return bool(INFERENCE_URL)
+
+def encode_audio(audio: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(audio, dtype=np.float32).tobytes()).decode("ascii")
+
+def decode_audio(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self._socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._socket_path)
+
+def _connection(url: str = None):
+    parsed = urlparse(url or INFERENCE_URL)
+    if parsed.scheme == "unix":
+        return _UnixHTTPConnection(parsed.path, TIMEOUT_S)
+    return http.client.HTTPConnection(parsed.hostname or "127.0.0.1", parsed.port or 80,
+                                      timeout=TIMEOUT_S)
+
+def request(method: str, path: str, body=None, url: str = None):
+    """
+    Sends one JSON request to the server and returns the decoded reply.
+    Raises ServerUnavailable if the server can't be reached and
+    RuntimeError if it reports an error.
+    """
+    conn = _connection(url)
+    try:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        try:
+            conn.request(method, path, body=data, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            reply = json.loads(response.read() or b"{}")
+        except OSError as e:
+            raise ServerUnavailable(f"Inference server at {url or INFERENCE_URL} unreachable: {e}") from e
+    finally:
+        conn.close()
+    if response.status != 200:
+        raise RuntimeError(reply.get("error") or f"Inference server returned {response.status}")
+    return reply
+
+def call(op: str, items: list, **options) -> list:
+    """
+    Runs op ("asr", "correct" or "summarize") on the server for a list
+    of items and returns one result per item. Audio for "asr" is sent
+    as float32 arrays; options (e.g. model, num_beams) go along as is.
+    """
+    if op == "asr":
+        items = [encode_audio(a) for a in items]
+    return request("POST", f"/{op}", {"items": list(items), **options})["results"]
+
+def health(url: str = None) -> dict:
+    return request("GET", "/health", url=url)
@@ -0,0 +1,236 @@
+"""
+Shared local inference server for the voice note pipeline.
+
+    python app/inference_server.py --port 8765
+    python app/inference_server.py --socket /tmp/voice-note-inference.sock
+
+Hosts the ASR, grammar and summarization models once for every entry
+point on the machine. Point the app, the desktop GUI and batch runs at
+it with INFERENCE_URL (http://127.0.0.1:8765 or unix:///tmp/...sock)
+and their stage functions become thin clients.
+
+Requests that arrive within a short window are merged into one
+micro-batch per model (INFERENCE_BATCH_WINDOW_MS, INFERENCE_MAX_BATCH),
+and each caller gets back only its own results.
+
+    POST /asr        {"items": [<base64 float32 16 kHz audio>, ...],
+                      "model": <Whisper tier, optional>, "num_beams": 1}
+    POST /correct    {"items": [text, ...]}
+    POST /summarize  {"items": [text, ...]}
+    GET  /health     model load state and memory
+    ->               {"results": [...]} or {"error": "..."}
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import socketserver
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import inference
+
+# This process runs the models itself
+inference.INFERENCE_URL = ""
+
+import models
+import metrics
+import transcriber
+import grammar
+import summarizer
+
+BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "10"))
+MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "16"))
+
+# ======================================================
+# MICRO-BATCHING
+# ======================================================
+
+class MicroBatcher:
+    """
+    Collects items from concurrent requests and runs them through
+    run_many(items) -> results together. A batch starts with the first
+    waiting request and takes whatever else arrives within window_ms,
+    up to max_batch items. One worker thread per model, so a model
+    never runs two batches at once.
+    """
+
+    def __init__(self, name: str, run_many, window_ms: float = BATCH_WINDOW_MS,
+                 max_batch: int = MAX_BATCH):
+        self.name = name
+        self._run_many = run_many
+        self._window = window_ms / 1000.0
+        self._max_batch = max_batch
+        self._pending = queue.Queue()
+        threading.Thread(target=self._work, name=f"batch-{name}", daemon=True).start()
+
+    def submit(self, items: list) -> list:
+        if not items:
+            return []
+        future = Future()
+        self._pending.put((list(items), future))
+        return future.result()
+
+    def _collect(self) -> list:
+        requests = [self._pending.get()]
+        size = len(requests[0][0])
+        deadline = time.monotonic() + self._window
+        while size < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                req = self._pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            requests.append(req)
+            size += len(req[0])
+        return requests
+
+    def _work(self) -> None:
+        while True:
+            requests = self._collect()
+            flat = [item for items, _ in requests for item in items]
+            metrics.observe("vns_server_batch_items", len(flat), buckets=(1, 2, 4, 8, 16, 32, 64),
+                            model=self.name)
+            try:
+                results = self._run_many(flat)
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+            pos = 0
+            for items, future in requests:
+                future.set_result(results[pos:pos + len(items)])
+                pos += len(items)
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+_batch_settings = {"window_ms": BATCH_WINDOW_MS, "max_batch": MAX_BATCH}
+
+def _asr_runner(model_id: str, num_beams: int):
+    def run(items):
+        return transcriber.recognize([inference.decode_audio(a) for a in items], model_id, num_beams)
+    return run
+
+def _get_batcher(op: str, body: dict):
+    """
+    The batcher for a request, or None for unknown ops. ASR requests
+    are batched per Whisper tier (model and beam count).
+    """
+    if op == "asr":
+        model_id = body.get("model") or transcriber.WHISPER_MODEL
+        num_beams = int(body.get("num_beams") or 1)
+        if model_id != transcriber.WHISPER_MODEL and model_id not in transcriber.TIERS:
+            raise ValueError(f"model '{model_id}' is not one of the configured ASR tiers")
+        key, run = f"asr:{model_id}:{num_beams}", _asr_runner(model_id, num_beams)
+    elif op == "correct":
+        key, run = op, grammar.correct_grammar_many
+    elif op == "summarize":
+        key, run = op, summarizer.summarize_many
+    else:
+        return None
+    with _batchers_lock:
+        if key not in _batchers:
+            _batchers[key] = MicroBatcher(key, run, **_batch_settings)
+        return _batchers[key]
+
+# ======================================================
+# HTTP API
+# ======================================================
+
+class Handler(BaseHTTPRequestHandler):
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, {"models": models.load_state(), "memory": models.memory_usage()})
+        elif self.path == "/metrics":
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._reply(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length))
+            items = body["items"]
+            batcher = _get_batcher(self.path.strip("/"), body)
+        except (ValueError, KeyError, TypeError) as e:
+            self._reply(400, {"error": f"bad request: {e}"})
+            return
+        if batcher is None:
+            self._reply(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            self._reply(200, {"results": batcher.submit(items)})
+        except Exception as e:
+            self._reply(500, {"error": str(e)})
+
+    def log_message(self, *args):
+        pass
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        conn, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return conn, ("unix", 0)
+
+def serve(port: int = 8765, host: str = "127.0.0.1", socket_path: str = None,
+          window_ms: float = BATCH_WINDOW_MS, max_batch: int = MAX_BATCH, prewarm: bool = True):
+    _batch_settings.update(window_ms=window_ms, max_batch=max_batch)
+    if prewarm:
+        models.prewarm()
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, Handler)
+        where = f"unix://{socket_path}"
+    else:
+        server = ThreadingHTTPServer((host, port), Handler)
+        where = f"http://{host}:{server.server_port}"
+    print(f"🚀 Inference server on {where} (window {window_ms} ms, max batch {max_batch})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared inference server for the voice note pipeline")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", help="serve on this Unix socket instead of TCP")
+    parser.add_argument("--window-ms", type=float, default=BATCH_WINDOW_MS,
+                        help="how long a batch waits for more requests")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="items per model call")
+    parser.add_argument("--no-prewarm", action="store_true", help="load models on first request")
+    args = parser.parse_args(argv)
+    serve(args.port, args.host, args.socket, args.window_ms, args.max_batch, not args.no_prewarm)
+
+if __name__ == "__main__":
+    main()
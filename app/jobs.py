@@ -0,0 +1,269 @@
+# jobs.py
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# ======================================================
+# JOB QUEUE CONFIG
+# ======================================================
+# Uploads are processed by worker threads that own the models, not by
+# the Streamlit script run. Jobs live in SQLite so a page refresh (or
+# a server restart) does not lose them.
+
+JOBS_DB = os.getenv("JOBS_DB", "output/jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "20"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+STAGES = ("transcribe", "correct", "summarize")
+
+class QueueFullError(RuntimeError):
+    pass
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    audio_path TEXT NOT NULL,
+    audio_hash TEXT,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    settings_key TEXT,
+    owner TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_hash ON jobs (audio_hash);
+"""
+
+# Columns added after the first release; older databases get them on open
+_ADDED_COLUMNS = (("settings_key", "TEXT"), ("owner", "TEXT"))
+
+# Identifies the process running a job, so a restart only takes back
+# the jobs of processes that are gone
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+def _owner_alive(owner: str) -> bool:
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
+
+def pipeline_settings_key() -> str:
+    """
+    Hash of every model setting that changes a job's result, so audio
+    processed before a model change is processed again.
+    """
+    import transcriber
+    import grammar
+    import summarizer
+
+    settings = {
+        "asr": transcriber.model_settings(),
+        "grammar": grammar.model_settings(),
+        "summarizer": summarizer.model_settings(),
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+class JobQueue:
+    def __init__(self, db_path: str = JOBS_DB, workers: int = JOB_WORKERS,
+                 max_queue: int = JOB_MAX_QUEUE, process=None):
+        """
+        process(audio_path, audio_hash, on_stage) -> dict runs one job;
+        it defaults to the cached pipeline, saving each result to the
+        results store.
+        """
+        self.db_path = db_path
+        self.max_queue = max_queue
+        self._process = process
+        self._wakeup = threading.Condition()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+            for name, kind in _ADDED_COLUMNS:
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+            # Jobs whose process stopped while running them start over;
+            # other live processes sharing the file keep theirs
+            stale = [r["id"] for r in conn.execute("SELECT id, owner FROM jobs WHERE status = ?", (RUNNING,))
+                     if not _owner_alive(r["owner"])]
+            conn.executemany("UPDATE jobs SET status = ?, stage = NULL, progress = 0, owner = NULL "
+                             "WHERE id = ? AND status = ?", [(QUEUED, job_id, RUNNING) for job_id in stale])
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._workers:
+            t.start()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            yield conn
+        finally:
+            conn.close()
+
+    # --------------------------------------------------
+    # CLIENT SIDE
+    # --------------------------------------------------
+
+    def submit(self, audio_path: str, audio_hash: str = None, settings_key: str = None) -> str:
+        """
+        Queues audio for processing and returns the job id. Audio that
+        is already queued, running or done with the same model settings
+        (settings_key, by default pipeline_settings_key() for the
+        default pipeline) is not queued again; the existing job id is
+        returned instead.
+        """
+        if settings_key is None and self._process is None:
+            settings_key = pipeline_settings_key()
+        with self._connect() as conn:
+            if audio_hash:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE audio_hash = ? AND settings_key IS ? AND status != ? "
+                    "ORDER BY created_at DESC LIMIT 1",
+                    (audio_hash, settings_key, FAILED)
+                ).fetchone()
+                if row:
+                    return row["id"]
+
+            depth = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+            if depth >= self.max_queue:
+                raise QueueFullError(f"Job queue is full ({depth} waiting), try again shortly.")
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, audio_path, audio_hash, status, created_at, settings_key) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, audio_path, audio_hash, QUEUED, time.time(), settings_key)
+            )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str):
+        """
+        Job status as a dict (result decoded), with "position" = number
+        of jobs ahead of it while queued. None for unknown ids.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+            job["position"] = 0
+            if job["status"] == QUEUED:
+                job["position"] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?",
+                    (QUEUED, job["created_at"])
+                ).fetchone()[0]
+        return job
+
+    def depth(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs WHERE status IN (?, ?) GROUP BY status",
+                (QUEUED, RUNNING)
+            ).fetchall()
+        counts = {QUEUED: 0, RUNNING: 0}
+        counts.update({r["status"]: r["n"] for r in rows})
+        return counts
+
+    # --------------------------------------------------
+    # WORKER SIDE
+    # --------------------------------------------------
+
+    def _claim(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("UPDATE jobs SET status = ?, started_at = ?, owner = ? WHERE id = ?",
+                         (RUNNING, time.time(), _OWNER, row["id"]))
+            conn.execute("COMMIT")
+            return dict(row)
+
+    def _set_stage(self, job_id: str, stage: str) -> None:
+        progress = STAGES.index(stage) / len(STAGES) if stage in STAGES else 0
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET stage = ?, progress = ? WHERE id = ?",
+                         (stage, progress, job_id))
+
+    def _finish(self, job_id: str, result=None, error: str = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE id = ?",
+                (FAILED if error else DONE, 0 if error else 1,
+                 json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def _run(self, job: dict) -> dict:
+        if self._process is not None:
+            return self._process(job["audio_path"], job["audio_hash"],
+                                 lambda stage: self._set_stage(job["id"], stage))
+        from pipeline import process_audio
+        from results import get_store
+        result = process_audio(job["audio_path"], audio_hash=job["audio_hash"],
+                               on_stage=lambda stage: self._set_stage(job["id"], stage))
+        get_store().add(audio_path=job["audio_path"], source="app", **{
+            k: result[k] for k in ("audio_hash", "transcript", "corrected", "summary", "models", "timings")
+        })
+        return result
+
+    def _work(self) -> None:
+        while True:
+            job = self._claim()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=1.0)
+                continue
+            try:
+                self._finish(job["id"], result=self._run(job))
+            except Exception as e:
+                print(f"Job {job['id']} failed:", e)
+                self._finish(job["id"], error=str(e))
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_queue() -> JobQueue:
+    """
+    The process-wide job queue; its workers start on first use.
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
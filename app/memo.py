@@ -0,0 +1,262 @@
+# memo.py
+import os
+import re
+import json
+import time
+import hashlib
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+# ======================================================
+# MEMO CACHE CONFIG
+# ======================================================
+# Voice notes repeat a lot of phrasing ("remember to...", "don't forget
+# to schedule..."), so model outputs are memoized per sentence
+# (grammar) and per text (summaries), keyed by the normalized input and
+# the model settings. SQLite in WAL mode lets the app, the desktop GUI,
+# batch workers and the inference server share one file.
+
+MEMO_ENABLED = os.getenv("MEMO_CACHE", "1") == "1"
+MEMO_DB = os.getenv("MEMO_DB", "cache/memo.db")
+MEMO_MAX_ENTRIES = int(os.getenv("MEMO_MAX_ENTRIES", "50000"))
+
+# Evict in batches instead of on every insert
+_EVICT_EVERY = 256
+
+# Lookups only read; the last_used times and hit/miss counts they
+# produce are written with the next insert, or after this many seconds
+_FLUSH_EVERY_S = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memo (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS memo_last_used ON memo (last_used);
+CREATE TABLE IF NOT EXISTS memo_stats (
+    namespace TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize(text: str) -> str:
+    """
+    Collapses whitespace. Case and punctuation are kept: they are
+    exactly what the grammar model changes.
+    """
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+def memo_key(namespace: str, settings: dict, text: str) -> str:
+    payload = json.dumps([namespace, settings, normalize(text)], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class MemoCache:
+    def __init__(self, db_path: str = MEMO_DB, max_entries: int = MEMO_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._inserts = 0
+        self._pending_lock = threading.Lock()
+        self._used = {}    # key -> last use, not written yet
+        self._counts = {}  # namespace -> [hits, misses], not written yet
+        self._flushed_at = time.time()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, namespace: str, settings: dict, texts: list) -> dict:
+        """
+        {index: cached output} for the texts that are memoized; hits
+        and misses are counted per namespace. Only reads the file: the
+        bookkeeping is written later (see flush).
+        """
+        keys = [memo_key(namespace, settings, t) for t in texts]
+        found = {}
+        if keys:
+            with self._connect() as conn:
+                unique = list(set(keys))
+                rows = []
+                for i in range(0, len(unique), 500):
+                    part = unique[i:i + 500]
+                    rows += conn.execute(
+                        f"SELECT key, value FROM memo WHERE key IN ({', '.join('?' * len(part))})", part
+                    ).fetchall()
+            values = dict(rows)
+            found = {i: values[k] for i, k in enumerate(keys) if k in values}
+            now = time.time()
+            with self._pending_lock:
+                self._used.update((k, now) for k in values)
+                counts = self._counts.setdefault(namespace, [0, 0])
+                counts[0] += len(found)
+                counts[1] += len(keys) - len(found)
+                due = now - self._flushed_at >= _FLUSH_EVERY_S
+            if due:
+                try:
+                    self.flush()
+                except sqlite3.Error as e:
+                    print("Memo cache error:", e)
+        metrics.inc("vns_memo_lookups_total", len(found), namespace=namespace, result="hit")
+        metrics.inc("vns_memo_lookups_total", len(keys) - len(found), namespace=namespace, result="miss")
+        return found
+
+    def _write_pending(self, conn) -> None:
+        # Inside the caller's transaction
+        with self._pending_lock:
+            used, self._used = self._used, {}
+            counts, self._counts = self._counts, {}
+            self._flushed_at = time.time()
+        if used:
+            conn.executemany("UPDATE memo SET last_used = ? WHERE key = ?",
+                             [(t, k) for k, t in used.items()])
+        if counts:
+            conn.executemany(
+                "INSERT INTO memo_stats (namespace, hits, misses) VALUES (?, ?, ?) "
+                "ON CONFLICT(namespace) DO UPDATE SET hits = hits + excluded.hits, "
+                "misses = misses + excluded.misses",
+                [(ns, hits, misses) for ns, (hits, misses) in counts.items()]
+            )
+
+    def flush(self) -> None:
+        """Writes the last_used times and hit/miss counts of past lookups."""
+        with self._pending_lock:
+            if not self._used and not self._counts:
+                return
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            self._write_pending(conn)
+            conn.execute("COMMIT")
+
+    def set_many(self, namespace: str, settings: dict, pairs) -> None:
+        """Memoizes (input text, output) pairs."""
+        now = time.time()
+        rows = [(memo_key(namespace, settings, text), namespace, value, now)
+                for text, value in pairs if value is not None]
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO memo (key, namespace, value, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._write_pending(conn)
+            conn.execute("COMMIT")
+            self._inserts += len(rows)
+            if self._inserts >= _EVICT_EVERY:
+                self._inserts = 0
+                self._evict(conn)
+
+    def _evict(self, conn) -> None:
+        # Least recently used entries beyond max_entries
+        count = conn.execute("SELECT COUNT(*) FROM memo").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM memo WHERE key IN (SELECT key FROM memo ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def stats(self) -> dict:
+        """
+        {namespace: {"hits", "misses", "hit_rate", "entries"}} across
+        every process sharing the file.
+        """
+        self.flush()
+        with self._connect() as conn:
+            entries = dict(conn.execute("SELECT namespace, COUNT(*) FROM memo GROUP BY namespace"))
+            out = {}
+            for namespace, hits, misses in conn.execute("SELECT namespace, hits, misses FROM memo_stats"):
+                total = hits + misses
+                out[namespace] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / total, 3) if total else None,
+                    "entries": entries.get(namespace, 0),
+                }
+        return out
+
+    def clear(self) -> None:
+        with self._pending_lock:
+            self._used, self._counts = {}, {}
+        with self._connect() as conn:
+            conn.execute("DELETE FROM memo")
+            conn.execute("DELETE FROM memo_stats")
+
+_memo = None
+_memo_lock = threading.Lock()
+
+def get_memo():
+    """The process-wide memo cache, or None when MEMO_CACHE=0."""
+    global _memo
+    if not MEMO_ENABLED:
+        return None
+    with _memo_lock:
+        if _memo is None:
+            _memo = MemoCache()
+            atexit.register(_flush_at_exit, _memo)
+        return _memo
+
+def _flush_at_exit(memo) -> None:
+    try:
+        memo.flush()
+    except sqlite3.Error as e:
+        print("Memo cache error:", e)
+
+def lookup(namespace: str, settings: dict, texts: list) -> dict:
+    """
+    {normalized text: memoized output} for the texts that have one.
+    Empty when the memo is off or unreadable.
+    """
+    memo = get_memo()
+    if memo is None or not texts:
+        return {}
+    try:
+        found = memo.get_many(namespace, settings, texts)
+    except sqlite3.Error as e:
+        print("Memo cache error:", e)
+        return {}
+    return {normalize(texts[i]): value for i, value in found.items()}
+
+def remember(namespace: str, settings: dict, pairs) -> None:
+    """Memoizes (input text, output) pairs; errors are only printed."""
+    memo = get_memo()
+    if memo is None:
+        return
+    try:
+        memo.set_many(namespace, settings, pairs)
+    except sqlite3.Error as e:
+        print("Memo cache error:", e)
+
+def memoized(namespace: str, settings: dict, texts: list, compute) -> list:
+    """
+    compute(texts) -> outputs, run only on the texts that are not
+    memoized yet; their outputs are memoized for next time. Duplicates
+    within texts are computed once. Memo errors never fail the caller.
+    """
+    if get_memo() is None or not texts:
+        return compute(texts)
+    found = lookup(namespace, settings, texts)
+    missing = list(dict.fromkeys(normalize(t) for t in texts if normalize(t) not in found))
+    if missing:
+        first = {}
+        for text in texts:
+            first.setdefault(normalize(text), text)
+        computed = compute([first[n] for n in missing])
+        found.update(zip(missing, computed))
+        remember(namespace, settings, [(first[n], found[n]) for n in missing])
+    return [found[normalize(t)] for t in texts]
@@ -0,0 +1,217 @@
+# metrics.py
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# ======================================================
+# METRICS CONFIG
+# ======================================================
+# Process-local counters and histograms for the pipeline, exported in
+# the Prometheus text format to a file (for node_exporter's textfile
+# collector) and optionally on an HTTP port.
+
+METRICS_FILE = os.getenv("METRICS_FILE", "output/metrics.prom")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = no endpoint
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_HELP = {
+    "vns_stage_calls_total": ("counter", "Pipeline stage runs."),
+    "vns_stage_errors_total": ("counter", "Pipeline stage runs that raised."),
+    "vns_stage_wall_seconds": ("histogram", "Wall-clock time per stage run."),
+    "vns_stage_cpu_seconds": ("histogram", "Process CPU time per stage run (all threads)."),
+    "vns_stage_input_tokens_total": ("counter", "Tokens fed to a stage's model."),
+    "vns_stage_output_tokens_total": ("counter", "Tokens produced by a stage's model."),
+    "vns_audio_duration_seconds": ("histogram", "Duration of transcribed audio."),
+    "vns_speech_seconds_total": ("counter", "Audio seconds sent to ASR after VAD."),
+    "vns_fallback_total": ("counter", "Times a stage fell back to its non-model path."),
+    "vns_cache_hits_total": ("counter", "Stage results served from the result cache."),
+    "vns_server_batch_items": ("histogram", "Items per micro-batch on the inference server."),
+    "vns_grammar_sentences_total": ("counter", "Transcript sentences by grammar route: model or skipped."),
+    "vns_asr_segments_total": ("counter", "Transcribed speech segments by Whisper tier."),
+    "vns_asr_escalations_total": ("counter", "Segments re-run on the next tier after a low-confidence transcript."),
+    "vns_memo_lookups_total": ("counter", "Memo cache lookups by namespace and result (hit/miss)."),
+    "vns_edit_sentences_total": ("counter", "Sentences of edited transcripts, re-corrected (model) or reused."),
+    "vns_model_unloads_total": ("counter", "Models unloaded to stay in the memory budget or when idle."),
+    "vns_fingerprint_lookups_total": ("counter", "Fingerprint index lookups by result: duplicate of an earlier note or new."),
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_server = None
+_server_lock = threading.Lock()
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+# ======================================================
+# RECORDING
+# ======================================================
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    with _lock:
+        key = _key(name, labels)
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name: str, value: float, buckets=SECONDS_BUCKETS, **labels) -> None:
+    with _lock:
+        key = _key(name, labels)
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets),
+                                       "sum": 0.0, "count": 0}
+        for i, bound in enumerate(hist["buckets"]):
+            if value <= bound:
+                hist["counts"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+def fallback(stage: str, reason: str) -> None:
+    inc("vns_fallback_total", stage=stage, reason=reason)
+
+def tokens(stage: str, input_tokens: int = 0, output_tokens: int = 0) -> None:
+    if input_tokens:
+        inc("vns_stage_input_tokens_total", input_tokens, stage=stage)
+    if output_tokens:
+        inc("vns_stage_output_tokens_total", output_tokens, stage=stage)
+
+def record_stage(name: str, wall: float, cpu: float = None, timings: dict = None) -> None:
+    """
+    Records one finished stage run. cpu is None for a stage that ran
+    alongside others, where process CPU time would count them too.
+    """
+    inc("vns_stage_calls_total", stage=name)
+    observe("vns_stage_wall_seconds", wall, stage=name)
+    if cpu is not None:
+        observe("vns_stage_cpu_seconds", cpu, stage=name)
+    if timings is not None:
+        timings[name] = {"wall": round(wall, 3), "cpu": None if cpu is None else round(cpu, 3)}
+
+@contextmanager
+def stage(name: str, timings: dict = None):
+    """
+    Times a pipeline stage. Wall and CPU seconds go into the stage
+    histograms and, if a dict is given, into timings[name] so the
+    caller can show a per-run breakdown.
+    """
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    except Exception:
+        inc("vns_stage_errors_total", stage=name)
+        raise
+    finally:
+        record_stage(name, time.perf_counter() - wall_start, time.process_time() - cpu_start, timings)
+
+class Stopwatch:
+    """
+    Adds up the wall time of the blocks run under timing(), for a stage
+    whose work is spread over calls with waiting in between.
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    @contextmanager
+    def timing(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds += time.perf_counter() - start
+
+# ======================================================
+# READING / EXPORT
+# ======================================================
+
+def counter_values(name: str) -> dict:
+    """{sorted label tuple: value} for every series of a counter."""
+    with _lock:
+        return {labels: value for (n, labels), value in _counters.items() if n == name}
+
+def stage_summary() -> dict:
+    """
+    {stage: {"count": n, "mean_wall": s, "mean_cpu": s}} over the
+    lifetime of this process.
+    """
+    out = {}
+    with _lock:
+        for (name, labels), hist in _histograms.items():
+            if name not in ("vns_stage_wall_seconds", "vns_stage_cpu_seconds") or not hist["count"]:
+                continue
+            stage_name = dict(labels).get("stage")
+            entry = out.setdefault(stage_name, {"count": hist["count"]})
+            field = "mean_wall" if name == "vns_stage_wall_seconds" else "mean_cpu"
+            entry[field] = round(hist["sum"] / hist["count"], 3)
+    return out
+
+def _fmt_labels(labels, extra=()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+def render_prometheus() -> str:
+    lines = []
+    with _lock:
+        names = sorted({n for n, _ in _counters} | {n for n, _ in _histograms})
+        for name in names:
+            kind, help_text = _HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (n, labels), value in sorted(_counters.items()):
+                if n == name:
+                    lines.append(f"{name}{_fmt_labels(labels)} {value}")
+            for (n, labels), hist in sorted(_histograms.items()):
+                if n != name:
+                    continue
+                for bound, count in zip(hist["buckets"], hist["counts"]):
+                    lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {hist['count']}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {hist['sum']}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+def write_textfile(path: str = METRICS_FILE) -> None:
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(render_prometheus())
+        os.replace(tmp, path)
+    except OSError as e:
+        print("Metrics write error:", e)
+
+def start_http_server(port: int = METRICS_PORT):
+    """
+    Serves /metrics on the given port from a daemon thread.
+    Safe to call repeatedly; only the first call starts a server.
+    """
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if not port or _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        except OSError as e:
+            print("Metrics server error:", e)
+            return None
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        return _server
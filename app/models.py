@@ -0,0 +1,294 @@
+# models.py
+import gc
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+import backends
+import metrics
+import inference
+
+# ======================================================
+# MODEL REGISTRY
+# ======================================================
+# Every model used by the pipeline is registered here with a loader
+# function and built on first use, so importing the stage modules is
+# cheap and the Streamlit page can render before any model loads.
+
+NOT_LOADED = "not loaded"
+LOADING = "loading"
+LOADED = "loaded"
+FAILED = "failed"
+
+PREWARM_MODELS = os.getenv("PREWARM_MODELS", "1") == "1"
+
+# Swap every model for a tiny deterministic stand-in (see standins.py),
+# for benchmarks and load tests on machines without the real weights
+STANDIN_MODELS = os.getenv("STANDIN_MODELS", "0") == "1"
+
+# Memory the loaded models may use together; when a model has to load
+# and the budget would be exceeded, the least recently used ones are
+# unloaded first (0 = no budget). Models unused for MODEL_IDLE_TIMEOUT_S
+# are unloaded as well (0 = keep them).
+MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+IDLE_TIMEOUT_S = float(os.getenv("MODEL_IDLE_TIMEOUT_S", "0"))
+
+_loaders = {}
+_models = {}
+_status = {}
+_locks = {}
+_footprints = {}    # name -> MB measured at the last load (kept after unloading)
+_last_used = {}
+_in_use = {}        # name -> calls running on the model (see use())
+_registry_lock = threading.Lock()
+_prewarm_thread = None
+_reaper_thread = None
+
+def register(name: str, loader) -> None:
+    """
+    Register a zero-argument loader for a model name.
+    Nothing is loaded until get_model(name) is called.
+    """
+    if STANDIN_MODELS:
+        import standins
+        # "asr:<model id>" tiers share the "asr" stand-in
+        loader = standins.LOADERS.get(name.split(":", 1)[0], loader)
+
+    with _registry_lock:
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+        _status.setdefault(name, {"state": NOT_LOADED, "load_seconds": None, "error": None})
+
+def model_tag(model_id: str) -> str:
+    """
+    The identity of the model that will actually run for model_id,
+    for cache keys and reports.
+    """
+    if STANDIN_MODELS:
+        return f"standin:{model_id}"
+    if backends.INFERENCE_BACKEND != "torch":
+        return f"{model_id}@{backends.INFERENCE_BACKEND}"
+    return model_id
+
+# ======================================================
+# MEMORY ACCOUNTING
+# ======================================================
+
+def rss_mb():
+    """Resident memory of this process in MB, or None if unknown."""
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / 2**20, 1)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _tensor_mb(model):
+    """
+    Parameter + buffer size of the torch modules inside model (a
+    module, a transformers pipeline or a tuple of them), or None.
+    """
+    parts = model if isinstance(model, (tuple, list)) else [model]
+    total, found = 0, False
+    for part in parts:
+        module = getattr(part, "model", part)
+        if not (hasattr(module, "parameters") and hasattr(module, "buffers")):
+            continue
+        try:
+            tensors = list(module.parameters()) + list(module.buffers())
+        except TypeError:
+            continue
+        total += sum(t.numel() * t.element_size() for t in tensors)
+        found = True
+    return round(total / 2**20, 1) if found else None
+
+def _used_mb(exclude=None) -> float:
+    return sum(_footprints.get(n, 0) for n in _models if n != exclude)
+
+def _evict_for(name: str, needed_mb: float) -> None:
+    """Unloads least recently used models until needed_mb fits the budget."""
+    if not MEMORY_BUDGET_MB:
+        return
+    with _registry_lock:
+        victims = sorted((n for n in _models if n != name), key=lambda n: _last_used.get(n, 0))
+    for victim in victims:
+        if _used_mb(exclude=name) + needed_mb <= MEMORY_BUDGET_MB:
+            break
+        # A model in use would stay in memory anyway
+        unload(victim, reason="budget", if_unused=True)
+
+def unload(name: str, reason: str = "manual", if_unused: bool = False) -> bool:
+    """
+    Drops the registry's reference to a loaded model. Callers that
+    still hold it keep working; the memory is freed once they finish.
+    The next get_model(name) loads it again. With if_unused=True a
+    model that is running a call (see use()) is left loaded.
+    """
+    with _registry_lock:
+        if if_unused and _in_use.get(name):
+            return False
+        if _models.pop(name, None) is None:
+            return False
+        _status[name] = {**_status[name], "state": NOT_LOADED}
+    gc.collect()
+    metrics.inc("vns_model_unloads_total", model=name, reason=reason)
+    print(f"Unloaded model '{name}' ({reason})")
+    return True
+
+def _reap_idle() -> None:
+    while True:
+        time.sleep(max(1.0, min(IDLE_TIMEOUT_S / 2, 30.0)))
+        now = time.monotonic()
+        for name in list(_models):
+            if now - _last_used.get(name, now) > IDLE_TIMEOUT_S:
+                unload(name, reason="idle", if_unused=True)
+
+def _start_reaper() -> None:
+    global _reaper_thread
+    with _registry_lock:
+        if IDLE_TIMEOUT_S and _reaper_thread is None:
+            _reaper_thread = threading.Thread(target=_reap_idle, name="model-reaper", daemon=True)
+            _reaper_thread.start()
+
+# ======================================================
+# LOADING
+# ======================================================
+
+def get_model(name: str):
+    """
+    Return the model registered under name, loading it on first use.
+    Concurrent callers wait for a single load instead of racing.
+    With a memory budget, least recently used models are unloaded to
+    make room.
+    """
+    model = _models.get(name)
+    if model is not None:
+        _last_used[name] = time.monotonic()
+        return model
+    if name not in _loaders:
+        raise KeyError(f"No model registered under '{name}'")
+
+    with _locks[name]:
+        if name in _models:
+            _last_used[name] = time.monotonic()
+            return _models[name]
+        # Make room using the size measured last time this model loaded
+        _evict_for(name, _footprints.get(name, 0))
+        _status[name] = {"state": LOADING, "load_seconds": None, "error": None}
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        try:
+            model = _loaders[name]()
+        except Exception as e:
+            _status[name] = {"state": FAILED, "load_seconds": None, "error": str(e)}
+            raise
+        load_seconds = round(time.perf_counter() - start, 2)
+
+        footprint = _tensor_mb(model)
+        if footprint is None and rss_before is not None:
+            footprint = max(0.0, round((rss_mb() or rss_before) - rss_before, 1))
+        _footprints[name] = footprint or 0.0
+        _last_used[name] = time.monotonic()
+        _models[name] = model
+        _status[name] = {"state": LOADED, "load_seconds": load_seconds, "error": None}
+
+    # First load of this model: now that its size is known, trim the rest
+    _evict_for(name, _footprints[name])
+    _start_reaper()
+    return model
+
+@contextmanager
+def use(name: str):
+    """
+    get_model(name) for the length of a with block. The model is not
+    unloaded as idle (or to fit the budget) while a block uses it, and
+    its idle time starts when the last block ends, so long inference
+    calls are never cut from under the caller.
+    """
+    with _registry_lock:
+        _in_use[name] = _in_use.get(name, 0) + 1
+    try:
+        yield get_model(name)
+    finally:
+        with _registry_lock:
+            _in_use[name] -= 1
+            _last_used[name] = time.monotonic()
+
+def is_loaded(name: str) -> bool:
+    return name in _models
+
+def load_state() -> dict:
+    """
+    Load state of every registered model, e.g.
+    {"asr": {"state": "loaded", "load_seconds": 4.1, "error": None,
+             "memory_mb": 277.5, "idle_seconds": 12.0}}
+    memory_mb is the size measured at the last load (None if it never
+    loaded); idle_seconds is None unless the model is loaded.
+    """
+    now = time.monotonic()
+    return {
+        name: {
+            **info,
+            "memory_mb": _footprints.get(name),
+            "idle_seconds": round(now - _last_used[name], 1)
+            if name in _models and name in _last_used else None,
+        }
+        for name, info in _status.items()
+    }
+
+def memory_usage() -> dict:
+    """
+    {"rss_mb": process RSS, "models_mb": loaded models' total,
+     "budget_mb": MODEL_MEMORY_BUDGET_MB or None}
+    """
+    return {
+        "rss_mb": rss_mb(),
+        "models_mb": round(_used_mb(), 1),
+        "budget_mb": MEMORY_BUDGET_MB or None,
+    }
+
+def _prewarm(names) -> None:
+    for name in names:
+        # Under a budget, don't load models that would evict each other
+        if MEMORY_BUDGET_MB and _used_mb() + _footprints.get(name, 0) > MEMORY_BUDGET_MB:
+            break
+        loaded = set(_models)
+        try:
+            get_model(name)
+        except Exception as e:
+            print(f"Prewarm of '{name}' failed:", e)
+        if not loaded <= set(_models):
+            break
+
+def prewarm(names=None, background: bool = True):
+    """
+    Load the given models (default: all registered) ahead of first use.
+    With background=True this returns at once and loads in a daemon
+    thread; calling it again while that thread runs is a no-op.
+    """
+    global _prewarm_thread
+    if inference.enabled():
+        # The inference server holds the models
+        return None
+    names = list(names or _loaders)
+    if not background:
+        _prewarm(names)
+        return None
+
+    with _registry_lock:
+        if _prewarm_thread is not None and _prewarm_thread.is_alive():
+            return _prewarm_thread
+        pending = [n for n in names if n not in _models]
+        if not pending:
+            return None
+        _prewarm_thread = threading.Thread(
+            target=_prewarm, args=(pending,), name="model-prewarm", daemon=True
+        )
+        _prewarm_thread.start()
+        return _prewarm_thread
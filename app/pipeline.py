@@ -0,0 +1,392 @@
+# pipeline.py
+import os
+import queue
+import threading
+from difflib import SequenceMatcher
+
+import transcriber
+import grammar
+import summarizer
+import metrics
+import fingerprint
+from results import get_store
+from cache import ResultCache, hash_file, hash_text, make_key
+from text_utils import split_sentences
+
+# Run grammar correction and summarization on ASR segments as they are
+# decoded instead of waiting for the whole transcript
+OVERLAP_STAGES = os.getenv("PIPELINE_OVERLAP", "1") == "1"
+
+_DONE = object()
+
+_default_cache = None
+
+def get_result_cache() -> ResultCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    return _default_cache
+
+def model_versions() -> dict:
+    """Model tag per stage, stored with each result."""
+    return {
+        "asr": transcriber.model_settings()["model"],
+        "grammar": grammar.model_settings()["model"],
+        "summarizer": summarizer.model_settings()["model"],
+    }
+
+def _cached_stage(cache, key, stage, compute, timings, should_cache=bool, on_stage=None):
+    if on_stage:
+        on_stage(stage)
+    value = cache.get(key)
+    if value is not None:
+        metrics.inc("vns_cache_hits_total", stage=stage)
+        timings[stage] = {"wall": 0.0, "cpu": 0.0, "cached": True}
+        return value
+    with metrics.stage(stage, timings):
+        value = compute()
+    if should_cache(value):
+        cache.set(key, value)
+    return value
+
+def _consume(q):
+    while True:
+        item = q.get()
+        if item is _DONE:
+            return
+        yield item
+
+def run_overlapped(segments, correct_stream=None, summarize_stream=None, timings=None,
+                   on_stage=None) -> dict:
+    """
+    Producer/consumer pipeline: segments (an iterable of ASR segments,
+    e.g. transcriber.iter_segments) is drained on this thread while a
+    second thread corrects the text in batches of whole sentences as
+    it arrives (grammar.correct_stream) and a third feeds the corrected
+    text to summarize_stream. For long recordings end-to-end time
+    approaches the ASR time alone.
+
+    The corrected text and summary are the ones the sequential stages
+    would give for the same transcript. Timings count only the time
+    each stage spent in its model, not waiting for input; CPU time is
+    not reported because the stages share the process.
+    """
+    correct_stream = correct_stream or grammar.correct_stream
+    summarize_stream = summarize_stream or summarizer.summarize_stream
+    timings = {} if timings is None else timings
+    to_grammar, to_summary = queue.Queue(), queue.Queue()
+    corrected_parts, summary_box, errors = [], [], []
+    watches = {"correct": metrics.Stopwatch(), "summarize": metrics.Stopwatch()}
+
+    def grammar_worker():
+        try:
+            texts = (seg["text"] for seg in _consume(to_grammar))
+            for part in correct_stream(texts, stopwatch=watches["correct"]):
+                if part:
+                    corrected_parts.append(part)
+                    to_summary.put(part)
+        except Exception as e:
+            metrics.inc("vns_stage_errors_total", stage="correct")
+            errors.append(e)
+        finally:
+            to_summary.put(_DONE)
+
+    def summary_worker():
+        try:
+            summary_box.append(summarize_stream(_consume(to_summary), stopwatch=watches["summarize"]))
+        except Exception as e:
+            metrics.inc("vns_stage_errors_total", stage="summarize")
+            errors.append(e)
+            for _ in _consume(to_summary):
+                pass
+
+    threads = [
+        threading.Thread(target=grammar_worker, name="pipeline-correct", daemon=True),
+        threading.Thread(target=summary_worker, name="pipeline-summarize", daemon=True),
+    ]
+    for t in threads:
+        t.start()
+
+    collected = []
+    transcribe = metrics.Stopwatch()
+    try:
+        if on_stage:
+            on_stage("transcribe")
+        with transcribe.timing():
+            for seg in segments:
+                collected.append(seg)
+                to_grammar.put(seg)
+    except Exception:
+        metrics.inc("vns_stage_errors_total", stage="transcribe")
+        raise
+    finally:
+        to_grammar.put(_DONE)
+        metrics.record_stage("transcribe", transcribe.seconds, timings=timings)
+
+    if on_stage:
+        on_stage("correct")
+    threads[0].join()
+    if on_stage:
+        on_stage("summarize")
+    threads[1].join()
+    for name, watch in watches.items():
+        metrics.record_stage(name, watch.seconds, timings=timings)
+    if errors:
+        raise errors[0]
+
+    return {
+        "segments": collected,
+        "transcript": transcriber.join_segments(collected),
+        "corrected": " ".join(corrected_parts).strip(),
+        "summary": summary_box[0] if summary_box else "",
+    }
+
+def _reuse_duplicate(cache, segments_key, duplicate_hash: str, audio_hash: str, timings: dict):
+    """
+    The result of an earlier note that sounds the same, or None. Its
+    cached segments are copied under this file's key so the normal
+    cached path serves every stage; if they were evicted, the stored
+    result is used as is.
+    """
+    settings = transcriber.model_settings()
+    segments = cache.get(make_key("segments", duplicate_hash, settings))
+    if segments is not None:
+        cache.set(segments_key, segments)
+        return None
+    stored = get_store().get_by_hash(duplicate_hash)
+    # An empty transcript means ASR failed or heard nothing; try again
+    if not stored or not stored["transcript"] or (stored.get("models") or {}).get("asr") != settings["model"]:
+        return None
+    for stage in ("transcribe", "correct", "summarize"):
+        timings[stage] = {"wall": 0.0, "cpu": 0.0, "cached": True}
+    return {
+        "audio_hash": audio_hash,
+        "segments": [],
+        "transcript": stored["transcript"],
+        "corrected": stored["corrected"],
+        "summary": stored["summary"],
+        "models": stored.get("models") or model_versions(),
+        "timings": timings,
+        "duplicate_of": duplicate_hash,
+    }
+
+def process_audio(audio_path: str, cache: ResultCache = None, audio_hash: str = None,
+                  on_stage=None, audio=None) -> dict:
+    """
+    Transcribe -> correct -> summarize one audio file.
+
+    Each stage is cached on its own, keyed by the hash of its input and
+    the settings of the model that produced it, so changing only the
+    summarizer model reuses the cached transcript and corrected text.
+    Per-stage wall/CPU seconds for this run are returned under "timings"
+    (CPU is None for stages that ran overlapped).
+    on_stage(name), if given, is called as each stage starts.
+
+    When nothing is cached yet and PIPELINE_OVERLAP is on, the three
+    stages run overlapped (see run_overlapped) and all three results
+    are cached afterwards.
+
+    A file with no cached transcript is first looked up in the acoustic
+    fingerprint index (see fingerprint.py); a re-encoded copy of an
+    earlier note reuses that note's results instead of running ASR, and
+    carries its audio hash under "duplicate_of".
+
+    audio, if given, is the file's already decoded 16 kHz mono audio
+    (e.g. from recorder.Recorder); it is used instead of decoding the
+    file again.
+    """
+    cache = cache or get_result_cache()
+    audio_hash = audio_hash or hash_file(audio_path)
+    timings = {}
+
+    segments_key = make_key("segments", audio_hash, transcriber.model_settings())
+    duplicate_hash = None
+    if cache.get(segments_key) is None:
+        duplicate_hash = fingerprint.find_duplicate(audio_path, audio_hash, timings, audio)
+        if duplicate_hash:
+            reused = _reuse_duplicate(cache, segments_key, duplicate_hash, audio_hash, timings)
+            if reused is not None:
+                metrics.write_textfile()
+                return reused
+
+    source = audio_path if audio is None else audio
+    if OVERLAP_STAGES and cache.get(segments_key) is None:
+        result = run_overlapped(transcriber.iter_segments(source), timings=timings,
+                                on_stage=on_stage)
+        if result["segments"]:
+            cache.set(segments_key, result["segments"])
+        cache.set(make_key("corrected", hash_text(result["transcript"]), grammar.model_settings()),
+                  result["corrected"])
+        cache.set(make_key("summary", hash_text(result["corrected"]), summarizer.model_settings()),
+                  result["summary"])
+        metrics.write_textfile()
+        result = {"audio_hash": audio_hash, **result, "models": model_versions(), "timings": timings}
+        if duplicate_hash:
+            result["duplicate_of"] = duplicate_hash
+        return result
+
+    # Transcription (kept per segment, with timestamps);
+    # empty means ASR failed or no speech, so retry next time
+    segments = _cached_stage(
+        cache, segments_key, "transcribe",
+        lambda: transcriber.transcribe_segments(source), timings, on_stage=on_stage
+    )
+    transcript = transcriber.join_segments(segments)
+
+    # Grammar correction
+    corrected = _cached_stage(
+        cache, make_key("corrected", hash_text(transcript), grammar.model_settings()), "correct",
+        lambda: grammar.correct_grammar(transcript), timings,
+        should_cache=lambda v: True, on_stage=on_stage
+    )
+
+    # Summarization
+    summary = _cached_stage(
+        cache, make_key("summary", hash_text(corrected), summarizer.model_settings()), "summarize",
+        lambda: summarizer.summarize_text(corrected), timings,
+        should_cache=lambda v: True, on_stage=on_stage
+    )
+
+    metrics.write_textfile()
+
+    result = {
+        "audio_hash": audio_hash,
+        "segments": segments,
+        "transcript": transcript,
+        "corrected": corrected,
+        "summary": summary,
+        "models": model_versions(),
+        "timings": timings,
+    }
+    if duplicate_hash:
+        result["duplicate_of"] = duplicate_hash
+    return result
+
+# ======================================================
+# TRANSCRIPT EDITS
+# ======================================================
+
+def _sentence_map(result: dict):
+    """
+    [(transcript text, corrected text), ...] for a result, or None when
+    the two can't be lined up. Each entry is usually one sentence; a
+    run whose correction has a different sentence count is kept as one
+    entry. Results from apply_edit carry the map; for others T5 almost
+    always keeps the sentence count, so sentences are paired in order
+    when the counts match.
+    """
+    if result.get("sentence_map"):
+        return [tuple(pair) for pair in result["sentence_map"]]
+    source = split_sentences(result.get("transcript", ""))
+    corrected = split_sentences(result.get("corrected", ""))
+    if source and len(source) == len(corrected):
+        return list(zip(source, corrected))
+    return None
+
+def _reused_entries(old_map: list, new_sentences: list) -> dict:
+    """
+    {new start index: (new end index, map entry)} for the entries of
+    old_map whose sentences all appear unchanged, in order and next to
+    each other, in new_sentences.
+    """
+    old_sentences, ranges = [], []
+    for source, _ in old_map:
+        first = len(old_sentences)
+        old_sentences.extend(split_sentences(source))
+        ranges.append((first, len(old_sentences)))
+
+    new_index = [None] * len(old_sentences)
+    matcher = SequenceMatcher(None, old_sentences, new_sentences, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            new_index[i1:i2] = range(j1, j2)
+
+    reused = {}
+    for entry, (i1, i2) in zip(old_map, ranges):
+        positions = new_index[i1:i2]
+        if positions and None not in positions and positions[-1] - positions[0] == i2 - i1 - 1:
+            reused[positions[0]] = (positions[-1] + 1, entry)
+    return reused
+
+def apply_edit(previous: dict, edited_transcript: str, cache: ResultCache = None) -> dict:
+    """
+    Updates a result after the user edited its transcript by hand.
+
+    The edited transcript is diffed against the previous one sentence
+    by sentence; only inserted or changed runs of sentences go back
+    through grammar correction, the rest keep their corrected text. A
+    run corrected as a whole (its correction could not be split back
+    into sentences) is corrected again as a whole if any part of it
+    changes. The summary is recomputed from the new corrected text;
+    with the memo cache on (MEMO_CACHE=1), it serves every summary
+    window that did not change, so only the affected windows of a long
+    note reach the model. With MEMO_CACHE=0 every window is summarized
+    again.
+
+    The spliced corrected text is not written to the result cache:
+    it can differ from what correct_grammar gives for the whole edited
+    transcript, which is what the cached "corrected" entry stands for.
+    The summary, a function of the corrected text alone, is cached.
+
+    Returns a new result dict (previous is not modified) with
+    "sentence_map" for the next edit and "changed_sentences".
+    """
+    cache = cache or get_result_cache()
+    timings = {}
+    new_sentences = split_sentences(edited_transcript)
+    old_map = _sentence_map(previous)
+    reused = {} if old_map is None else _reused_entries(old_map, new_sentences)
+
+    # In order: reused map entries, or None for a run to correct again
+    plan, blocks, j = [], [], 0
+    while j < len(new_sentences):
+        if j in reused:
+            j, entry = reused[j]
+            plan.append(entry)
+            continue
+        end = j
+        while end < len(new_sentences) and end not in reused:
+            end += 1
+        blocks.append((j, end))
+        plan.append(None)
+        j = end
+
+    with metrics.stage("correct", timings):
+        fixed = grammar.correct_grammar_many(
+            [" ".join(new_sentences[j1:j2]) for j1, j2 in blocks]
+        ) if blocks else []
+
+    sentence_map, corrections = [], iter(zip(blocks, fixed))
+    for entry in plan:
+        if entry is not None:
+            sentence_map.append(entry)
+            continue
+        (j1, j2), text = next(corrections)
+        parts = split_sentences(text)
+        if len(parts) == j2 - j1:
+            sentence_map.extend(zip(new_sentences[j1:j2], parts))
+        else:
+            # Can't split the correction back up; keep the run as one entry
+            sentence_map.append((" ".join(new_sentences[j1:j2]), text))
+    changed = sum(j2 - j1 for j1, j2 in blocks)
+
+    transcript = " ".join(new_sentences)
+    corrected = " ".join(c for _, c in sentence_map if c).strip()
+    with metrics.stage("summarize", timings):
+        summary = summarizer.summarize_text(corrected)
+
+    cache.set(make_key("summary", hash_text(corrected), summarizer.model_settings()), summary)
+    metrics.inc("vns_edit_sentences_total", changed, route="model")
+    metrics.inc("vns_edit_sentences_total", len(new_sentences) - changed, route="reused")
+
+    return {
+        **previous,
+        "transcript": transcript,
+        "corrected": corrected,
+        "summary": summary,
+        "sentence_map": [list(pair) for pair in sentence_map],
+        "changed_sentences": changed,
+        "edited": True,
+        "models": model_versions(),
+        "timings": timings,
+    }
@@ -1,42 +1,250 @@
 # recorder.py
 import os
+import time
+import hashlib
+import threading
 from pathlib import Path
 from datetime import datetime
 import tempfile
 
-# Save Streamlit uploaded file to disk and return path
-def save_uploaded_audio(uploaded_file):
-    uploads_dir = Path("uploads")
+import numpy as np
+
+from audio import SAMPLE_RATE
+from streaming import RingBuffer
+
+UPLOADS_DIR = "uploads"
+UPLOAD_CHUNK_BYTES = 1 << 20  # 1 MiB
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "50"))
+UPLOAD_MAX_AGE_HOURS = float(os.getenv("UPLOAD_MAX_AGE_HOURS", "24"))
+UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "200"))
+CLEANUP_INTERVAL_S = 600
+
+RECORDINGS_DIR = "recordings"
+# flac (lossless, ~half the size of WAV) or opus (Ogg/Opus, ~1/20 the size)
+RECORDING_FORMAT = os.getenv("RECORDING_FORMAT", "flac")
+# Recordings up to this long are also kept in memory and handed to the
+# pipeline as is; longer ones are read back from the file in windows
+RECORDING_KEEP_S = float(os.getenv("RECORDING_KEEP_S", "600"))
+
+_FORMATS = {
+    "flac": (".flac", "FLAC", "PCM_16"),
+    "opus": (".ogg", "OGG", "OPUS"),
+    "wav": (".wav", "WAV", "PCM_16"),
+}
+
+_last_cleanup = 0.0
+
+# Save Streamlit uploaded file to disk and return (path, sha256)
+def save_uploaded_audio(uploaded_file, uploads_dir=UPLOADS_DIR, max_bytes=MAX_UPLOAD_MB * 1024 * 1024):
+    """
+    Copies an uploaded file to disk in fixed-size chunks, so memory
+    stays flat whatever the file size, and names it after a hash of
+    its content: concurrent uploads never overwrite each other and the
+    same audio uploaded twice is stored once.
+    Raises ValueError if the file is larger than max_bytes.
+    """
+    uploads_dir = Path(uploads_dir)
     uploads_dir.mkdir(exist_ok=True)
-    suffix = Path(uploaded_file.name).suffix or ".wav"
-    # create unique filename
-    out_path = uploads_dir / f"upload_{len(list(uploads_dir.iterdir()))+1}{suffix}"
-    with open(out_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    return str(out_path)
+    suffix = Path(getattr(uploaded_file, "name", "") or "").suffix.lower() or ".wav"
 
-# Optional local recorder (works only when running locally with sounddevice)
-def record_audio(duration=10, fs=16000):
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+
+    h = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=uploads_dir, suffix=".part")
     try:
-        import sounddevice as sd
-        from scipy.io.wavfile import write
-    except Exception as e:
-        raise RuntimeError("Local recording requires sounddevice and scipy. Install in your environment.") from e
-
-    recordings_dir = Path("recordings")
-    recordings_dir.mkdir(exist_ok=True)
-    filename = recordings_dir / f"recording_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
-
-    # Simple recording (blocking)
-    print("\n🎬 Recording will begin in:")
-    for i in range(3, 0, -1):
-        print(f"⏳ {i}...")
-        import time
-        time.sleep(1)
-    print("🎤 Start speaking now!\n")
-
-    recording = sd.rec(int(duration * fs), samplerate=fs, channels=1, dtype='int16')
-    sd.wait()
-    write(str(filename), fs, recording)
-    print(f"🎧 Recording saved: {filename}")
-    return str(filename)
+        with os.fdopen(fd, "wb") as f:
+            for chunk in iter(lambda: uploaded_file.read(UPLOAD_CHUNK_BYTES), b""):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"File is larger than the {max_bytes // (1024 * 1024)} MB limit.")
+                h.update(chunk)
+                f.write(chunk)
+        digest = h.hexdigest()
+        out_path = uploads_dir / f"upload_{digest[:16]}{suffix}"
+        if out_path.exists():
+            os.remove(tmp)  # same content already stored
+            os.utime(out_path)
+        else:
+            os.replace(tmp, out_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    cleanup_uploads(uploads_dir)
+    return str(out_path), digest
+
+def cleanup_uploads(uploads_dir=UPLOADS_DIR, max_age_hours=UPLOAD_MAX_AGE_HOURS,
+                    max_files=UPLOAD_MAX_FILES, force=False):
+    """
+    Deletes uploads older than max_age_hours, then the oldest ones
+    beyond max_files. Runs at most every CLEANUP_INTERVAL_S unless
+    force is set, so saving an upload doesn't scan the folder each time.
+    """
+    global _last_cleanup
+    now = time.time()
+    if not force and now - _last_cleanup < CLEANUP_INTERVAL_S:
+        return
+    _last_cleanup = now
+
+    entries = []
+    for entry in os.scandir(uploads_dir):
+        if not entry.is_file():
+            continue
+        try:
+            mtime = entry.stat().st_mtime
+        except OSError:
+            continue
+        if now - mtime > max_age_hours * 3600:
+            _remove(entry.path)
+        else:
+            entries.append((mtime, entry.path))
+
+    entries.sort()
+    for _, path in entries[:max(0, len(entries) - max_files)]:
+        _remove(path)
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+# ======================================================
+# LOCAL RECORDING
+# ======================================================
+
+class Recorder:
+    """
+    Records 16 kHz mono audio to a compressed file.
+
+    feed() is the audio callback's only work: it copies the samples
+    into a preallocated ring buffer (and into live, a LiveTranscriber,
+    if given) without allocating. A writer thread drains the buffer in
+    blocks and encodes them on the fly (RECORDING_FORMAT). stop()
+    returns the file path and, for recordings up to keep_s seconds,
+    the audio itself so the pipeline doesn't read the file back.
+
+    start(microphone=False) records from whatever calls feed(), e.g. a
+    synthetic stream, so no sound device is needed.
+    """
+
+    def __init__(self, path: str = None, fmt: str = RECORDING_FORMAT, live=None,
+                 sampling_rate: int = SAMPLE_RATE, keep_s: float = RECORDING_KEEP_S,
+                 buffer_s: float = 30.0, block_s: float = 0.5):
+        if fmt not in _FORMATS:
+            raise ValueError(f"Unknown recording format '{fmt}' (use one of {', '.join(_FORMATS)})")
+        suffix, self._format, self._subtype = _FORMATS[fmt]
+        if path is None:
+            Path(RECORDINGS_DIR).mkdir(exist_ok=True)
+            path = os.path.join(RECORDINGS_DIR, f"recording_{datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}")
+        self.path = path
+        self.sampling_rate = sampling_rate
+        self.live = live
+        self.buffer = RingBuffer(int(buffer_s * sampling_rate))
+        self._block = np.zeros(int(block_s * sampling_rate), dtype=np.float32)
+        self._keep = int(keep_s * sampling_rate)
+        self._kept = []
+        self._kept_samples = 0
+        self._data = threading.Event()
+        self._stop = threading.Event()
+        self._writer = None
+        self._stream = None
+        self._error = None
+        self.overflows = 0  # callbacks the sound device reported an input overflow for
+
+    @property
+    def dropped(self) -> int:
+        """Samples lost because the writer fell a whole buffer behind."""
+        return self.buffer.dropped
+
+    def feed(self, samples: np.ndarray) -> None:
+        self.buffer.write(samples)
+        if self.live is not None:
+            self.live.feed(samples)
+        self._data.set()
+
+    def _callback(self, indata, frames, time_info, status):
+        if status:
+            self.overflows += 1
+        self.feed(indata[:, 0])
+
+    def start(self, microphone: bool = True) -> "Recorder":
+        import soundfile as sf
+
+        if microphone:
+            try:
+                import sounddevice as sd
+            except Exception as e:
+                raise RuntimeError("Local recording requires sounddevice. Install in your environment.") from e
+        self._file = sf.SoundFile(self.path, mode="x", samplerate=self.sampling_rate, channels=1,
+                                  format=self._format, subtype=self._subtype)
+        self._writer = threading.Thread(target=self._write, name="recorder-writer", daemon=True)
+        self._writer.start()
+        if microphone:
+            self._stream = sd.InputStream(samplerate=self.sampling_rate, channels=1, dtype="float32",
+                                          blocksize=0, callback=self._callback)
+            self._stream.start()
+        return self
+
+    def _drain(self) -> None:
+        keeping = self._kept_samples + self.buffer.available() <= self._keep
+        while self.buffer.available():
+            block = self.buffer.peek(len(self._block), out=None if keeping else self._block)
+            self._file.write(block)
+            self.buffer.consume(len(block))
+            if keeping:
+                self._kept.append(block)
+                self._kept_samples += len(block)
+        if not keeping:
+            # Past keep_s: stop holding the audio in memory
+            self._kept, self._keep = [], 0
+
+    def _write(self) -> None:
+        try:
+            while not self._stop.is_set():
+                self._data.wait(timeout=0.1)
+                self._data.clear()
+                if self.buffer.available() >= len(self._block):
+                    self._drain()
+            self._drain()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._file.close()
+
+    def stop(self):
+        """
+        Stops recording and returns (path, audio), where audio is the
+        recording as a float32 array, or None when it was longer than
+        keep_s.
+        """
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        self._stop.set()
+        self._data.set()
+        if self._writer is not None:
+            self._writer.join()
+        if self._error is not None:
+            raise RuntimeError(f"Recording to {self.path} failed: {self._error}") from self._error
+        audio = None
+        if self._keep:
+            audio = np.concatenate(self._kept) if self._kept else np.zeros(0, dtype=np.float32)
+        return self.path, audio
+
+# Optional local recorder (works only when running locally with sounddevice)
+def record_audio(duration=10, fs=SAMPLE_RATE):
+    """
+    Records duration seconds from the microphone and returns
+    (path, audio); see Recorder.
+    """
+    recorder = Recorder(sampling_rate=fs).start()
+    print(f"🎤 Recording for {duration} s — start speaking now!\n")
+    time.sleep(duration)
+    path, audio = recorder.stop()
+    print(f"🎧 Recording saved: {path}")
+    return path, audio
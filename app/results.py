@@ -0,0 +1,245 @@
+# results.py
+import os
+import csv
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+# ======================================================
+# RESULTS STORE CONFIG
+# ======================================================
+# Every finished voice note (app, desktop GUI, batch runs) goes into
+# one SQLite database with a full-text index over the transcript,
+# corrected text and summary, so past notes can be searched without
+# reading whole files.
+
+RESULTS_DB = os.getenv("RESULTS_DB", "output/results.db")
+# Written by voice_note_gui.py before the store existed; imported once
+LEGACY_CSV = os.getenv("RESULTS_LEGACY_CSV", "output/voice_note_results.csv")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    audio_path TEXT,
+    audio_hash TEXT,
+    source TEXT NOT NULL,
+    transcript TEXT NOT NULL DEFAULT '',
+    corrected TEXT NOT NULL DEFAULT '',
+    summary TEXT NOT NULL DEFAULT '',
+    models TEXT,
+    timings TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_hash ON results (audio_hash);
+CREATE INDEX IF NOT EXISTS results_created ON results (created_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# External-content FTS5 index kept in sync by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5(
+    transcript, corrected, summary, content='results', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS results_ai AFTER INSERT ON results BEGIN
+    INSERT INTO results_fts (rowid, transcript, corrected, summary)
+    VALUES (new.id, new.transcript, new.corrected, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS results_ad AFTER DELETE ON results BEGIN
+    INSERT INTO results_fts (results_fts, rowid, transcript, corrected, summary)
+    VALUES ('delete', old.id, old.transcript, old.corrected, old.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS results_au AFTER UPDATE ON results BEGIN
+    INSERT INTO results_fts (results_fts, rowid, transcript, corrected, summary)
+    VALUES ('delete', old.id, old.transcript, old.corrected, old.summary);
+    INSERT INTO results_fts (rowid, transcript, corrected, summary)
+    VALUES (new.id, new.transcript, new.corrected, new.summary);
+END;
+"""
+
+_COLUMNS = ("audio_path", "audio_hash", "source", "transcript", "corrected", "summary",
+            "models", "timings", "created_at")
+
+def _row(record: dict) -> tuple:
+    models = record.get("models")
+    timings = record.get("timings")
+    return (
+        record.get("audio_path"),
+        record.get("audio_hash"),
+        record.get("source") or "app",
+        record.get("transcript") or "",
+        record.get("corrected") or "",
+        record.get("summary") or "",
+        json.dumps(models) if models is not None else None,
+        json.dumps(timings) if timings is not None else None,
+        record.get("created_at") or time.time(),
+    )
+
+def _fts_query(text: str) -> str:
+    # Quote every term so user input can't break the FTS5 query syntax;
+    # the last term also matches as a prefix
+    terms = [t.replace('"', '""') for t in text.split()]
+    if not terms:
+        return ""
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+class ResultStore:
+    def __init__(self, db_path: str = RESULTS_DB, legacy_csv: str = LEGACY_CSV):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            try:
+                conn.executescript(_FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: search falls back to LIKE
+                self.fts = False
+
+        if legacy_csv:
+            self.import_csv(legacy_csv)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            yield conn
+        finally:
+            conn.close()
+
+    # --------------------------------------------------
+    # WRITING
+    # --------------------------------------------------
+
+    def add_many(self, records) -> int:
+        """
+        Inserts result dicts (keys as in the results table; models and
+        timings are stored as JSON) in a single transaction.
+        Returns the number of rows written.
+        """
+        rows = [_row(r) for r in records]
+        if not rows:
+            return 0
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                f"INSERT INTO results ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                rows
+            )
+            conn.execute("COMMIT")
+        return len(rows)
+
+    def add(self, **record) -> None:
+        self.add_many([record])
+
+    def import_csv(self, path: str) -> int:
+        """
+        Imports voice_note_gui's old results CSV, once per database.
+        Returns the number of rows imported.
+        """
+        with self._connect() as conn:
+            done = conn.execute("SELECT value FROM meta WHERE key = ?", (f"imported:{path}",)).fetchone()
+        if done or not os.path.exists(path):
+            return 0
+
+        records = []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    created = datetime.fromisoformat(row.get("timestamp") or "").timestamp()
+                except ValueError:
+                    created = None
+                records.append({
+                    "audio_path": row.get("audio_file"),
+                    "source": "csv",
+                    "transcript": row.get("original"),
+                    "corrected": row.get("corrected"),
+                    "summary": row.get("summary"),
+                    "created_at": created,
+                })
+        count = self.add_many(records)
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         (f"imported:{path}", str(count)))
+        print(f"Imported {count} results from {path}")
+        return count
+
+    # --------------------------------------------------
+    # READING
+    # --------------------------------------------------
+
+    @staticmethod
+    def _decode(row) -> dict:
+        result = dict(row)
+        for field in ("models", "timings"):
+            if result.get(field):
+                result[field] = json.loads(result[field])
+        return result
+
+    def search(self, text: str = "", limit: int = 20) -> list:
+        """
+        Results whose transcript, corrected text or summary match all
+        words of text (best matches first), or the most recent results
+        when text is empty. FTS matches carry a highlighted "snippet".
+        """
+        query = _fts_query(text)
+        with self._connect() as conn:
+            if not query:
+                rows = conn.execute(
+                    "SELECT * FROM results ORDER BY created_at DESC LIMIT ?", (limit,)
+                ).fetchall()
+            elif self.fts:
+                rows = conn.execute(
+                    "SELECT results.*, snippet(results_fts, -1, '**', '**', '…', 12) AS snippet "
+                    "FROM results_fts JOIN results ON results.id = results_fts.rowid "
+                    "WHERE results_fts MATCH ? ORDER BY bm25(results_fts) LIMIT ?",
+                    (query, limit)
+                ).fetchall()
+            else:
+                where, params = [], []
+                for term in text.split():
+                    where.append("(transcript LIKE ? OR corrected LIKE ? OR summary LIKE ?)")
+                    params += [f"%{term}%"] * 3
+                rows = conn.execute(
+                    f"SELECT * FROM results WHERE {' AND '.join(where)} "
+                    "ORDER BY created_at DESC LIMIT ?",
+                    (*params, limit)
+                ).fetchall()
+        return [self._decode(r) for r in rows]
+
+    def get_by_hash(self, audio_hash: str):
+        """Latest result for an audio hash, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM results WHERE audio_hash = ? ORDER BY created_at DESC LIMIT 1",
+                (audio_hash,)
+            ).fetchone()
+        return self._decode(row) if row else None
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store() -> ResultStore:
+    """
+    The process-wide results store (the legacy CSV is imported the
+    first time it is opened).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore()
+        return _store
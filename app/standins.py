@@ -0,0 +1,104 @@
+# standins.py
+# ======================================================
+# TINY DETERMINISTIC STAND-IN MODELS
+# ======================================================
+# Drop-in replacements for Whisper, T5 and DistilBART with the same
+# call signatures the stage modules use. They load instantly, need no
+# network or weights, and always give the same output for the same
+# input, so benchmarks and load tests can run on a bare CI box.
+# Enabled with STANDIN_MODELS=1 (see models.py).
+import os
+import time
+import threading
+
+WORDS_PER_SECOND = 2.5
+
+# Optional simulated compute, so load tests see realistic contention:
+# seconds of work per second of audio (ASR) and per input word (text
+# models). At most STANDIN_CPUS calls (default: the machine's cores)
+# work at once, like models competing for the same CPU cores.
+ASR_RTF = float(os.getenv("STANDIN_ASR_RTF", "0"))
+TEXT_MS_PER_WORD = float(os.getenv("STANDIN_TEXT_MS_PER_WORD", "0"))
+CPUS = int(os.getenv("STANDIN_CPUS", "0")) or os.cpu_count() or 1
+
+_compute = threading.BoundedSemaphore(CPUS)
+
+def _busy(seconds: float) -> None:
+    if seconds > 0:
+        with _compute:
+            time.sleep(seconds)
+
+class StandinASR:
+    """Emits one placeholder word per 0.4 s of audio."""
+
+    def __call__(self, inputs, batch_size=1, **kwargs):
+        single = not isinstance(inputs, list)
+        items = [inputs] if single else inputs
+        _busy(ASR_RTF * sum(len(i["raw"]) / float(i["sampling_rate"]) for i in items))
+        outputs = []
+        for item in items:
+            seconds = len(item["raw"]) / float(item["sampling_rate"])
+            n_words = max(1, round(seconds * WORDS_PER_SECOND))
+            outputs.append({"text": " ".join(["speech"] * n_words)})
+        return outputs[0] if single else outputs
+
+class StandinTokenizer:
+    """Whitespace tokenizer with a vocabulary that grows as it goes."""
+
+    def __init__(self):
+        self.vocab = {}
+        self.words = []
+
+    def _id(self, word):
+        if word not in self.vocab:
+            self.vocab[word] = len(self.words)
+            self.words.append(word)
+        return self.vocab[word]
+
+    def encode(self, text, add_special_tokens=True):
+        return [self._id(w) for w in text.split()]
+
+    def __call__(self, texts, return_tensors=None, padding=False, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        return {"input_ids": [self.encode(t) for t in texts]}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(self.words[i] for i in ids)
+
+    def batch_decode(self, batch, skip_special_tokens=True):
+        return [self.decode(ids) for ids in batch]
+
+class StandinCorrector:
+    """Returns the input without its 'fix:' prefix, capped at max_length."""
+
+    def generate(self, input_ids=None, max_length=256, **kwargs):
+        _busy(TEXT_MS_PER_WORD / 1000.0 * sum(len(ids) for ids in input_ids))
+        return [ids[1:max_length + 1] for ids in input_ids]
+
+class StandinSummarizer:
+    """Keeps the first max_length words of each text."""
+
+    def __init__(self):
+        self.tokenizer = StandinTokenizer()
+
+    def __call__(self, texts, max_length=80, min_length=10, **kwargs):
+        single = isinstance(texts, str)
+        items = [texts] if single else texts
+        _busy(TEXT_MS_PER_WORD / 1000.0 * sum(len(t.split()) for t in items))
+        return [{"summary_text": " ".join(t.split()[:max_length])} for t in items]
+
+def load_asr():
+    return StandinASR()
+
+def load_grammar():
+    return StandinTokenizer(), StandinCorrector()
+
+def load_summarizer():
+    return StandinSummarizer()
+
+LOADERS = {
+    "asr": load_asr,
+    "grammar": load_grammar,
+    "summarizer": load_summarizer,
+}
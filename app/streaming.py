@@ -0,0 +1,170 @@
+# streaming.py
+import threading
+
+import numpy as np
+
+import vad
+from audio import SAMPLE_RATE
+
+# ======================================================
+# RING BUFFER
+# ======================================================
+
+class RingBuffer:
+    """
+    Fixed-size float32 ring buffer for one producer (the audio
+    callback) and one consumer. Memory is allocated once; writes copy
+    into it without allocating.
+    """
+
+    def __init__(self, capacity: int):
+        self._buf = np.zeros(capacity, dtype=np.float32)
+        self._capacity = capacity
+        self._read = 0      # total samples consumed
+        self._write = 0     # total samples written
+        self._lock = threading.Lock()
+        self.dropped = 0    # samples overwritten before they were read
+
+    def write(self, data: np.ndarray) -> None:
+        n = len(data)
+        skipped = 0
+        if n > self._capacity:
+            skipped = n - self._capacity
+            data = data[-self._capacity:]
+            n = self._capacity
+        with self._lock:
+            self.dropped += skipped
+            start = self._write % self._capacity
+            first = min(n, self._capacity - start)
+            self._buf[start:start + first] = data[:first]
+            self._buf[:n - first] = data[first:]
+            self._write += n
+            overflow = self._write - self._read - self._capacity
+            if overflow > 0:
+                self._read += overflow
+                self.dropped += overflow
+
+    def available(self) -> int:
+        with self._lock:
+            return self._write - self._read
+
+    def peek(self, n: int = None, out: np.ndarray = None) -> np.ndarray:
+        """
+        Copy of the n oldest unread samples (all if n is None), written
+        into out (a preallocated array, sliced to length) if given.
+        """
+        with self._lock:
+            avail = self._write - self._read
+            n = avail if n is None else min(n, avail)
+            if out is not None:
+                n = min(n, len(out))
+            start = self._read % self._capacity
+            first = min(n, self._capacity - start)
+            out = np.empty(n, dtype=np.float32) if out is None else out[:n]
+            out[:first] = self._buf[start:start + first]
+            out[first:] = self._buf[:n - first]
+            return out
+
+    def consume(self, n: int) -> None:
+        with self._lock:
+            self._read += min(n, self._write - self._read)
+
+# ======================================================
+# LIVE TRANSCRIPTION
+# ======================================================
+
+class LiveTranscriber:
+    """
+    Transcribes audio while it is still being recorded.
+
+    feed() is called from the audio callback and only copies samples
+    into a ring buffer. A worker thread cuts the buffered audio at
+    pauses (or at max_segment_s when the speaker never pauses),
+    transcribes each finished segment and passes its text to on_text.
+    finish() transcribes whatever is left and returns the full text.
+    If the worker fell so far behind that the buffer overwrote audio,
+    or a segment failed, the text has gaps and complete is False; the
+    recording should then be transcribed again from its file.
+    """
+
+    def __init__(self, on_text=None, min_segment_s: float = 4.0, max_segment_s: float = 15.0,
+                 buffer_s: float = 120.0, sampling_rate: int = SAMPLE_RATE, transcribe=None):
+        self.sampling_rate = sampling_rate
+        self.min_segment = int(min_segment_s * sampling_rate)
+        self.max_segment = int(max_segment_s * sampling_rate)
+        self.buffer = RingBuffer(int(buffer_s * sampling_rate))
+        self.on_text = on_text
+        self.texts = []
+        self.failed = 0     # segments whose transcription raised
+        self._transcribe = transcribe or _transcribe_array
+        self._stop = threading.Event()
+        self._data = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="live-asr", daemon=True)
+        self._worker.start()
+
+    def feed(self, samples: np.ndarray) -> None:
+        self.buffer.write(samples)
+        self._data.set()
+
+    def _emit(self, audio: np.ndarray) -> None:
+        text = self._transcribe(audio)
+        if text:
+            self.texts.append(text)
+            if self.on_text:
+                self.on_text(text)
+
+    def _next_cut(self):
+        pending = self.buffer.available()
+        if pending < self.min_segment:
+            return None
+        audio = self.buffer.peek(min(pending, self.max_segment))
+        cut = vad.find_pause(audio, self.sampling_rate, search_from=self.min_segment)
+        if cut is None and pending >= self.max_segment:
+            cut = vad.quietest_point(audio, self.sampling_rate, search_from=self.max_segment // 2)
+        return cut
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._data.wait(timeout=0.5)
+            self._data.clear()
+            cut = self._next_cut()
+            while cut and not self._stop.is_set():
+                audio = self.buffer.peek(cut)
+                self.buffer.consume(cut)
+                try:
+                    self._emit(audio)
+                except Exception as e:
+                    print("Live ASR error:", e)
+                    self.failed += 1
+                cut = self._next_cut()
+
+    @property
+    def complete(self) -> bool:
+        """True if every recorded sample was transcribed."""
+        return self.buffer.dropped == 0 and self.failed == 0
+
+    def finish(self) -> str:
+        """
+        Stops the worker, transcribes the final tail and returns the
+        whole transcript.
+        """
+        self._stop.set()
+        self._data.set()
+        self._worker.join()
+        tail = self.buffer.peek()
+        self.buffer.consume(len(tail))
+        if len(tail):
+            try:
+                self._emit(tail)
+            except Exception as e:
+                print("Live ASR error:", e)
+                self.failed += 1
+        if self.buffer.dropped:
+            print(f"Live ASR fell behind; {self.buffer.dropped / self.sampling_rate:.1f} s of audio "
+                  f"was dropped from the buffer")
+        return " ".join(self.texts).strip()
+
+def _transcribe_array(audio: np.ndarray) -> str:
+    from transcriber import transcribe_segments, join_segments
+
+    return join_segments(transcribe_segments(audio))
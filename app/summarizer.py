@@ -1,8 +1,15 @@
 # summarizer.py
 import os
 import math
-import streamlit as st
-from transformers import pipeline
+
+import models
+import backends
+import metrics
+import inference
+from memo import memoized
+from text_utils import (
+    split_sentences, sentence_units, anchored_spans, anchored_windows, overlap_start
+)
 
 # ======================================================
 # MODEL CONFIG
@@ -13,22 +20,47 @@ SUMMARIZER_MODEL = os.getenv(
     "sshleifer/distilbart-cnn-12-6"
 )
 
+# Summary length limits (in words / tokens)
+SHORT_TEXT_WORDS = 12
+LENGTH_RATIO = 0.45
+MIN_SUMMARY_LEN = 20
+MAX_SUMMARY_LEN = 80
+
+# Long text is split into overlapping token windows that fit the
+# model input (distilbart takes 1024 tokens) and summarized in batches.
+# Window boundaries are anchored to the sentences themselves (see
+# text_utils.anchored_spans), so an edit only changes nearby windows.
+WINDOW_TOKENS = int(os.getenv("SUMMARY_WINDOW_TOKENS", "900"))
+WINDOW_OVERLAP_TOKENS = int(os.getenv("SUMMARY_WINDOW_OVERLAP_TOKENS", "100"))
+WINDOW_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "4"))
+MAX_LONG_SUMMARY_LEN = 160
+MAX_REDUCE_DEPTH = 4
+
 # ======================================================
-# LOAD MODEL (CACHED – LOADS ONLY ONCE)
+# LOAD MODEL (LAZY – LOADS ONLY ONCE)
 # ======================================================
 
-@st.cache_resource(show_spinner="Loading summarization model...")
-def load_summarizer():
-    """
-    Loads the Hugging Face summarization pipeline once.
-    Cached across Streamlit reruns to prevent memory crashes.
-    """
+def _load_summarizer():
+    from transformers import AutoTokenizer, pipeline
+
+    print(f"⏳ Loading summarization model ({SUMMARIZER_MODEL}, {backends.INFERENCE_BACKEND})...")
     return pipeline(
         "summarization",
-        model=SUMMARIZER_MODEL,
-        device=-1  # CPU only (Render-safe)
+        model=backends.load_model(SUMMARIZER_MODEL, "text"),
+        tokenizer=AutoTokenizer.from_pretrained(SUMMARIZER_MODEL),
+        device=backends.pipeline_device()  # CPU only (Render-safe)
     )
 
+models.register("summarizer", _load_summarizer)
+
+def load_summarizer():
+    """
+    Returns the Hugging Face summarization pipeline.
+    Loaded once per process by the shared model registry,
+    which also keeps it across Streamlit reruns.
+    """
+    return models.get_model("summarizer")
+
 # ======================================================
 # UTILS
 # ======================================================
@@ -36,55 +68,237 @@ def load_summarizer():
 def _word_count(text: str) -> int:
     return len(text.strip().split())
 
+def model_settings() -> dict:
+    """
+    Everything that changes the summary for a given corrected text.
+    Used to key cached results.
+    """
+    return {
+        "model": models.model_tag(SUMMARIZER_MODEL),
+        "length_ratio": LENGTH_RATIO,
+        "min_len": MIN_SUMMARY_LEN,
+        "max_len": MAX_SUMMARY_LEN,
+        "max_long_len": MAX_LONG_SUMMARY_LEN,
+        "window_tokens": WINDOW_TOKENS,
+        "window_overlap_tokens": WINDOW_OVERLAP_TOKENS,
+        "windows": "anchored",
+    }
+
 # ======================================================
-# MAIN SUMMARIZATION FUNCTION
+# MAP-REDUCE FOR LONG TEXT
 # ======================================================
 
-def summarize_text(text: str) -> str:
+def _count_tokens(summarizer, text: str) -> int:
+    return len(summarizer.tokenizer.encode(text, add_special_tokens=False))
+
+def _summarize_batch(summarizer, texts: list, max_len: int, min_len: int) -> list:
     """
-    Summarizes input text safely with fallback logic.
+    Summarizes a list of texts, WINDOW_BATCH_SIZE at a time, so memory
+    stays bounded however many windows there are. Texts summarized
+    before with the same model and lengths come from the memo cache.
+    """
+    settings = {"model": models.model_tag(SUMMARIZER_MODEL), "max_len": max_len, "min_len": min_len}
+    return memoized("summary", settings, texts,
+                    lambda todo: _run_summarizer(summarizer, todo, max_len, min_len))
+
+def _run_summarizer(summarizer, texts: list, max_len: int, min_len: int) -> list:
+    summaries = []
+    for i in range(0, len(texts), WINDOW_BATCH_SIZE):
+        output = summarizer(
+            texts[i:i + WINDOW_BATCH_SIZE],
+            max_length=max_len,
+            min_length=min_len,
+            do_sample=False,
+            truncation=True
+        )
+        batch_summaries = [o["summary_text"].strip() for o in output]
+        metrics.tokens(
+            "summarize",
+            input_tokens=sum(_count_tokens(summarizer, t) for t in texts[i:i + WINDOW_BATCH_SIZE]),
+            output_tokens=sum(_count_tokens(summarizer, t) for t in batch_summaries),
+        )
+        summaries.extend(batch_summaries)
+    return summaries
+
+def _map_reduce(summarizer, text: str, depth: int = 0) -> str:
+    """
+    Summarizes each overlapping window of the text, then summarizes
+    the joined partial summaries, recursing until they fit in one
+    window. Work grows roughly linearly with text length.
     """
+    def count(s):
+        return _count_tokens(summarizer, s)
 
-    text = (text or "").strip()
-    if not text:
-        return ""
+    windows = anchored_windows(
+        split_sentences(text), count, WINDOW_TOKENS, WINDOW_OVERLAP_TOKENS
+    )
+    partials = _summarize_batch(
+        summarizer, windows, MAX_SUMMARY_LEN, max(10, MAX_SUMMARY_LEN // 2)
+    )
+    joined = " ".join(partials)
 
-    wc = _word_count(text)
+    # Stop recursing if the partials no longer shrink
+    if count(joined) > WINDOW_TOKENS and depth < MAX_REDUCE_DEPTH and len(joined) < len(text):
+        return _map_reduce(summarizer, joined, depth + 1)
+    return joined
 
-    # If text is already short, return as-is
-    if wc <= 12:
-        return text
+# ======================================================
+# MAIN SUMMARIZATION FUNCTIONS
+# ======================================================
 
+def _length_limits(wc: int, max_cap: int) -> tuple:
     # Dynamic length control
-    max_len = max(20, min(80, math.ceil(wc * 0.45)))
+    max_len = max(MIN_SUMMARY_LEN, min(max_cap, math.ceil(wc * LENGTH_RATIO)))
     min_len = max(10, max_len - 10)
+    return max_len, min_len
 
-    try:
-        summarizer = load_summarizer()
+def _fallback(text: str, error: Exception) -> str:
+    # Graceful fallback (no crash)
+    print("Summarizer error:", error)
+    metrics.fallback("summarize", "first_two_sentences")
 
-        output = summarizer(
-            text,
-            max_length=max_len,
-            min_length=min_len,
-            do_sample=False,
-            truncation=True
-        )
+    # Fallback: first 2 sentences
+    sentences = [s.strip() for s in text.split(".") if s.strip()]
+    return ". ".join(sentences[:2]) + "."
 
-        if isinstance(output, list) and "summary_text" in output[0]:
-            summary = output[0]["summary_text"].strip()
+def summarize_many(texts: list) -> list:
+    """
+    Summarizes several texts, batching those that share the same
+    length limits into one pipeline call.
+    Returns one summary per text, in order (never crashes).
+    Runs on the inference server when one is configured.
+    """
+    if inference.enabled():
+        try:
+            return inference.call("summarize", texts)
+        except inference.ServerUnavailable as e:
+            print(f"{e}; summarizing locally")
+            metrics.fallback("summarize", "server_unavailable")
+        except Exception as e:
+            return [_fallback((t or "").strip(), e) if (t or "").strip() else "" for t in texts]
 
-            # Safety check: summary should be shorter
-            if _word_count(summary) >= wc:
-                return text
+    results = [None] * len(texts)
+    groups = {}  # (max_len, min_len) -> [(index, text, source)]
 
-            return summary
+    for i, text in enumerate(texts):
+        text = (text or "").strip()
+        if not text:
+            results[i] = ""
+            continue
 
-        return str(output)
+        # If text is already short, return as-is
+        if _word_count(text) <= SHORT_TEXT_WORDS:
+            results[i] = text
+            continue
 
-    except Exception as e:
-        # Graceful fallback (no crash)
-        print("Summarizer error:", e)
+        try:
+            with models.use("summarizer") as summarizer:
+                source, max_cap = text, MAX_SUMMARY_LEN
+                if _count_tokens(summarizer, text) > WINDOW_TOKENS:
+                    source = _map_reduce(summarizer, text)
+                    max_cap = MAX_LONG_SUMMARY_LEN
+            limits = _length_limits(_word_count(source), max_cap)
+            groups.setdefault(limits, []).append((i, text, source))
+        except Exception as e:
+            results[i] = _fallback(text, e)
+
+    for (max_len, min_len), items in groups.items():
+        try:
+            with models.use("summarizer") as summarizer:
+                summaries = _summarize_batch(summarizer, [source for _, _, source in items], max_len, min_len)
+            for (i, text, _), summary in zip(items, summaries):
+                # Safety check: summary should be shorter
+                if _word_count(summary) >= _word_count(text):
+                    metrics.fallback("summarize", "not_shorter")
+                    results[i] = text
+                else:
+                    results[i] = summary
+        except Exception as e:
+            for i, text, _ in items:
+                results[i] = _fallback(text, e)
 
-        # Fallback: first 2 sentences
-        sentences = [s.strip() for s in text.split(".") if s.strip()]
-        return ". ".join(sentences[:2]) + "."
+    return results
+
+def summarize_text(text: str) -> str:
+    """
+    Summarizes input text safely with fallback logic.
+    Text longer than the model window is summarized map-reduce style.
+    """
+    return summarize_many([text])[0]
+
+def summarize_stream(pieces, stopwatch=None) -> str:
+    """
+    Summarizes text that arrives in pieces of whole sentences (e.g.
+    corrected transcript sentences). Once the text is longer than one
+    window, each window whose end is settled is summarized right away,
+    while later pieces are still being produced; the partial summaries
+    are combined once the input ends. The windows are the ones
+    summarize_text would use, so the result is the same. Time spent
+    summarizing is added to stopwatch, if given.
+    Always returns a summary (never crashes).
+    """
+    stopwatch = stopwatch or metrics.Stopwatch()
+    if inference.enabled():
+        # The server batches whole texts; summarize once the input ends
+        text = " ".join(pieces).strip()
+        with stopwatch.timing():
+            return summarize_text(text)
+
+    texts, partials = [], []
+    units, lengths, total = [], [], 0
+    done, floor = 0, 0  # first unit not yet summarized; start of the last summarized run
+    pieces = iter(pieces)
+    core_tokens = max(1, WINDOW_TOKENS - WINDOW_OVERLAP_TOKENS)
+    try:
+        def summarize_runs(summarizer, spans):
+            nonlocal floor
+            windows = []
+            for start, end in spans:
+                windows.append(" ".join(units[overlap_start(lengths, start, floor, WINDOW_OVERLAP_TOKENS):end]))
+                floor = start
+            with stopwatch.timing():
+                partials.extend(_summarize_batch(
+                    summarizer, windows, MAX_SUMMARY_LEN, max(10, MAX_SUMMARY_LEN // 2)
+                ))
+
+        for piece in pieces:
+            texts.append(piece)
+            # The model is held only while this piece is handled, not while
+            # the next one is produced, so the memory budget can unload it
+            with models.use("summarizer") as summarizer:
+                new_units, new_lengths = sentence_units(
+                    split_sentences(piece), lambda s: _count_tokens(summarizer, s), core_tokens
+                )
+                units.extend(new_units)
+                lengths.extend(new_lengths)
+                total += sum(new_lengths)
+                if total > WINDOW_TOKENS:
+                    # Every run but the last can no longer change
+                    spans = anchored_spans(units, lengths, core_tokens, start=done)
+                    if len(spans) > 1:
+                        summarize_runs(summarizer, spans[:-1])
+                        done = spans[-1][0]
+
+        text = " ".join(texts).strip()
+        with models.use("summarizer") as summarizer:
+            if _count_tokens(summarizer, text) <= WINDOW_TOKENS:
+                # Fits one window: same as summarizing the whole text
+                with stopwatch.timing():
+                    return summarize_text(text)
+
+            summarize_runs(summarizer, anchored_spans(units, lengths, core_tokens, start=done))
+            with stopwatch.timing():
+                source = " ".join(partials)
+                if _count_tokens(summarizer, source) > WINDOW_TOKENS and len(source) < len(text):
+                    source = _map_reduce(summarizer, source, depth=1)
+
+                max_len, min_len = _length_limits(_word_count(source), MAX_LONG_SUMMARY_LEN)
+                summary = _summarize_batch(summarizer, [source], max_len, min_len)[0]
+        if _word_count(summary) >= _word_count(text):
+            metrics.fallback("summarize", "not_shorter")
+            return text
+        return summary
+    except Exception as e:
+        # Keep consuming so the producer is never left blocked
+        texts.extend(pieces)
+        return _fallback(" ".join(texts).strip(), e)
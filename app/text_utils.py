@@ -0,0 +1,141 @@
+# text_utils.py
+import re
+import zlib
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Anchored windows end after an "anchor" sentence, about one in
+# ANCHOR_EVERY, once they are at least ANCHOR_MIN_FILL full
+ANCHOR_EVERY = 4
+ANCHOR_MIN_FILL = 0.75
+
+def split_sentences(text: str) -> list:
+    """
+    Splits text into sentences on ., ! or ? followed by whitespace.
+    Whisper output is usually punctuated, so this is good enough.
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+def _split_long(sentence: str, count_tokens, max_tokens: int) -> list:
+    # Break a sentence that is too long on its own at word boundaries
+    pieces, piece, piece_len = [], [], 0
+    for word in sentence.split():
+        w = count_tokens(word)
+        if piece and piece_len + w > max_tokens:
+            pieces.append(" ".join(piece))
+            piece, piece_len = [], 0
+        piece.append(word)
+        piece_len += w
+    if piece:
+        pieces.append(" ".join(piece))
+    return pieces
+
+def sentence_units(sentences: list, count_tokens, max_tokens: int) -> tuple:
+    """
+    (units, lengths): the sentences, with any longer than max_tokens
+    split on word boundaries, and the token count of each.
+    """
+    units, lengths = [], []
+    for sentence in sentences:
+        n = count_tokens(sentence)
+        if n > max_tokens:
+            for piece in _split_long(sentence, count_tokens, max_tokens):
+                units.append(piece)
+                lengths.append(count_tokens(piece))
+        else:
+            units.append(sentence)
+            lengths.append(n)
+    return units, lengths
+
+def overlapping_windows(sentences: list, count_tokens, max_tokens: int,
+                        overlap_tokens: int = 0) -> list:
+    """
+    Packs consecutive sentences into windows of at most max_tokens
+    (as measured by count_tokens). Each window repeats trailing
+    sentences of the previous one, up to overlap_tokens, so context
+    is not lost at the boundaries. A sentence longer than max_tokens
+    on its own is split on word boundaries.
+    """
+    units, lengths = sentence_units(sentences, count_tokens, max_tokens)
+
+    windows = []
+    start = 0
+    while start < len(units):
+        end, total = start, 0
+        while end < len(units) and (end == start or total + lengths[end] <= max_tokens):
+            total += lengths[end]
+            end += 1
+        windows.append(" ".join(units[start:end]))
+        if end >= len(units):
+            break
+
+        # Step back over trailing sentences to overlap, always moving forward
+        next_start, overlap = end, 0
+        while next_start - 1 > start and overlap + lengths[next_start - 1] <= overlap_tokens:
+            next_start -= 1
+            overlap += lengths[next_start]
+        start = next_start
+    return windows
+
+def _is_anchor(unit: str) -> bool:
+    # From the unit's own words only, so it is the same in every process
+    return zlib.crc32(" ".join(unit.lower().split()).encode("utf-8")) % ANCHOR_EVERY == 0
+
+def anchored_spans(units: list, lengths: list, max_tokens: int, start: int = 0) -> list:
+    """
+    [(start, end), ...] cutting units[start:] into runs of at most
+    max_tokens. A run ends after an anchor unit once it is
+    ANCHOR_MIN_FILL full, or when the next unit would not fit. Unlike
+    greedy packing, the boundaries after an edited unit line up again
+    at the next anchor, so an edit only moves the runs around it.
+    The last run may still grow if more units are appended.
+    """
+    spans, first, total = [], start, 0
+    for i in range(start, len(units)):
+        if i > first and total + lengths[i] > max_tokens:
+            spans.append((first, i))
+            first, total = i, 0
+        total += lengths[i]
+        if total >= ANCHOR_MIN_FILL * max_tokens and _is_anchor(units[i]):
+            spans.append((first, i + 1))
+            first, total = i + 1, 0
+    if first < len(units):
+        spans.append((first, len(units)))
+    return spans
+
+def overlap_start(lengths: list, start: int, floor: int, overlap_tokens: int) -> int:
+    """
+    Where a window for the run starting at start begins once trailing
+    units of the previous run (starting at floor) are repeated, up to
+    overlap_tokens.
+    """
+    first, overlap = start, 0
+    while first - 1 > floor and overlap + lengths[first - 1] <= overlap_tokens:
+        first -= 1
+        overlap += lengths[first]
+    return first
+
+def anchored_windows(sentences: list, count_tokens, max_tokens: int,
+                     overlap_tokens: int = 0) -> list:
+    """
+    overlapping_windows with content-anchored boundaries (see
+    anchored_spans): editing one sentence changes only the windows
+    around it, so the others can be served from a cache.
+    """
+    core_tokens = max(1, max_tokens - overlap_tokens)
+    units, lengths = sentence_units(sentences, count_tokens, core_tokens)
+    windows, floor = [], 0
+    for start, end in anchored_spans(units, lengths, core_tokens):
+        windows.append(" ".join(units[overlap_start(lengths, start, floor, overlap_tokens):end]))
+        floor = start
+    return windows
+
+def chunk_sentences(sentences: list, count_tokens, max_tokens: int) -> list:
+    """
+    Packs consecutive sentences into non-overlapping chunks of at
+    most max_tokens.
+    """
+    return overlapping_windows(sentences, count_tokens, max_tokens, overlap_tokens=0)
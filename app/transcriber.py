@@ -1,25 +1,412 @@
 # transcriber.py
-from transformers import pipeline
+import os
+import time
+import zlib
+import threading
 
-# Load Whisper only once
-print("⏳ Loading Whisper ASR model (openai/whisper-base)...")
+import numpy as np
 
-asr = pipeline(
-    "automatic-speech-recognition",
-    model="openai/whisper-base",
-    chunk_length_s=30   # safer for longer files
-)
+import models
+import backends
+import metrics
+import inference
+import vad
+from audio import SAMPLE_RATE, load_audio, stream_audio, file_duration
+
+# ======================================================
+# MODEL CONFIG
+# ======================================================
+
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "openai/whisper-base")
+CHUNK_LENGTH_S = 30   # safer for longer files
+
+# Only speech regions found by the VAD are sent to Whisper,
+# ASR_BATCH_SIZE regions per forward pass
+VAD_ENABLED = os.getenv("ASR_VAD", "1") == "1"
+BATCH_SIZE = int(os.getenv("ASR_BATCH_SIZE", "4"))
+
+# Files longer than ASR_STREAM_MIN_S are decoded and transcribed in
+# ASR_STREAM_WINDOW_S windows instead of being decoded whole, so memory
+# stays flat for multi-hour recordings. The last ASR_STREAM_OVERLAP_S of
+# each window is carried into the next one, so speech running over a
+# window edge is never cut.
+STREAM_MIN_S = float(os.getenv("ASR_STREAM_MIN_S", "600"))
+STREAM_WINDOW_S = float(os.getenv("ASR_STREAM_WINDOW_S", "120"))
+STREAM_OVERLAP_S = float(os.getenv("ASR_STREAM_OVERLAP_S", "5"))
+
+# ======================================================
+# MODEL TIERS
+# ======================================================
+# ASR_TIER_MODE picks which Whisper model (and decoding) handles a note:
+#   fixed   - WHISPER_MODEL, greedy (default)
+#   budget  - the most accurate of ASR_TIERS x {greedy, beam} expected to
+#             finish the note within ASR_LATENCY_BUDGET_S
+#   cascade - the first (fastest) tier, re-running segments whose
+#             transcript looks unreliable on the next tier up
+
+TIER_MODE = os.getenv("ASR_TIER_MODE", "fixed").lower()
+TIERS = [m.strip() for m in os.getenv(
+    "ASR_TIERS", "openai/whisper-tiny,openai/whisper-base,openai/whisper-small"
+).split(",") if m.strip()]
+LATENCY_BUDGET_S = float(os.getenv("ASR_LATENCY_BUDGET_S", "10"))
+BEAM_SIZE = int(os.getenv("ASR_BEAM_SIZE", "4"))
+MIN_CONFIDENCE = float(os.getenv("ASR_MIN_CONFIDENCE", "0.6"))
+
+if TIER_MODE not in ("fixed", "budget", "cascade"):
+    raise ValueError(f"ASR_TIER_MODE must be fixed, budget or cascade, got '{TIER_MODE}'")
+
+# Starting CPU real-time factors per model size; replaced by measured
+# values as notes are transcribed
+_DEFAULT_RTF = {"tiny": 0.04, "base": 0.08, "small": 0.25, "medium": 0.7, "large": 1.5}
+BEAM_COST = 1.8
+_rtf = {}
+_rtf_lock = threading.Lock()
+
+# ======================================================
+# LOAD MODEL (LAZY – LOADS ON FIRST USE)
+# ======================================================
+
+def _load_asr(model_id: str = WHISPER_MODEL):
+    from transformers import AutoProcessor, pipeline
+
+    print(f"⏳ Loading Whisper ASR model ({model_id}, {backends.INFERENCE_BACKEND})...")
+    processor = AutoProcessor.from_pretrained(model_id)
+    return pipeline(
+        "automatic-speech-recognition",
+        model=backends.load_model(model_id, "speech"),
+        tokenizer=processor.tokenizer,
+        feature_extractor=processor.feature_extractor,
+        chunk_length_s=CHUNK_LENGTH_S,
+        device=backends.pipeline_device()
+    )
+
+models.register("asr", _load_asr)
+
+def _model_name(model_id: str) -> str:
+    # Other tiers are registered on first use so prewarm only loads "asr"
+    if model_id == WHISPER_MODEL:
+        return "asr"
+    name = f"asr:{model_id}"
+    if name not in models.load_state():
+        models.register(name, lambda: _load_asr(model_id))
+    return name
+
+def model_settings() -> dict:
+    """
+    Everything that changes the transcript for a given audio file.
+    Used to key cached results.
+    """
+    settings = {
+        "model": models.model_tag(WHISPER_MODEL),
+        "chunk_length_s": CHUNK_LENGTH_S,
+        "vad": VAD_ENABLED,
+    }
+    if VAD_ENABLED:
+        settings["vad_settings"] = vad.settings()
+    if TIER_MODE != "fixed":
+        settings["tiers"] = {
+            "mode": TIER_MODE,
+            "models": [models.model_tag(m) for m in TIERS],
+            "latency_budget_s": LATENCY_BUDGET_S if TIER_MODE == "budget" else None,
+            "beam_size": BEAM_SIZE if TIER_MODE == "budget" else None,
+            "min_confidence": MIN_CONFIDENCE if TIER_MODE == "cascade" else None,
+        }
+    return settings
+
+def _tier_label(model_id: str, num_beams: int) -> str:
+    name = model_id.rsplit("/", 1)[-1]
+    return f"{name} beam{num_beams}" if num_beams > 1 else f"{name} greedy"
+
+def estimated_rtf(model_id: str, num_beams: int = 1) -> float:
+    """Expected seconds of compute per second of speech for a tier."""
+    with _rtf_lock:
+        if (model_id, num_beams) in _rtf:
+            return _rtf[(model_id, num_beams)]
+    base = next((v for k, v in _DEFAULT_RTF.items() if k in model_id.lower()), 0.1)
+    return base * (BEAM_COST if num_beams > 1 else 1.0)
+
+def _record_rtf(model_id: str, num_beams: int, seconds: float, audio_seconds: float) -> None:
+    if audio_seconds <= 0:
+        return
+    measured = seconds / audio_seconds
+    with _rtf_lock:
+        old = _rtf.get((model_id, num_beams))
+        _rtf[(model_id, num_beams)] = measured if old is None else 0.8 * old + 0.2 * measured
+
+def plan_tiers(speech_seconds: float) -> list:
+    """
+    The (model_id, num_beams) tiers to try for a note with this much
+    speech, in order; later tiers only see low-confidence segments.
+    """
+    if TIER_MODE == "cascade":
+        return [(m, 1) for m in TIERS]
+    if TIER_MODE == "budget":
+        # Ordered from least to most accurate
+        options = [(m, b) for m in TIERS for b in (1, BEAM_SIZE)]
+        fitting = [o for o in options if speech_seconds * estimated_rtf(*o) <= LATENCY_BUDGET_S]
+        return [fitting[-1] if fitting else options[0]]
+    return [(WHISPER_MODEL, 1)]
+
+def transcript_confidence(text: str, seconds: float) -> float:
+    """
+    0..1 guess at how reliable a segment's transcript is, from the text
+    alone: empty output for real speech, Whisper's repetition loops
+    (high gzip compression ratio) and implausible speaking rates all
+    lower it.
+    """
+    words = text.split()
+    if not words:
+        return 0.0 if seconds >= 1.0 else 1.0
+    confidence = 1.0
+    data = text.encode("utf-8")
+    if len(data) > 40 and len(data) / len(zlib.compress(data)) > 2.4:
+        confidence -= 0.5
+    if seconds >= 2.0:
+        rate = len(words) / seconds
+        if rate < 0.5 or rate > 6.0:
+            confidence -= 0.4
+    if len(set(words)) < len(words) / 3:
+        confidence -= 0.3
+    return max(confidence, 0.0)
+
+# ======================================================
+# TRANSCRIPTION
+# ======================================================
+
+def _text_of(result) -> str:
+    if isinstance(result, dict) and "text" in result:
+        return result["text"].strip()
+    return str(result).strip()
+
+def _speech_regions(audio) -> list:
+    if VAD_ENABLED:
+        return vad.detect_speech(audio, SAMPLE_RATE)
+    return [(0, len(audio))] if len(audio) else []
+
+def _load(path):
+    # Decoded audio, or None (logged) if the file can't be decoded
+    try:
+        audio = path if isinstance(path, np.ndarray) else load_audio(path, SAMPLE_RATE)
+    except Exception as e:
+        print(f"ASR error ({path}):", e)
+        metrics.fallback("transcribe", "decode_error")
+        return None
+    metrics.observe("vns_audio_duration_seconds", len(audio) / SAMPLE_RATE)
+    return audio
+
+def _should_stream(path) -> bool:
+    if isinstance(path, np.ndarray):
+        return False
+    duration = file_duration(path)
+    return duration is not None and duration > STREAM_MIN_S
+
+def _complete_regions(buffer: np.ndarray, limit: int):
+    """
+    Regions of buffer that are known to be complete (they end before
+    limit), and where the unprocessed rest of the buffer starts.
+    """
+    if VAD_ENABLED:
+        regions = [(s, e) for s, e in vad.detect_speech(buffer, SAMPLE_RATE) if e <= limit]
+        return (regions[-1][1] if regions else limit), regions
+    # Without VAD, cut at the quietest moment in the second half
+    cut = vad.quietest_point(buffer[:limit], SAMPLE_RATE, search_from=limit // 2) or limit
+    return cut, [(0, cut)]
+
+def stream_regions(path):
+    """
+    Decodes a file block by block and yields (start_sample, audio) for
+    each speech region, holding at most one window of audio at a time.
+    """
+    window = int(STREAM_WINDOW_S * SAMPLE_RATE)
+    tail = int(STREAM_OVERLAP_S * SAMPLE_RATE)
+    buffer = np.zeros(0, dtype=np.float32)
+    base = total = 0
+    for block in stream_audio(path, SAMPLE_RATE):
+        total += len(block)
+        buffer = np.concatenate([buffer, block])
+        if len(buffer) < window:
+            continue
+        cut, regions = _complete_regions(buffer, len(buffer) - tail)
+        for s, e in regions:
+            yield base + s, buffer[s:e].copy()
+        buffer = buffer[cut:].copy()
+        base += cut
+    for s, e in _speech_regions(buffer):
+        yield base + s, buffer[s:e]
+    metrics.observe("vns_audio_duration_seconds", total / SAMPLE_RATE)
+
+def _iter_streamed(path):
+    plan = plan_tiers(file_duration(path) or 0)
+    batch = []
+
+    def flush():
+        outputs = _recognize_tiered([a for _, a in batch], plan)
+        for (start, audio), (text, tier) in zip(batch, outputs):
+            segment = _segment(start, start + len(audio), text, tier)
+            if segment:
+                yield segment
+
+    for start, audio in stream_regions(path):
+        metrics.inc("vns_speech_seconds_total", len(audio) / SAMPLE_RATE)
+        batch.append((start, audio))
+        if len(batch) == BATCH_SIZE:
+            yield from flush()
+            batch = []
+    if batch:
+        yield from flush()
+
+def recognize(arrays: list, model_id: str = None, num_beams: int = 1) -> list:
+    """
+    Runs Whisper on already cut 16 kHz speech arrays in this process,
+    one text per array. Raises on model errors.
+    """
+    model_id = model_id or WHISPER_MODEL
+    kwargs = {"generate_kwargs": {"num_beams": num_beams}} if num_beams > 1 else {}
+    with models.use(_model_name(model_id)) as asr:
+        start = time.perf_counter()
+        outputs = asr([{"raw": a, "sampling_rate": SAMPLE_RATE} for a in arrays],
+                      batch_size=BATCH_SIZE, **kwargs)
+    _record_rtf(model_id, num_beams, time.perf_counter() - start,
+                sum(len(a) for a in arrays) / SAMPLE_RATE)
+    return [_text_of(out) for out in outputs]
+
+def _recognize(arrays: list, model_id: str = None, num_beams: int = 1) -> list:
+    # On the inference server when one is configured, else locally
+    if inference.enabled():
+        try:
+            return inference.call("asr", arrays, model=model_id, num_beams=num_beams)
+        except inference.ServerUnavailable as e:
+            print(f"{e}; transcribing locally")
+            metrics.fallback("transcribe", "server_unavailable")
+    return recognize(arrays, model_id, num_beams)
+
+def _recognize_tiered(arrays: list, plan: list) -> list:
+    """
+    (text, tier label) per array: every array goes through the first
+    tier of the plan, and those whose transcript confidence is below
+    ASR_MIN_CONFIDENCE move on to the next one.
+    """
+    results = [None] * len(arrays)
+    todo = list(range(len(arrays)))
+    for level, (model_id, num_beams) in enumerate(plan):
+        texts = _recognize([arrays[i] for i in todo], model_id, num_beams)
+        label = _tier_label(model_id, num_beams)
+        last = level == len(plan) - 1
+        retry = []
+        for i, text in zip(todo, texts):
+            results[i] = (text, label)
+            if not last and transcript_confidence(text, len(arrays[i]) / SAMPLE_RATE) < MIN_CONFIDENCE:
+                retry.append(i)
+        if retry:
+            metrics.inc("vns_asr_escalations_total", len(retry), tier=label)
+        todo = retry
+        if not todo:
+            break
+    return results
+
+def _segment(s: int, e: int, text: str, tier: str):
+    metrics.tokens("transcribe", output_tokens=len(text.split()))
+    if not text:
+        return None
+    metrics.inc("vns_asr_segments_total", tier=tier)
+    return {"start": round(s / SAMPLE_RATE, 2), "end": round(e / SAMPLE_RATE, 2), "text": text,
+            "tier": tier}
+
+def transcribe_many(paths: list) -> list:
+    """
+    Transcribes several audio files segment by segment, sending the
+    speech segments of all files through Whisper in shared batches.
+    Items may be file paths or already decoded 16 kHz mono arrays.
+    Returns one segment list per file, each
+    [{"start": s, "end": s, "text": str, "tier": str}, ...] with times
+    in seconds and the Whisper tier that produced the text; silence
+    between segments is never sent to the model. Long files are
+    streamed window by window (see iter_segments).
+    Always returns a list per file (never crashes).
+    """
+    results = [[] for _ in paths]
+    groups = {}  # tier plan -> ([segment audio], [(file index, start, end)])
+    for i, path in enumerate(paths):
+        if _should_stream(path):
+            results[i] = list(iter_segments(path))
+            continue
+        audio = _load(path)
+        if audio is None:
+            continue
+        regions = _speech_regions(audio)
+        if not regions:
+            continue
+        speech = sum(e - s for s, e in regions) / SAMPLE_RATE
+        metrics.inc("vns_speech_seconds_total", speech)
+        inputs, owners = groups.setdefault(tuple(plan_tiers(speech)), ([], []))
+        for s, e in regions:
+            inputs.append(audio[s:e])
+            owners.append((i, s, e))
+
+    for plan, (inputs, owners) in groups.items():
+        try:
+            outputs = _recognize_tiered(inputs, list(plan))
+        except Exception as e:
+            print("ASR error:", e)
+            metrics.fallback("transcribe", "error")
+            continue
+        for (i, s, e), (text, tier) in zip(owners, outputs):
+            segment = _segment(s, e, text, tier)
+            if segment:
+                results[i].append(segment)
+    return results
+
+def iter_segments(path):
+    """
+    Transcribes one audio file or array, yielding its segments as soon
+    as each ASR batch is decoded so later stages can start early.
+    Files longer than ASR_STREAM_MIN_S are decoded in windows, so
+    memory does not grow with the recording's length.
+    Stops quietly on errors (never raises).
+    """
+    if _should_stream(path):
+        try:
+            yield from _iter_streamed(path)
+        except Exception as e:
+            print(f"ASR error ({path}):", e)
+            metrics.fallback("transcribe", "error")
+        return
+
+    audio = _load(path)
+    if audio is None:
+        return
+    regions = _speech_regions(audio)
+    if not regions:
+        return
+    speech = sum(e - s for s, e in regions) / SAMPLE_RATE
+    metrics.inc("vns_speech_seconds_total", speech)
+    plan = plan_tiers(speech)
+
+    for i in range(0, len(regions), BATCH_SIZE):
+        batch = regions[i:i + BATCH_SIZE]
+        try:
+            outputs = _recognize_tiered([audio[s:e] for s, e in batch], plan)
+        except Exception as e:
+            print("ASR error:", e)
+            metrics.fallback("transcribe", "error")
+            return
+        for (s, e), (text, tier) in zip(batch, outputs):
+            segment = _segment(s, e, text, tier)
+            if segment:
+                yield segment
+
+def transcribe_segments(path) -> list:
+    """
+    Transcribes one audio file or array; see transcribe_many.
+    """
+    return transcribe_many([path])[0]
+
+def join_segments(segments: list) -> str:
+    return " ".join(seg["text"] for seg in segments).strip()
 
 def transcribe_audio(path: str) -> str:
     """
     Transcribes an audio file and returns the text.
     Always returns a string (never crashes).
     """
-    try:
-        result = asr(path)
-        if isinstance(result, dict) and "text" in result:
-            return result["text"].strip()
-        return str(result).strip()
-    except Exception as e:
-        print("ASR error:", e)
-        return ""
+    return join_segments(transcribe_segments(path))
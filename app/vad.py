@@ -0,0 +1,152 @@
+# vad.py
+import os
+import numpy as np
+
+# ======================================================
+# VAD CONFIG
+# ======================================================
+# Energy-based voice activity detection: frames whose loudness is
+# well above the recording's noise floor count as speech.
+
+FRAME_MS = 30
+MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "10"))     # above noise floor
+MIN_LEVEL_DB = -50.0        # quieter than this is always silence
+MIN_SPEECH_MS = 250         # shorter blips are dropped
+MIN_SILENCE_MS = int(os.getenv("VAD_MIN_SILENCE_MS", "500"))  # shorter gaps are bridged
+PAD_MS = 200                # context kept around each region
+MAX_SEGMENT_S = 30          # Whisper's input window
+
+def settings() -> dict:
+    return {
+        "frame_ms": FRAME_MS,
+        "margin_db": MARGIN_DB,
+        "min_level_db": MIN_LEVEL_DB,
+        "min_speech_ms": MIN_SPEECH_MS,
+        "min_silence_ms": MIN_SILENCE_MS,
+        "pad_ms": PAD_MS,
+        "max_segment_s": MAX_SEGMENT_S,
+    }
+
+def _frame_levels_db(audio: np.ndarray, frame_len: int) -> np.ndarray:
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+    return 20.0 * np.log10(rms + 1e-10)
+
+def _split_long(start: int, end: int, levels: np.ndarray, max_frames: int) -> list:
+    # Cut regions longer than max_frames at the quietest frame
+    # in the second half of each window
+    pieces = []
+    while end - start > max_frames:
+        lo = start + max_frames // 2
+        hi = start + max_frames
+        cut = lo + int(np.argmin(levels[lo:hi]))
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+def detect_speech(audio: np.ndarray, sampling_rate: int) -> list:
+    """
+    Returns (start_sample, end_sample) pairs for the speech regions in
+    audio, in order. Regions are padded, short gaps are bridged and no
+    region is longer than MAX_SEGMENT_S.
+    """
+    frame_len = int(sampling_rate * FRAME_MS / 1000)
+    levels = _frame_levels_db(audio, frame_len)
+    if len(levels) == 0:
+        return []
+
+    noise_floor = np.percentile(levels, 10)
+    threshold = max(noise_floor + MARGIN_DB, MIN_LEVEL_DB)
+    speech = levels > threshold
+
+    # Collect runs of speech frames
+    regions = []
+    start = None
+    for i, is_speech in enumerate(speech):
+        if is_speech and start is None:
+            start = i
+        elif not is_speech and start is not None:
+            regions.append([start, i])
+            start = None
+    if start is not None:
+        regions.append([start, len(speech)])
+
+    # Bridge short silences
+    min_gap = MIN_SILENCE_MS // FRAME_MS
+    merged = []
+    for region in regions:
+        if merged and region[0] - merged[-1][1] < min_gap:
+            merged[-1][1] = region[1]
+        else:
+            merged.append(region)
+
+    # Drop blips, pad, split to the model window
+    min_len = MIN_SPEECH_MS // FRAME_MS
+    pad = PAD_MS // FRAME_MS
+    max_frames = int(MAX_SEGMENT_S * 1000 / FRAME_MS)
+    out = []
+    for s, e in merged:
+        if e - s < min_len:
+            continue
+        s = max(0, s - pad)
+        e = min(len(levels), e + pad)
+        if out and s < out[-1][1]:
+            s = out[-1][1]
+        if s >= e:
+            continue
+        for ps, pe in _split_long(s, e, levels, max_frames):
+            out.append((ps, pe))
+
+    # A region running to the last frame keeps the unframed tail too
+    n = len(levels)
+    return [(s * frame_len, len(audio) if e == n else e * frame_len) for s, e in out]
+
+def find_pause(audio: np.ndarray, sampling_rate: int, min_pause_ms: int = 300,
+               search_from: int = 0):
+    """
+    Returns the sample index in the middle of the last pause of at
+    least min_pause_ms that starts after search_from, or None. Used to
+    cut live audio where the speaker is not mid-word.
+    """
+    frame_len = int(sampling_rate * FRAME_MS / 1000)
+    levels = _frame_levels_db(audio, frame_len)
+    if len(levels) == 0:
+        return None
+
+    # Live windows are short and mostly speech, so take the floor from
+    # a lower percentile than detect_speech does
+    threshold = max(np.percentile(levels, 2) + MARGIN_DB, MIN_LEVEL_DB)
+    quiet = levels <= threshold
+    need = max(1, min_pause_ms // FRAME_MS)
+    first = search_from // frame_len
+
+    run_end = None
+    run = 0
+    for i in range(len(quiet) - 1, first - 1, -1):
+        if quiet[i]:
+            if run_end is None:
+                run_end = i
+            run += 1
+        else:
+            if run >= need:
+                break
+            run_end, run = None, 0
+    if run < need or run_end is None:
+        return None
+    run_start = run_end - run + 1
+    return ((run_start + run_end + 1) // 2) * frame_len
+
+def quietest_point(audio: np.ndarray, sampling_rate: int, search_from: int = 0) -> int:
+    """
+    Sample index of the quietest frame after search_from.
+    """
+    frame_len = int(sampling_rate * FRAME_MS / 1000)
+    levels = _frame_levels_db(audio, frame_len)
+    first = search_from // frame_len
+    if len(levels) <= first:
+        return len(audio)
+    return (first + int(np.argmin(levels[first:]))) * frame_len
@@ -0,0 +1,185 @@
+"""
+Batch transcribe -> correct -> summarize a folder of audio files.
+
+    python batch_process.py audio_files LibriSpeech --workers 2
+
+Files are processed in groups across a pool of worker processes; each
+worker loads the models once and batches model calls across the files
+of a group. Every finished file is appended to a JSONL manifest, and
+files already in the manifest are skipped when the command is re-run.
+Results are also saved to the results store (one insert per group) so
+they show up in the app's search.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from audio import find_audio_files
+from results import get_store
+
+DEFAULT_MANIFEST = os.path.join("output", "batch_manifest.jsonl")
+STAGES = ("transcribe", "correct", "summarize")
+
+# -----------------------------
+# FILE DISCOVERY / MANIFEST
+# -----------------------------
+def _file_id(path):
+    # Cheap identity for resume: a changed file is processed again
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{int(st.st_mtime)}"
+
+def load_done(manifest_path):
+    done = set()
+    if not os.path.exists(manifest_path):
+        return done
+    with open(manifest_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # partial line from an interrupted run
+            if not entry.get("error"):
+                done.add(entry["file_id"])
+    return done
+
+# -----------------------------
+# WORKER
+# -----------------------------
+def _init_worker(threads):
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+def process_group(paths):
+    """
+    Runs the three stages over a group of files inside one worker.
+    Returns (results, timings, model versions); timings holds the
+    group's wall/CPU seconds per stage.
+    """
+    from transcriber import transcribe_many, join_segments
+    from grammar import correct_grammar_many
+    from summarizer import summarize_many
+    from pipeline import model_versions
+    from cache import hash_file
+    import metrics
+
+    timings = {}
+
+    with metrics.stage("transcribe", timings):
+        segments = transcribe_many(paths)
+        transcripts = [join_segments(s) for s in segments]
+
+    with metrics.stage("correct", timings):
+        corrected = correct_grammar_many(transcripts)
+
+    with metrics.stage("summarize", timings):
+        summaries = summarize_many(corrected)
+
+    results = []
+    for i, path in enumerate(paths):
+        results.append({
+            "file": path,
+            "audio_hash": hash_file(path),
+            "segments": segments[i],
+            "transcript": transcripts[i],
+            "corrected": corrected[i],
+            "summary": summaries[i],
+            "error": None if transcripts[i] else "empty transcript",
+        })
+    return results, timings, model_versions()
+
+def _file_timings(timings, files):
+    """
+    A file's share of its group's stage timings: the stages run over
+    the whole group at once, so each file gets 1/files of the time.
+    """
+    return {
+        stage: {k: None if v is None else round(v / files, 3) for k, v in t.items()}
+        for stage, t in timings.items()
+    }
+
+# -----------------------------
+# MAIN
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch voice note processing")
+    parser.add_argument("inputs", nargs="*", default=["audio_files"],
+                        help="audio files or folders (searched recursively)")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="worker processes, each with its own copy of the models")
+    parser.add_argument("--group-size", type=int, default=8,
+                        help="files per worker task (model calls are batched across them)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    args = parser.parse_args(argv)
+
+    files = find_audio_files(args.inputs)
+    done = load_done(args.manifest)
+    todo = [f for f in files if _file_id(f) not in done]
+    print(f"{len(files)} files found, {len(files) - len(todo)} already done, {len(todo)} to process")
+    if not todo:
+        return
+
+    os.makedirs(os.path.dirname(args.manifest) or ".", exist_ok=True)
+    groups = [todo[i:i + args.group_size] for i in range(0, len(todo), args.group_size)]
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+
+    store = get_store()
+    stage_totals = dict.fromkeys(STAGES, 0.0)
+    processed = failed = 0
+    start = time.perf_counter()
+
+    with open(args.manifest, "a", encoding="utf-8") as manifest, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                initargs=(threads,)) as pool:
+        futures = {pool.submit(process_group, g): g for g in groups}
+        for fut in as_completed(futures):
+            group = futures[fut]
+            try:
+                results, timings, versions = fut.result()
+            except Exception as e:
+                print(f"Group of {len(group)} files failed: {e}")
+                failed += len(group)
+                continue
+
+            for stage, t in timings.items():
+                stage_totals[stage] += t["wall"]
+            for r in results:
+                r["file_id"] = _file_id(r["file"])
+                r["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+                manifest.write(json.dumps(r, ensure_ascii=False) + "\n")
+                if r["error"]:
+                    failed += 1
+                    print(f"{r['file']}: ERROR -> {r['error']}")
+                else:
+                    processed += 1
+                    print(f"📌 {r['file']}: {r['summary']}")
+            manifest.flush()
+            per_file = _file_timings(timings, len(results))
+            store.add_many(
+                {"audio_path": r["file"], "audio_hash": r["audio_hash"], "source": "batch",
+                 "transcript": r["transcript"], "corrected": r["corrected"], "summary": r["summary"],
+                 "models": versions, "timings": per_file}
+                for r in results if not r["error"]
+            )
+
+    elapsed = time.perf_counter() - start
+    print("\n============================")
+    print(f"Processed {processed} files, {failed} failed, in {elapsed:.1f} s "
+          f"({processed / elapsed:.2f} files/sec)")
+    print("Stage time (summed over workers):")
+    for stage in STAGES:
+        print(f"  {stage:<10} {stage_totals[stage]:.1f} s")
+    print(f"Manifest: {args.manifest}")
+    print(f"Results store: {store.db_path}")
+
+if __name__ == "__main__":
+    main()
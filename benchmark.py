@@ -0,0 +1,284 @@
+"""
+End-to-end benchmark of the voice note pipeline.
+
+    python benchmark.py                       # audio_files/ + LibriSpeech/
+    python benchmark.py --standin --limit 20  # offline, tiny stand-in models
+    python benchmark.py --limit 50 --compare-backends torch,int8,onnx
+
+Runs decode -> transcribe -> correct -> summarize on every file and
+reports per-stage latency (mean/p50/p95), ASR real-time factor, model
+load time, peak RSS and word error rate against the LibriSpeech style
+*.trans.txt references found next to the audio. The report is printed
+and written as JSON so runs can be compared. The memo cache, result
+cache and fingerprint dedup are off, so every file reaches the models
+(--warm keeps them on).
+
+--compare-backends runs the benchmark once per INFERENCE_BACKEND and
+reports latency next to accuracy: WER, and how closely each backend's
+corrected text and summary match the first backend's.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from difflib import SequenceMatcher
+from datetime import datetime
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+STAGES = ("decode", "transcribe", "correct", "summarize")
+
+# -----------------------------
+# REFERENCES / WER
+# -----------------------------
+def load_references(files):
+    """Reads '<utterance-id> TEXT' lines from *.trans.txt next to the files."""
+    refs = {}
+    for folder in sorted({os.path.dirname(f) for f in files}):
+        for name in os.listdir(folder):
+            if name.endswith(".trans.txt"):
+                with open(os.path.join(folder, name), encoding="utf-8") as f:
+                    for line in f:
+                        utt, _, text = line.strip().partition(" ")
+                        if text:
+                            refs[utt] = text
+    return refs
+
+def _normalize(text):
+    cleaned = "".join(c if c.isalnum() or c in " '" else " " for c in text.upper())
+    return cleaned.split()
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance and reference length."""
+    ref, hyp = _normalize(reference), _normalize(hypothesis)
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1], len(ref)
+
+# -----------------------------
+# STATS
+# -----------------------------
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+def summarize_latencies(values):
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4) if values else None,
+        "p50": round(percentile(values, 50), 4) if values else None,
+        "p95": round(percentile(values, 95), 4) if values else None,
+    }
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+# -----------------------------
+# BACKEND COMPARISON
+# -----------------------------
+def _agreement(base_files, other_files, field):
+    """Mean word-level similarity of one output field against the baseline run."""
+    base = {f["file"]: f.get(field, "") for f in base_files}
+    scores = [
+        SequenceMatcher(None, base[f["file"]].split(), f.get(field, "").split()).ratio()
+        for f in other_files if f["file"] in base
+    ]
+    return round(sum(scores) / len(scores), 4) if scores else None
+
+def compare_backends(backends, inputs, limit, out):
+    reports = {}
+    for backend in backends:
+        path = f"{os.path.splitext(out)[0]}_{backend}.json"
+        cmd = [sys.executable, os.path.abspath(__file__), *inputs, "--limit", str(limit), "--out", path]
+        print(f"\n▶ INFERENCE_BACKEND={backend}")
+        result = subprocess.run(cmd, env={**os.environ, "INFERENCE_BACKEND": backend})
+        if result.returncode != 0:
+            print(f"Backend {backend} failed (exit {result.returncode})")
+            continue
+        with open(path, encoding="utf-8") as f:
+            reports[backend] = json.load(f)
+    if not reports:
+        return
+
+    baseline = next(iter(reports))
+    rows = []
+    for backend, r in reports.items():
+        lat = r["stage_latency_seconds"]
+        rows.append({
+            "backend": backend,
+            "load_s": round(sum(v or 0 for v in r["model_load_seconds"].values()), 2),
+            "transcribe_p50": lat["transcribe"]["p50"],
+            "correct_p50": lat["correct"]["p50"],
+            "summarize_p50": lat["summarize"]["p50"],
+            "asr_rtf": r["asr_rtf"]["overall"],
+            "peak_rss_mb": r["peak_rss_mb"],
+            "wer": r["wer"],
+            "corrected_agreement": _agreement(reports[baseline]["per_file"], r["per_file"], "corrected"),
+            "summary_agreement": _agreement(reports[baseline]["per_file"], r["per_file"], "summary"),
+        })
+
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"baseline": baseline, "backends": rows}, f, indent=2)
+
+    print("\n============================")
+    print(f"Agreement is measured against '{baseline}'")
+    cols = list(rows[0])
+    print("  ".join(f"{c:>19}" for c in cols))
+    for row in rows:
+        print("  ".join(f"{str(row[c]):>19}" for c in cols))
+    print(f"Comparison: {out}")
+
+# -----------------------------
+# MAIN
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the voice note pipeline")
+    parser.add_argument("inputs", nargs="*", default=["audio_files", "LibriSpeech"])
+    parser.add_argument("--limit", type=int, default=0, help="max files (0 = all)")
+    parser.add_argument("--standin", action="store_true",
+                        help="use tiny deterministic stand-in models (offline)")
+    parser.add_argument("--out", help="JSON report path (default: output/benchmark_<time>.json)")
+    parser.add_argument("--compare-backends",
+                        help="comma-separated INFERENCE_BACKEND values to run and compare")
+    parser.add_argument("--warm", action="store_true",
+                        help="keep the memo cache, result cache and fingerprint dedup on")
+    args = parser.parse_args(argv)
+
+    out = args.out or os.path.join(
+        "output", f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+
+    # Must be set before the stage modules register their models
+    if args.standin:
+        os.environ["STANDIN_MODELS"] = "1"
+    if not args.warm:
+        # Cached outputs would measure lookups, not the models
+        os.environ.update({
+            "MEMO_CACHE": "0",
+            "FINGERPRINT_DEDUP": "0",
+            "RESULT_CACHE_DIR": tempfile.mkdtemp(prefix="voice_note_benchmark_"),
+        })
+
+    if args.compare_backends:
+        compare_backends(args.compare_backends.split(","), args.inputs, args.limit, out)
+        return
+
+    import models
+    import backends
+    import transcriber
+    import grammar
+    import summarizer
+    from audio import SAMPLE_RATE, find_audio_files, load_audio
+
+    files = find_audio_files(args.inputs)
+    if args.limit:
+        files = files[:args.limit]
+    if not files:
+        print("No audio files found.")
+        return
+    refs = load_references(files)
+
+    # Model load time, measured on its own so it doesn't skew stage latency
+    models.prewarm(background=False)
+    load_times = {name: info["load_seconds"] for name, info in models.load_state().items()}
+
+    latencies = {stage: [] for stage in STAGES}
+    rtfs = []
+    total_audio = total_asr = 0.0
+    errors = ref_words = 0
+    per_file = []
+
+    start = time.perf_counter()
+    for path in files:
+        t0 = time.perf_counter()
+        try:
+            audio = load_audio(path)
+        except Exception as e:
+            print(f"{path}: ERROR -> {e}")
+            continue
+        t1 = time.perf_counter()
+        transcript = transcriber.join_segments(transcriber.transcribe_segments(audio))
+        t2 = time.perf_counter()
+        corrected = grammar.correct_grammar(transcript)
+        t3 = time.perf_counter()
+        summary = summarizer.summarize_text(corrected)
+        t4 = time.perf_counter()
+
+        duration = len(audio) / SAMPLE_RATE
+        for stage, secs in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3)):
+            latencies[stage].append(secs)
+        if duration > 0:
+            rtfs.append((t2 - t1) / duration)
+        total_audio += duration
+        total_asr += t2 - t1
+
+        entry = {"file": path, "audio_seconds": round(duration, 2),
+                 "stage_seconds": [round(x, 4) for x in (t1 - t0, t2 - t1, t3 - t2, t4 - t3)],
+                 "transcript": transcript, "corrected": corrected, "summary": summary}
+        utt = os.path.splitext(os.path.basename(path))[0]
+        if utt in refs:
+            e, n = word_errors(refs[utt], transcript)
+            errors += e
+            ref_words += n
+            entry["wer"] = round(e / n, 4) if n else None
+        per_file.append(entry)
+        print(f"{path}: {t4 - t0:.2f} s")
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "backend": backends.INFERENCE_BACKEND,
+        "warm": args.warm,
+        "models": {
+            "asr": transcriber.model_settings(),
+            "grammar": grammar.model_settings(),
+            "summarizer": summarizer.model_settings(),
+        },
+        "files": len(per_file),
+        "audio_seconds": round(total_audio, 2),
+        "wall_seconds": round(elapsed, 2),
+        "model_load_seconds": load_times,
+        "stage_latency_seconds": {s: summarize_latencies(v) for s, v in latencies.items()},
+        "asr_rtf": {"overall": round(total_asr / total_audio, 4) if total_audio else None,
+                    **summarize_latencies(rtfs)},
+        "wer": round(errors / ref_words, 4) if ref_words else None,
+        "wer_reference_words": ref_words,
+        "grammar_skip_rate": grammar.skip_rate(),
+        "peak_rss_mb": peak_rss_mb(),
+        "per_file": per_file,
+    }
+
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print("\n============================")
+    print(f"{report['files']} files, {report['audio_seconds']} s audio, {report['wall_seconds']} s wall")
+    print(f"Model load: {load_times}")
+    for stage, stats in report["stage_latency_seconds"].items():
+        print(f"  {stage:<10} p50 {stats['p50']} s   p95 {stats['p95']} s")
+    print(f"ASR RTF: {report['asr_rtf']['overall']}   WER: {report['wer']}   "
+          f"Peak RSS: {report['peak_rss_mb']} MB   Grammar skip rate: {report['grammar_skip_rate']}")
+    print(f"Report: {out}")
+
+if __name__ == "__main__":
+    main()
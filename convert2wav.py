@@ -1,18 +1,77 @@
-from pydub import AudioSegment
+"""
+Decode audio files to 16 kHz mono float32 arrays across a worker pool.
+
+    python convert2wav.py audio_files LibriSpeech --workers 4
+    python convert2wav.py audio_files --wav-out converted
+
+By default the arrays go into the on-disk audio cache (cache/audio),
+where the app and batch_process.py pick them up with AUDIO_CACHE=1, so
+no intermediate WAV files are needed. --wav-out still writes 16 kHz
+WAVs for tools that want files, mirroring the source paths (a.flac ->
+a.flac.wav) so files with the same name never overwrite each other;
+the output folder itself is never read as input.
+"""
 import os
+import sys
+import time
+import argparse
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from audio import SAMPLE_RATE, AUDIO_CACHE_DIR, find_audio_files, load_many
+
+def wav_path(wav_out: str, path: str) -> str:
+    """Where --wav-out writes a file: its path (relative to here if below it) + .wav."""
+    rel = os.path.relpath(os.path.abspath(path))
+    if rel.startswith(os.pardir):
+        rel = os.path.splitdrive(os.path.abspath(path))[1].lstrip(os.sep)
+    if not rel.lower().endswith(".wav"):
+        rel += ".wav"
+    return os.path.join(wav_out, rel)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Normalize audio to 16 kHz mono")
+    parser.add_argument("inputs", nargs="*", default=["."])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--cache-dir", default=AUDIO_CACHE_DIR)
+    parser.add_argument("--wav-out", help="also write 16 kHz WAV files into this folder")
+    args = parser.parse_args(argv)
+
+    files = find_audio_files(args.inputs)
+    if args.wav_out:
+        import soundfile as sf
+        os.makedirs(args.wav_out, exist_ok=True)
+        # Don't convert the WAVs of an earlier run again
+        out_dir = os.path.join(os.path.realpath(args.wav_out), "")
+        files = [f for f in files if not os.path.realpath(f).startswith(out_dir)]
+
+    start = time.perf_counter()
+    seconds = 0.0
+    ok = 0
+    written = {}  # output path -> source, so one run never overwrites its own output
+    for path, audio, error in load_many(files, workers=args.workers,
+                                        use_cache=True, cache_dir=args.cache_dir):
+        if error:
+            print(f"{path}: ERROR -> {error}")
+            continue
+        if args.wav_out:
+            out = wav_path(args.wav_out, path)
+            if out in written:
+                print(f"{path}: ERROR -> {out} was already written from {written[out]}")
+                continue
+            written[out] = path
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            sf.write(out, audio, SAMPLE_RATE)
+            print(f"Converted {path} to {out}")
+        else:
+            print(f"Normalized {path} ({len(audio) / SAMPLE_RATE:.1f} s)")
+        ok += 1
+        seconds += len(audio) / SAMPLE_RATE
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{ok}/{len(files)} files, {seconds:.0f} s of audio in {elapsed:.1f} s")
 
-# Convert all mp3 files in your folder to wav
-for file in os.listdir():
-    if file.endswith('.mp3'):
-        sound = AudioSegment.from_mp3(file)
-        wav_file = file.replace('.mp3', '.wav')
-        sound.export(wav_file, format='wav')
-        print(f'Converted {file} to {wav_file}')
-
-# Convert all flac files to wav (for LibriSpeech)
-for file in os.listdir():
-    if file.endswith('.flac'):
-        sound = AudioSegment.from_file(file, format='flac')
-        wav_file = file.replace('.flac', '.wav')
-        sound.export(wav_file, format='wav')
-        print(f'Converted {file} to {wav_file}')
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Concurrent-load test of the Streamlit app's processing path.
+
+    python load_test.py --standin --users 1,5,10,20
+    python load_test.py --users 5 --notes 4 --workers 2
+
+Simulates N users on one app instance. Each simulated session does
+what a browser session makes app/app.py do: save an upload from
+audio_files/, submit it to the job queue, then rerun the page every
+POLL_SECONDS (sidebar queries included) until the job is done. The
+sessions share one process, job queue, results store and set of
+models, exactly like sessions on one Streamlit server.
+
+--standin swaps Whisper/T5/DistilBART for the deterministic stand-ins,
+with simulated compute (--standin-asr-rtf, --standin-ms-per-word, at
+most --standin-cpus calls at once) so the queue and models saturate
+the way real ones would. By default the
+run is cold: every upload is a slightly different copy of its file and
+the memo cache and fingerprint dedup are off (--warm keeps them on).
+
+For each user count the report gives throughput, end-to-end latency
+(upload to results shown, p50/p99), queueing delay, processing time
+and memory growth, and flags the first count at which the instance
+saturates. State goes to a temporary directory, not output/ or cache/.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from benchmark import percentile
+
+# Throughput growing less than this fraction as fast as the user count
+# (with jobs waiting longer than they run) means saturated
+SATURATION_SCALING = 0.6
+
+# -----------------------------
+# SIMULATED SESSIONS
+# -----------------------------
+def make_upload(path, rng, unique):
+    """
+    The file as an in-memory upload. unique: a copy with a small random
+    gain change, so its hash differs and it is really processed again.
+    """
+    name = os.path.basename(path)
+    if unique:
+        try:
+            import soundfile as sf
+            audio, sr = sf.read(path, dtype="float32")
+            buffer = io.BytesIO()
+            sf.write(buffer, audio * rng.uniform(0.9, 1.0), sr, format="WAV")
+            buffer.name = os.path.splitext(name)[0] + ".wav"
+            buffer.seek(0)
+            return buffer
+        except Exception:
+            pass  # not readable natively; upload the bytes as they are
+    with open(path, "rb") as f:
+        buffer = io.BytesIO(f.read())
+    buffer.name = name
+    return buffer
+
+def render_page(store, job_queue):
+    # What every rerun of app.py does besides polling the job
+    import models
+    models.load_state()
+    models.memory_usage()
+    job_queue.depth()
+    store.search("", limit=10)
+    store.count()
+
+def run_session(session, files, args, uploads_dir, records):
+    from recorder import save_uploaded_audio
+    from jobs import get_queue, QueueFullError, DONE, FAILED
+    from results import get_store
+
+    rng = random.Random(session)
+    job_queue, store = get_queue(), get_store()
+    for n in range(args.notes):
+        time.sleep(rng.uniform(0, args.think))
+        src = files[(session * args.notes + n) % len(files)]
+        upload = make_upload(src, rng, not args.warm)
+
+        start = time.time()
+        path, digest = save_uploaded_audio(upload, uploads_dir=uploads_dir)
+        try:
+            job_id = job_queue.submit(path, digest)
+        except QueueFullError:
+            records.append({"session": session, "file": src, "status": "rejected"})
+            continue
+
+        job = None
+        deadline = start + args.timeout
+        while time.time() < deadline:
+            render_page(store, job_queue)
+            job = job_queue.get(job_id)
+            if job["status"] in (DONE, FAILED):
+                break
+            time.sleep(args.poll)
+        end = time.time()
+
+        if job is None or job["status"] not in (DONE, FAILED):
+            records.append({"session": session, "file": src, "status": "timeout"})
+            continue
+        records.append({
+            "session": session,
+            "file": src,
+            "status": job["status"],
+            "end_to_end": end - start,
+            "queue_delay": job["started_at"] - job["created_at"],
+            "processing": job["finished_at"] - job["started_at"],
+            "finished_at": job["finished_at"],
+        })
+
+class MemorySampler:
+    """Samples this process's RSS every interval seconds on a thread."""
+
+    def __init__(self, interval=0.5):
+        import models
+        self._rss = models.rss_mb
+        self._interval = interval
+        self._stop = threading.Event()
+        self.samples = []
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self._rss()
+            if rss is not None:
+                self.samples.append(rss)
+            self._stop.wait(self._interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        rss = self._rss()
+        if rss is not None:
+            self.samples.append(rss)
+
+# -----------------------------
+# ONE LOAD LEVEL
+# -----------------------------
+def _stats(values):
+    if not values:
+        return {"p50": None, "p99": None, "max": None}
+    return {"p50": round(percentile(values, 50), 3), "p99": round(percentile(values, 99), 3),
+            "max": round(max(values), 3)}
+
+def run_level(users, files, args, uploads_dir):
+    records = []
+    threads = [
+        threading.Thread(target=run_session, args=(i, files, args, uploads_dir, records),
+                         name=f"session-{i}", daemon=True)
+        for i in range(users)
+    ]
+    start = time.time()
+    with MemorySampler() as memory:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    wall = time.time() - start
+
+    done = [r for r in records if r["status"] == "done"]
+    # Throughput over the span in which jobs were actually finishing
+    span = (max(r["finished_at"] for r in done) - start) if done else wall
+    counts = {s: sum(r["status"] == s for r in records) for s in ("done", "failed", "rejected", "timeout")}
+    rss = memory.samples
+    return {
+        "users": users,
+        **counts,
+        "wall_seconds": round(wall, 2),
+        "throughput_per_min": round(60 * len(done) / span, 2) if span > 0 else None,
+        "end_to_end_seconds": _stats([r["end_to_end"] for r in done]),
+        "queue_delay_seconds": _stats([r["queue_delay"] for r in done]),
+        "processing_seconds": _stats([r["processing"] for r in done]),
+        "rss_mb": {
+            "start": rss[0] if rss else None,
+            "peak": max(rss) if rss else None,
+            "end": rss[-1] if rss else None,
+        },
+    }
+
+def find_saturation(levels):
+    """
+    The first user count at which the instance is saturated, or None:
+    throughput grew less than SATURATION_SCALING as fast as the number
+    of users, and jobs waited in the queue longer than they ran.
+    """
+    for prev, cur in zip(levels, levels[1:]):
+        if not prev["throughput_per_min"] or cur["throughput_per_min"] is None:
+            continue
+        scaling = (cur["throughput_per_min"] / prev["throughput_per_min"]) / (cur["users"] / prev["users"])
+        waiting, running = cur["queue_delay_seconds"]["p50"], cur["processing_seconds"]["p50"]
+        if scaling < SATURATION_SCALING and waiting is not None and waiting > running:
+            return cur["users"]
+    return None
+
+# -----------------------------
+# MAIN
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the voice note app with concurrent sessions")
+    parser.add_argument("inputs", nargs="*", default=["audio_files"])
+    parser.add_argument("--users", default="1,5,10,20", help="comma-separated concurrent session counts")
+    parser.add_argument("--notes", type=int, default=3, help="uploads per session")
+    parser.add_argument("--think", type=float, default=2.0, help="max seconds a user waits before each upload")
+    parser.add_argument("--poll", type=float, default=None, help="page rerun interval (default: the app's)")
+    parser.add_argument("--timeout", type=float, default=600, help="give up on a note after this long")
+    parser.add_argument("--workers", type=int, help="JOB_WORKERS for the job queue")
+    parser.add_argument("--max-queue", type=int, help="JOB_MAX_QUEUE for the job queue")
+    parser.add_argument("--warm", action="store_true",
+                        help="upload files unchanged and keep the memo cache and fingerprint dedup on")
+    parser.add_argument("--standin", action="store_true",
+                        help="use tiny deterministic stand-in models (offline)")
+    parser.add_argument("--standin-asr-rtf", type=float, default=0.1,
+                        help="simulated ASR seconds per second of audio")
+    parser.add_argument("--standin-ms-per-word", type=float, default=2.0,
+                        help="simulated grammar/summarizer milliseconds per input word")
+    parser.add_argument("--standin-cpus", type=int, default=os.cpu_count(),
+                        help="simulated model calls that can run at once (default: CPU cores)")
+    parser.add_argument("--workdir", help="where the run keeps its state (default: a temp dir)")
+    parser.add_argument("--out", help="JSON report path (default: output/loadtest_<time>.json)")
+    args = parser.parse_args(argv)
+
+    out = args.out or os.path.join("output", f"loadtest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="voice_note_loadtest_")
+
+    # Must be set before the app modules read their config
+    os.environ.update({
+        "JOBS_DB": os.path.join(workdir, "jobs.db"),
+        "RESULTS_DB": os.path.join(workdir, "results.db"),
+        "RESULTS_LEGACY_CSV": "",
+        "RESULT_CACHE_DIR": os.path.join(workdir, "results_cache"),
+        "MEMO_DB": os.path.join(workdir, "memo.db"),
+        "FINGERPRINT_DB": os.path.join(workdir, "fingerprints.db"),
+        "METRICS_FILE": os.path.join(workdir, "metrics.prom"),
+    })
+    if args.workers:
+        os.environ["JOB_WORKERS"] = str(args.workers)
+    if args.max_queue:
+        os.environ["JOB_MAX_QUEUE"] = str(args.max_queue)
+    if not args.warm:
+        os.environ.update({"MEMO_CACHE": "0", "FINGERPRINT_DEDUP": "0"})
+    if args.standin:
+        os.environ.update({
+            "STANDIN_MODELS": "1",
+            "STANDIN_ASR_RTF": str(args.standin_asr_rtf),
+            "STANDIN_TEXT_MS_PER_WORD": str(args.standin_ms_per_word),
+            "STANDIN_CPUS": str(args.standin_cpus),
+        })
+
+    import models
+    import jobs
+    from audio import find_audio_files
+
+    files = find_audio_files(args.inputs)
+    if not files:
+        print("No audio files found.")
+        return
+    if args.poll is None:
+        args.poll = 1.0  # app.py's POLL_SECONDS
+    uploads_dir = os.path.join(workdir, "uploads")
+
+    # Model load time is not part of any session's latency
+    models.prewarm(background=False)
+    jobs.get_queue()
+
+    levels = []
+    for users in [int(u) for u in args.users.split(",")]:
+        print(f"▶ {users} concurrent user(s), {args.notes} note(s) each...")
+        level = run_level(users, files, args, uploads_dir)
+        levels.append(level)
+        e2e, delay = level["end_to_end_seconds"], level["queue_delay_seconds"]
+        print(f"  {level['done']} done, {level['failed']} failed, {level['rejected']} rejected, "
+              f"{level['timeout']} timed out · {level['throughput_per_min']} notes/min · "
+              f"e2e p50 {e2e['p50']} s p99 {e2e['p99']} s · queue p50 {delay['p50']} s · "
+              f"RSS {level['rss_mb']['peak']} MB")
+
+    saturation = find_saturation(levels)
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "cpus": os.cpu_count(),
+        "standin": args.standin,
+        "standin_cpus": args.standin_cpus if args.standin else None,
+        "warm": args.warm,
+        "job_workers": jobs.JOB_WORKERS,
+        "job_max_queue": jobs.JOB_MAX_QUEUE,
+        "notes_per_session": args.notes,
+        "files": len(files),
+        "workdir": workdir,
+        "levels": levels,
+        "saturates_at_users": saturation,
+    }
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print("\n============================")
+    cols = ("users", "done", "rejected", "notes/min", "e2e p50", "e2e p99", "queue p50", "queue p99", "RSS peak")
+    print("  ".join(f"{c:>10}" for c in cols))
+    for lv in levels:
+        row = (lv["users"], lv["done"], lv["rejected"], lv["throughput_per_min"],
+               lv["end_to_end_seconds"]["p50"], lv["end_to_end_seconds"]["p99"],
+               lv["queue_delay_seconds"]["p50"], lv["queue_delay_seconds"]["p99"], lv["rss_mb"]["peak"])
+        print("  ".join(f"{str(v):>10}" for v in row))
+    if saturation:
+        print(f"Saturated at {saturation} users: throughput no longer keeps up and jobs wait longer "
+              "than they run. Plan instance counts below that.")
+    else:
+        print("No saturation within the tested user counts.")
+    print(f"Report: {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+# conftest.py
+import os
+import sys
+import tempfile
+
+# Tests run offline with the stand-in models and keep every store in a
+# scratch directory. Must be set before the app modules read their config.
+_WORKDIR = tempfile.mkdtemp(prefix="voice_note_tests_")
+os.environ.update({
+    "STANDIN_MODELS": "1",
+    "PREWARM_MODELS": "0",
+    "MEMO_CACHE": "0",
+    "FINGERPRINT_DEDUP": "0",
+    "JOBS_DB": os.path.join(_WORKDIR, "jobs.db"),
+    "RESULTS_DB": os.path.join(_WORKDIR, "results.db"),
+    "RESULTS_LEGACY_CSV": "",
+    "RESULT_CACHE_DIR": os.path.join(_WORKDIR, "results_cache"),
+    "MEMO_DB": os.path.join(_WORKDIR, "memo.db"),
+    "FINGERPRINT_DB": os.path.join(_WORKDIR, "fingerprints.db"),
+    "METRICS_FILE": os.path.join(_WORKDIR, "metrics.prom"),
+})
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
@@ -0,0 +1,73 @@
+# test_apply_edit.py
+import pytest
+
+import grammar
+import pipeline
+import summarizer
+from cache import ResultCache, make_key, hash_text
+from text_utils import anchored_windows, split_sentences
+
+def _merge_first_two(texts):
+    # A correction that joins the first two sentences of each run
+    out = []
+    for text in texts:
+        parts = split_sentences(text)
+        if len(parts) > 1:
+            parts = [parts[0].rstrip(".") + " " + parts[1]] + parts[2:]
+        out.append(" ".join(p[0].upper() + p[1:] for p in parts))
+    return out
+
+@pytest.fixture
+def calls(monkeypatch):
+    seen = []
+
+    def correct_many(texts, *args, **kwargs):
+        seen.extend(texts)
+        return _merge_first_two(texts)
+
+    monkeypatch.setattr(grammar, "correct_grammar_many", correct_many)
+    monkeypatch.setattr(summarizer, "summarize_text", lambda text: text[:20])
+    return seen
+
+def test_merged_run_keeps_its_text_across_edits(tmp_path, calls):
+    cache = ResultCache(str(tmp_path))
+    result = pipeline.apply_edit({"transcript": "", "corrected": ""}, "I went. to the shop.", cache)
+    assert result["corrected"] == "I went to the shop."
+    assert result["sentence_map"] == [["I went. to the shop.", "I went to the shop."]]
+
+    # Only the first sentence changes; the merged run is corrected again as a whole
+    result = pipeline.apply_edit(result, "I walked. to the shop. Then home.", cache)
+    assert calls[-1] == "I walked. to the shop. Then home."
+    assert "to the shop" in result["corrected"]
+    assert result["changed_sentences"] == 3
+
+def test_unchanged_sentences_are_reused(tmp_path, calls):
+    cache = ResultCache(str(tmp_path))
+    previous = {"transcript": "One here. Two here. Three here.",
+                "corrected": "One here. Two here. Three here."}
+    result = pipeline.apply_edit(previous, "One here. Two there. Three here.", cache)
+    assert calls == ["Two there."]
+    assert result["changed_sentences"] == 1
+    assert result["corrected"] == "One here. Two there. Three here."
+    assert [source for source, _ in result["sentence_map"]] == ["One here.", "Two there.", "Three here."]
+
+def test_edit_only_changes_nearby_summary_windows():
+    sentences = [f"Sentence number {i} says something about topic {i % 7}." for i in range(400)]
+    edited = list(sentences)
+    edited[50] = "A much longer replacement sentence that adds quite a few extra words here."
+
+    def count(s):
+        return len(s.split())
+
+    before = anchored_windows(sentences, count, 120, 20)
+    after = anchored_windows(edited, count, 120, 20)
+    assert len(before) > 10
+    assert len(set(after) - set(before)) <= 3
+
+def test_spliced_correction_is_not_cached_as_canonical(tmp_path, calls):
+    cache = ResultCache(str(tmp_path))
+    result = pipeline.apply_edit({"transcript": "", "corrected": ""}, "I went. to the shop.", cache)
+    key = make_key("corrected", hash_text(result["transcript"]), grammar.model_settings())
+    assert cache.get(key) is None
+    assert cache.get(make_key("summary", hash_text(result["corrected"]), summarizer.model_settings())) == \
+        result["summary"]
@@ -0,0 +1,76 @@
+# test_chunking.py
+import random
+
+import pytest
+
+import grammar
+import summarizer
+from text_utils import split_sentences, chunk_sentences, anchored_windows
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+class WordTokenizer:
+    # One token per word, the shape grammar.plan_correction expects
+    def encode(self, text, add_special_tokens=True):
+        return text.split()
+
+def _sentences(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [" ".join([f"S{i}"] + [f"w{j}" for j in range(rng.randint(2, 14))]) + "." for i in range(n)]
+
+@pytest.mark.parametrize("max_tokens", [8, 20, 64])
+def test_chunks_fit_and_keep_sentence_order(max_tokens):
+    sentences = _sentences(60)
+    chunks = chunk_sentences(sentences, count_words, max_tokens)
+    assert all(count_words(c) <= max_tokens for c in chunks)
+    # Non-overlapping: joined back, the chunks are the text (long sentences split on words)
+    assert " ".join(chunks).split() == " ".join(sentences).split()
+
+def test_plan_correction_chunks_fit_and_keep_order():
+    text = " ".join(s if i % 3 else s.lower() for i, s in enumerate(_sentences(40, seed=1)))
+    parts = grammar.plan_correction(text, WordTokenizer(), max_chunk_tokens=24)
+
+    assert any(needs for needs, _ in parts) and not all(needs for needs, _ in parts)
+    assert all(count_words(c) <= 24 for needs, c in parts if needs)
+    assert " ".join(c for _, c in parts).split() == text.split()
+
+@pytest.mark.parametrize("max_tokens,overlap", [(40, 0), (40, 10), (100, 25)])
+def test_windows_fit_keep_order_and_overlap(max_tokens, overlap):
+    sentences = _sentences(80, seed=2)
+    windows = anchored_windows(sentences, count_words, max_tokens, overlap)
+    assert len(windows) > 2
+    assert all(count_words(w) <= max_tokens for w in windows)
+
+    order = {s: i for i, s in enumerate(sentences)}
+    spans = []
+    for w in windows:
+        ids = [order[s] for s in split_sentences(w)]
+        assert ids == list(range(ids[0], ids[-1] + 1))  # consecutive sentences, in order
+        spans.append((ids[0], ids[-1]))
+    assert spans[0][0] == 0 and spans[-1][1] == len(sentences) - 1
+
+    longest = max(count_words(s) for s in sentences)
+    for (_, prev_end), (start, _) in zip(spans, spans[1:]):
+        repeated = sum(count_words(sentences[i]) for i in range(start, prev_end + 1))
+        assert start <= prev_end + 1  # no sentence is left out
+        # As much trailing context as fits the overlap, without exceeding it
+        assert repeated <= overlap
+        assert repeated > overlap - longest
+
+def test_map_reduce_summarizes_each_window(monkeypatch):
+    monkeypatch.setattr(summarizer, "WINDOW_TOKENS", 60)
+    monkeypatch.setattr(summarizer, "WINDOW_OVERLAP_TOKENS", 12)
+    seen = []
+
+    def fake_batch(model, texts, max_len, min_len):
+        seen.append(list(texts))
+        return ["short." for _ in texts]
+
+    monkeypatch.setattr(summarizer, "_summarize_batch", fake_batch)
+    text = " ".join(_sentences(50, seed=3))
+    with summarizer.models.use("summarizer") as model:
+        summarizer._map_reduce(model, text)
+        count = lambda s: summarizer._count_tokens(model, s)  # noqa: E731
+        expected = anchored_windows(split_sentences(text), count, 60, 12)
+    assert seen[0] == expected
@@ -0,0 +1,67 @@
+# test_fingerprint.py
+import numpy as np
+import soundfile as sf
+
+import fingerprint
+import pipeline
+from audio import SAMPLE_RATE
+from cache import ResultCache
+from results import get_store
+
+def _note(seconds: float, seed: int) -> np.ndarray:
+    # Bursts of modulated noise ("words") separated by pauses
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    t = 0.3
+    while t < seconds - 2:
+        n = int(rng.uniform(0.5, 1.5) * SAMPLE_RATE)
+        start = int(t * SAMPLE_RATE)
+        envelope = 0.5 + 0.5 * np.sin(np.linspace(0, 4 * np.pi, n))
+        audio[start:start + n] = 0.25 * envelope * rng.standard_normal(n)
+        t += n / SAMPLE_RATE + rng.uniform(0.2, 0.8)
+    return audio
+
+def _index(tmp_path, monkeypatch):
+    index = fingerprint.FingerprintIndex(str(tmp_path / "fingerprints.db"))
+    monkeypatch.setattr(fingerprint, "FINGERPRINT_DEDUP", True)
+    monkeypatch.setattr(fingerprint, "_index", index)
+    return index
+
+def test_reencoded_and_noisy_copies_match(tmp_path, monkeypatch):
+    _index(tmp_path, monkeypatch)
+    audio = _note(20, seed=1)
+    original = str(tmp_path / "note.wav")
+    sf.write(original, audio, SAMPLE_RATE, subtype="FLOAT")
+    assert fingerprint.find_duplicate(original, "original") is None
+
+    reencoded = str(tmp_path / "note.flac")
+    sf.write(reencoded, audio, SAMPLE_RATE, subtype="PCM_16")
+    assert fingerprint.find_duplicate(reencoded, "reencoded") == "original"
+
+    noisy = audio + 0.01 * np.random.default_rng(0).standard_normal(len(audio)).astype(np.float32)
+    assert fingerprint.find_duplicate(None, "noisy", audio=noisy) in ("original", "reencoded")
+
+def test_unrelated_clip_does_not_match(tmp_path, monkeypatch):
+    index = _index(tmp_path, monkeypatch)
+    assert fingerprint.find_duplicate(None, "first", audio=_note(20, seed=1)) is None
+    assert fingerprint.find_duplicate(None, "other", audio=_note(20, seed=2)) is None
+    assert index.count() == 2
+
+def test_duplicate_reuses_the_stored_result(tmp_path, monkeypatch):
+    _index(tmp_path, monkeypatch)
+    cache = ResultCache(str(tmp_path / "cache"))
+    audio = _note(20, seed=3)
+    fingerprint.find_duplicate(None, "earlier", audio=audio)
+    get_store().add(audio_hash="earlier", source="test", transcript="buy milk", corrected="Buy milk.",
+                    summary="Milk.", models=pipeline.model_versions())
+
+    called = []
+    monkeypatch.setattr(pipeline.transcriber, "iter_segments", lambda *a, **k: called.append(a) or iter(()))
+    monkeypatch.setattr(pipeline.transcriber, "transcribe_segments", lambda *a, **k: called.append(a) or [])
+    path = str(tmp_path / "copy.flac")
+    sf.write(path, audio, SAMPLE_RATE)
+    result = pipeline.process_audio(path, cache=cache, audio_hash="copy")
+
+    assert not called
+    assert result["duplicate_of"] == "earlier"
+    assert (result["transcript"], result["corrected"], result["summary"]) == ("buy milk", "Buy milk.", "Milk.")
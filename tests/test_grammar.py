@@ -0,0 +1,30 @@
+# test_grammar.py
+import pytest
+
+import grammar
+
+CLEAN = [
+    "I met a user at a university.",
+    "It was a one-off, so a European team handled it.",
+    "She is a usual guest and a unique one.",
+    "Once upon a time there was an apple.",
+    "Remember to call the dentist at 9.",
+]
+
+DIRTY = [
+    "he go home now.",
+    "Buy a umbrella before it rains.",
+    "Give me a orange.",
+    "They was late again.",
+    "We could of finished it yesterday.",
+    "I think i forgot the the keys.",
+    "send the report tomorrow",
+]
+
+@pytest.mark.parametrize("sentence", CLEAN)
+def test_clean_sentences_skip_the_model(sentence):
+    assert grammar.correction_score(sentence) < grammar.SKIP_THRESHOLD
+
+@pytest.mark.parametrize("sentence", DIRTY)
+def test_dirty_sentences_go_to_the_model(sentence):
+    assert grammar.correction_score(sentence) >= grammar.SKIP_THRESHOLD
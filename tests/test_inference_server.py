@@ -0,0 +1,58 @@
+# test_inference_server.py
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import inference_server  # noqa: F401  (clears INFERENCE_URL for this process)
+import inference
+import grammar
+from inference_server import Handler, MicroBatcher
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+def test_concurrent_requests_share_one_batch():
+    batches = []
+
+    def run_many(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    batcher = MicroBatcher("test", run_many, window_ms=200, max_batch=16)
+    results = {}
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, batcher.submit([i, i + 100])))
+               for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(batches) == 1 and sorted(batches[0]) == sorted([0, 1, 2, 3, 100, 101, 102, 103])
+    assert results == {i: [i * 10, (i + 100) * 10] for i in range(4)}
+
+def test_server_corrects_and_rejects_unknown_tiers(server_url):
+    texts = ["he go home now", "this is fine."]
+    reply = inference.request("POST", "/correct", {"items": texts}, url=server_url)
+    assert reply["results"] == grammar.correct_grammar_many(texts)
+
+    conn = inference._connection(server_url)
+    conn.request("POST", "/asr", body=json.dumps({"items": [], "model": "no-such-model"}))
+    response = conn.getresponse()
+    assert response.status == 400
+    assert "configured ASR tiers" in json.loads(response.read())["error"]
+    conn.close()
+
+def test_unreachable_server_falls_back_to_local_models(monkeypatch):
+    texts = ["he go home now"]
+    local = grammar.correct_grammar_many(texts)
+    monkeypatch.setattr(inference, "INFERENCE_URL", "http://127.0.0.1:9")  # nothing listens there
+    with pytest.raises(inference.ServerUnavailable):
+        inference.call("correct", texts)
+    assert grammar.correct_grammar_many(texts) == local
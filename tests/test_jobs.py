@@ -0,0 +1,43 @@
+# test_jobs.py
+import sqlite3
+import time
+
+import jobs
+
+def _wait(queue, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in (jobs.DONE, jobs.FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def _process(audio_path, audio_hash, on_stage):
+    return {"transcript": audio_path}
+
+def test_done_jobs_are_reused_only_with_the_same_settings(tmp_path):
+    queue = jobs.JobQueue(str(tmp_path / "jobs.db"), workers=1, process=_process)
+    first = queue.submit("a.wav", "hash-a", settings_key="v1")
+    _wait(queue, first)
+    assert queue.submit("a.wav", "hash-a", settings_key="v1") == first
+    second = queue.submit("a.wav", "hash-a", settings_key="v2")
+    assert second != first
+    assert _wait(queue, second)["status"] == jobs.DONE
+
+def test_only_jobs_of_stopped_processes_are_requeued(tmp_path):
+    db = str(tmp_path / "jobs.db")
+    jobs.JobQueue(db, workers=0, process=_process)
+    conn = sqlite3.connect(db)
+    rows = [("live", jobs._OWNER), ("gone", "no-such-host:1"), ("legacy", None)]
+    conn.executemany(
+        "INSERT INTO jobs (id, audio_path, status, created_at, owner) VALUES (?, 'x.wav', ?, ?, ?)",
+        [(job_id, jobs.RUNNING, time.time(), owner) for job_id, owner in rows]
+    )
+    conn.commit()
+    conn.close()
+
+    queue = jobs.JobQueue(db, workers=0, process=_process)
+    assert queue.get("live")["status"] == jobs.RUNNING
+    assert queue.get("gone")["status"] == jobs.QUEUED
+    assert queue.get("legacy")["status"] == jobs.QUEUED
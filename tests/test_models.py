@@ -0,0 +1,23 @@
+# test_models.py
+import models
+
+def test_model_in_use_is_not_unloaded_as_idle():
+    models.register("test-model", lambda: object())
+    with models.use("test-model") as model:
+        assert not models.unload("test-model", reason="idle", if_unused=True)
+        assert models.get_model("test-model") is model
+    assert models.unload("test-model", reason="idle", if_unused=True)
+    assert not models.is_loaded("test-model")
+
+def test_stream_summary_releases_the_model_between_pieces():
+    import summarizer
+
+    held = []
+
+    def pieces():
+        for i in range(20):
+            held.append(models._in_use.get("summarizer", 0))
+            yield f"Note number {i} is about the weekly plan. We should finish task {i} soon."
+
+    summarizer.summarize_stream(pieces())
+    assert held and not any(held)
@@ -0,0 +1,40 @@
+# test_overlapped.py
+import grammar
+import pipeline
+import summarizer
+
+def _segments():
+    # Segment boundaries fall mid-sentence, as VAD cuts do
+    words = []
+    for i in range(300):
+        words.extend(f"sentence {i} is here and".split() if i % 3 else f"Sentence {i} is fine.".split())
+        words[-1] = words[-1].rstrip(".") + "."
+    return [{"text": " ".join(words[i:i + 7]), "start": i, "end": i + 7} for i in range(0, len(words), 7)]
+
+def test_overlapped_matches_sequential():
+    segments = _segments()
+    result = pipeline.run_overlapped(iter(segments))
+    transcript = " ".join(seg["text"] for seg in segments)
+    corrected = grammar.correct_grammar(transcript)
+    assert result["transcript"] == transcript
+    assert result["corrected"] == corrected
+    assert result["summary"] == summarizer.summarize_text(corrected)
+
+def test_correct_stream_batches_sentences(monkeypatch):
+    calls = []
+    real = grammar.correct_grammar_many
+
+    def correct_many(texts, *args, **kwargs):
+        calls.append(texts)
+        return real(texts, *args, **kwargs)
+
+    monkeypatch.setattr(grammar, "correct_grammar_many", correct_many)
+    list(grammar.correct_stream(seg["text"] for seg in _segments()))
+    # One model call per run of sentences, not one per segment
+    assert 1 < len(calls) < len(_segments()) / 4
+
+def test_overlapped_timings_exclude_waiting():
+    timings = {}
+    pipeline.run_overlapped(iter(_segments()), timings=timings)
+    assert set(timings) == {"transcribe", "correct", "summarize"}
+    assert all(t["cpu"] is None for t in timings.values())
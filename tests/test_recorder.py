@@ -0,0 +1,99 @@
+# test_recorder.py
+import io
+import os
+import time
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+import recorder
+from recorder import Recorder, save_uploaded_audio, cleanup_uploads
+from streaming import RingBuffer, LiveTranscriber
+
+SR = 16000
+
+def _tone(seconds, sr=SR):
+    t = np.arange(int(seconds * sr)) / sr
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+def _feed(recorder, audio, block=1024):
+    for i in range(0, len(audio), block):
+        recorder.feed(audio[i:i + block])
+
+def test_ring_buffer_wraps_around_and_counts_drops():
+    buf = RingBuffer(8)
+    buf.write(np.arange(6, dtype=np.float32))
+    buf.consume(4)
+    buf.write(np.arange(6, 10, dtype=np.float32))  # wraps past the end
+    assert buf.available() == 6
+    assert buf.peek().tolist() == [4, 5, 6, 7, 8, 9]
+
+    out = np.zeros(4, dtype=np.float32)
+    assert buf.peek(out=out).tolist() == [4, 5, 6, 7]
+    assert buf.dropped == 0
+
+    buf.write(np.arange(10, 14, dtype=np.float32))  # 2 unread samples overwritten
+    assert buf.dropped == 2
+    assert buf.peek().tolist() == list(range(6, 14))
+
+def test_synthetic_feed_is_written_and_kept(tmp_path):
+    audio = _tone(3.0)
+    recorder = Recorder(str(tmp_path / "note.wav"), fmt="wav").start(microphone=False)
+    _feed(recorder, audio)
+    path, kept = recorder.stop()
+
+    written, sr = sf.read(path, dtype="float32")
+    assert sr == SR
+    assert recorder.dropped == 0
+    np.testing.assert_allclose(written, audio, atol=1e-4)  # PCM_16
+    np.testing.assert_array_equal(kept, audio)
+
+def test_long_recording_is_not_kept_in_memory(tmp_path):
+    audio = _tone(3.0)
+    recorder = Recorder(str(tmp_path / "note.flac"), keep_s=1.0).start(microphone=False)
+    _feed(recorder, audio)
+    path, kept = recorder.stop()
+
+    assert kept is None
+    assert sf.info(path).frames == len(audio)
+
+def test_live_transcriber_is_incomplete_after_drops():
+    live = LiveTranscriber(transcribe=lambda a: "", buffer_s=1.0, min_segment_s=10.0)
+    live.feed(_tone(1.5))  # more than the buffer holds before the worker cuts anything
+    live.finish()
+    assert live.buffer.dropped > 0
+    assert not live.complete
+
+class _Upload(io.BytesIO):
+    # What Streamlit's UploadedFile offers: a name and a file interface
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+def test_uploads_are_named_by_content(tmp_path):
+    first, first_hash = save_uploaded_audio(_Upload("note.wav", b"a" * 3000), tmp_path)
+    second, second_hash = save_uploaded_audio(_Upload("note.wav", b"b" * 3000), tmp_path)
+    again, again_hash = save_uploaded_audio(_Upload("other.wav", b"a" * 3000), tmp_path)
+
+    assert first != second and first_hash != second_hash
+    assert (again, again_hash) == (first, first_hash)
+    assert open(first, "rb").read() == b"a" * 3000
+    assert open(second, "rb").read() == b"b" * 3000
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in (first, second))
+
+def test_oversized_upload_is_rejected_and_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(recorder, "UPLOAD_CHUNK_BYTES", 1024)
+    with pytest.raises(ValueError, match="limit"):
+        save_uploaded_audio(_Upload("big.wav", b"x" * 5000), tmp_path, max_bytes=4096)
+    assert os.listdir(tmp_path) == []
+
+def test_cleanup_removes_old_and_excess_uploads(tmp_path):
+    now = time.time()
+    for i, age_hours in enumerate([48, 3, 2, 1]):
+        path = tmp_path / f"upload_{i}.wav"
+        path.write_bytes(b"x")
+        os.utime(path, (now - age_hours * 3600,) * 2)
+
+    cleanup_uploads(tmp_path, max_age_hours=24, max_files=2, force=True)
+    assert sorted(os.listdir(tmp_path)) == ["upload_2.wav", "upload_3.wav"]
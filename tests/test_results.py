@@ -0,0 +1,54 @@
+# test_results.py
+import csv
+
+import pytest
+
+from results import ResultStore
+
+def _store(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"), legacy_csv="")
+    store.add_many([
+        {"audio_hash": "a", "transcript": "call the dentist tomorrow", "corrected": "Call the dentist tomorrow.",
+         "summary": "Dentist call.", "created_at": 1.0},
+        {"audio_hash": "b", "transcript": "buy milk and bread", "corrected": "Buy milk and bread.",
+         "summary": "Groceries.", "timings": {"correct": {"wall": 0.1, "cpu": 0.1}}, "created_at": 2.0},
+    ])
+    return store
+
+@pytest.mark.parametrize("fts", [True, False])
+def test_search_matches_all_words(tmp_path, fts):
+    store = _store(tmp_path)
+    if not fts:
+        store.fts = False  # as on SQLite builds without FTS5
+    elif not store.fts:
+        pytest.skip("SQLite without FTS5")
+
+    assert [r["audio_hash"] for r in store.search("milk")] == ["b"]
+    assert [r["audio_hash"] for r in store.search("dentist tomorrow")] == ["a"]
+    assert store.search("dentist milk") == []
+    assert [r["audio_hash"] for r in store.search("")] == ["b", "a"]  # most recent first
+    assert store.search("milk")[0]["timings"] == {"correct": {"wall": 0.1, "cpu": 0.1}}
+
+def test_fts_query_escapes_input_and_matches_prefixes(tmp_path):
+    store = _store(tmp_path)
+    if not store.fts:
+        pytest.skip("SQLite without FTS5")
+    assert [r["audio_hash"] for r in store.search("dent")] == ["a"]
+    assert store.search('"milk OR (') == []
+    assert "**" in store.search("milk")[0]["snippet"]
+
+def test_legacy_csv_is_imported_once(tmp_path):
+    legacy = tmp_path / "voice_note_results.csv"
+    with open(legacy, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, ["timestamp", "audio_file", "original", "corrected", "summary"])
+        writer.writeheader()
+        writer.writerow({"timestamp": "2024-05-01T10:00:00", "audio_file": "old.wav",
+                         "original": "pick up the parcel", "corrected": "Pick up the parcel.", "summary": "Parcel."})
+        writer.writerow({"timestamp": "not a date", "audio_file": "older.wav",
+                         "original": "water the plants", "corrected": "Water the plants.", "summary": "Plants."})
+
+    store = ResultStore(str(tmp_path / "results.db"), legacy_csv=str(legacy))
+    assert store.count() == 2
+    assert store.search("parcel")[0]["source"] == "csv"
+    assert store.import_csv(str(legacy)) == 0
+    assert ResultStore(str(tmp_path / "results.db"), legacy_csv=str(legacy)).count() == 2
@@ -0,0 +1,50 @@
+# test_streamed_transcription.py
+import numpy as np
+import soundfile as sf
+
+import transcriber
+from audio import SAMPLE_RATE
+
+def _speech_like(seconds: float, seed: int = 0) -> np.ndarray:
+    # Bursts of modulated noise ("words") separated by pauses of varying length
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    t = 0.5
+    while t < seconds - 2:
+        length = rng.uniform(0.8, 2.5)
+        n = int(length * SAMPLE_RATE)
+        start = int(t * SAMPLE_RATE)
+        envelope = 0.5 + 0.5 * np.sin(np.linspace(0, 6 * np.pi * length, n))
+        audio[start:start + n] = 0.3 * envelope * rng.standard_normal(n).astype(np.float32)
+        t += length + rng.uniform(0.4, 1.5)
+    return audio
+
+def test_windowed_matches_full(tmp_path, monkeypatch):
+    audio = _speech_like(90)
+    path = str(tmp_path / "long.wav")
+    sf.write(path, audio, SAMPLE_RATE, subtype="FLOAT")
+
+    full = list(transcriber.iter_segments(audio))
+
+    monkeypatch.setattr(transcriber, "STREAM_MIN_S", 30)
+    monkeypatch.setattr(transcriber, "STREAM_WINDOW_S", 20)
+    monkeypatch.setattr(transcriber, "STREAM_OVERLAP_S", 3)
+    assert transcriber._should_stream(path)
+    windowed = list(transcriber.iter_segments(path))
+
+    assert len(full) > 10
+    assert transcriber.join_segments(windowed) == transcriber.join_segments(full)
+    assert [(s["start"], s["end"]) for s in windowed] == [(s["start"], s["end"]) for s in full]
+
+def test_native_files_decode_without_ffmpeg(tmp_path, monkeypatch):
+    import audio as audio_mod
+
+    def no_ffmpeg(*args, **kwargs):
+        raise AssertionError("ffmpeg should not be needed")
+
+    monkeypatch.setattr(audio_mod.subprocess, "run", no_ffmpeg)
+    audio = _speech_like(5)
+    path = str(tmp_path / "note.flac")
+    sf.write(path, np.stack([audio, audio], axis=1), SAMPLE_RATE)  # stereo is mixed down
+    decoded = audio_mod.decode_audio(path)
+    np.testing.assert_allclose(decoded, np.clip(audio, -1, 1), atol=1e-4)  # PCM_16
@@ -1,146 +1,100 @@
-    import os
-import queue
+import os
+import sys
 import threading
-import time
-import csv
-from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox
 
-import sounddevice as sd
-import soundfile as sf
-import speech_recognition as sr
-from transformers import pipeline
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+import metrics
+import models
+import grammar
+import summarizer
+from audio import SAMPLE_RATE
+from cache import hash_file
+from pipeline import run_overlapped, model_versions
+from recorder import Recorder
+from results import get_store
+from streaming import LiveTranscriber
+from transcriber import iter_segments
 
 # -----------------------------
 # CONFIG
 # -----------------------------
 AUDIO_DIR = "recordings"
 OUTPUT_DIR = "output"
-GRAMMAR_MODEL_PATH = "./grammar_model"   # your local grammar model folder
-SUMMARIZER_MODEL = "facebook/bart-large-cnn"
-SAMPLE_RATE = 16000
-CHANNELS = 1
+# Models come from the shared registry (or the inference server) like
+# the rest of the app; GRAMMAR_MODEL=./grammar_model uses a local folder
 
 os.makedirs(AUDIO_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-# -----------------------------
-# GLOBALS (pipelines loaded once)
-# -----------------------------
-print("Loading models (this may take a few seconds)...")
-try:
-    corrector = pipeline("text2text-generation", model=GRAMMAR_MODEL_PATH)
-except Exception as e:
-    corrector = None
-    print("Warning: grammar model failed to load:", e)
-
-try:
-    summarizer = pipeline("summarization", model=SUMMARIZER_MODEL)
-except Exception as e:
-    summarizer = None
-    print("Warning: summarizer failed to load:", e)
-
-recognizer = sr.Recognizer()
-
 # -----------------------------
 # AUDIO RECORDING HELPERS
 # -----------------------------
-_audio_thread = None
-_recording = False
-_filename = None
-
-def _record_to_file(filename, q, event):
-    """Stream from microphone and save to file using soundfile."""
-    with sf.SoundFile(filename, mode='x', samplerate=SAMPLE_RATE,
-                      channels=CHANNELS, subtype='PCM_16') as file:
-        def callback(indata, frames, time_info, status):
-            if status:
-                print("Recording status:", status)
-            file.write(indata.copy())
-            # stop if event set
-            if event.is_set():
-                raise sd.CallbackStop()
-
-        with sd.InputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, callback=callback):
-            while not event.is_set():
-                sd.sleep(100)  # small sleep to keep thread alive
-
-def start_recording(ui_update_callback=None):
-    global _audio_thread, _recording, _filename
-    if _recording:
+_recorder = None
+
+def start_recording(ui_update_callback=None, live=None):
+    """
+    Starts recording from the microphone to a compressed file in
+    AUDIO_DIR (see recorder.Recorder). If a LiveTranscriber is given,
+    audio is also fed to it as it arrives.
+    """
+    global _recorder
+    if _recorder is not None:
         return None
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = os.path.join(AUDIO_DIR, f"recording_{timestamp}.wav")
-    stop_event = threading.Event()
-    t = threading.Thread(target=_record_to_file, args=(filename, None, stop_event), daemon=True)
-    t._stop_event = stop_event
-    t.start()
-    _audio_thread = t
-    _recording = True
-    _filename = filename
+    _recorder = Recorder(live=live, sampling_rate=SAMPLE_RATE).start()
     if ui_update_callback:
         ui_update_callback("Recording started...")
-    return filename
+    return _recorder.path
 
 def stop_recording(ui_update_callback=None):
-    global _audio_thread, _recording, _filename
-    if not _recording or _audio_thread is None:
+    """Stops recording; returns (path, audio) as Recorder.stop does."""
+    global _recorder
+    if _recorder is None:
         return None
-    _audio_thread._stop_event.set()
-    _audio_thread.join()
-    fname = _filename
-    _audio_thread = None
-    _recording = False
-    _filename = None
+    recorder, _recorder = _recorder, None
+    fname, audio = recorder.stop()
     if ui_update_callback:
         ui_update_callback(f"Recording saved: {fname}")
-    return fname
+    return fname, audio
 
 # -----------------------------
 # TRANSCRIBE / PROCESS
 # -----------------------------
-def transcribe_file(filepath):
-    """Return raw transcript (using Google Web Speech via speech_recognition)."""
-    with sr.AudioFile(filepath) as source:
-        audio_data = recognizer.record(source)
-    # Using Google's free API (requires internet)
-    text = recognizer.recognize_google(audio_data)
-    return text
-
-def correct_text(text):
-    if corrector is None:
-        raise RuntimeError("Grammar corrector model not loaded.")
-    # Use prompt required by your local T5-style grammar model:
-    prompt = "fix: " + text
-    out = corrector(prompt, max_length=512)
-    return out[0]["generated_text"]
-
-def summarize_text(text):
-    if summarizer is None:
-        raise RuntimeError("Summarizer model not loaded.")
-    out = summarizer(text, max_length=60, min_length=10, do_sample=False)
-    return out[0]["summary_text"]
-
-def process_audio_file(filepath):
-    """Full pipeline for one file: transcribe -> correct -> summarize"""
-    raw = transcribe_file(filepath)
-    corrected = correct_text(raw)
-    summary = summarize_text(corrected)
-    return raw, corrected, summary
+def process_transcript(raw, timings=None):
+    """Second half of the pipeline: correct -> summarize"""
+    with metrics.stage("correct", timings):
+        corrected = grammar.correct_grammar(raw)
+    with metrics.stage("summarize", timings):
+        summary = summarizer.summarize_text(corrected)
+    metrics.write_textfile()
+    return corrected, summary
+
+def process_audio_file(filepath, timings=None, audio=None):
+    """
+    Full pipeline for one file: transcribe -> correct -> summarize.
+    Segments are corrected while Whisper is still transcribing the rest.
+    audio, the recording's samples if still in memory, saves decoding
+    the file again.
+    """
+    result = run_overlapped(iter_segments(filepath if audio is None else audio), timings=timings)
+    metrics.write_textfile()
+    return result["transcript"], result["corrected"], result["summary"]
 
 # -----------------------------
-# CSV SAVE
+# SAVE
 # -----------------------------
-def save_result_csv(original, corrected, summary, audio_path):
-    csv_path = os.path.join(OUTPUT_DIR, "voice_note_results.csv")
-    header_needed = not os.path.exists(csv_path)
-    with open(csv_path, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        if header_needed:
-            writer.writerow(["timestamp", "audio_file", "original", "corrected", "summary"])
-        writer.writerow([datetime.now().isoformat(), audio_path, original, corrected, summary])
-    return csv_path
+def save_result(original, corrected, summary, audio_path, timings=None):
+    """Stores the result in the shared results store and returns its path."""
+    store = get_store()
+    store.add(
+        audio_path=audio_path, source="desktop",
+        audio_hash=hash_file(audio_path) if audio_path and os.path.exists(audio_path) else None,
+        transcript=original, corrected=corrected, summary=summary,
+        models=model_versions(),
+        timings=timings,
+    )
+    return store.db_path
 
 # -----------------------------
 # TKINTER UI
@@ -168,9 +122,14 @@ class App(tk.Tk):
         self.process_btn = ttk.Button(btn_frame, text="Process (Transcribe → Correct → Summarize)", command=self.on_process, state=tk.DISABLED)
         self.process_btn.pack(side=tk.LEFT, padx=8)
 
-        self.open_csv_btn = ttk.Button(btn_frame, text="Open CSV folder", command=self.open_output_folder)
+        self.open_csv_btn = ttk.Button(btn_frame, text="Open output folder", command=self.open_output_folder)
         self.open_csv_btn.pack(side=tk.RIGHT)
 
+        # Live mode: transcribe while recording (local Whisper), then
+        # correct + summarize as soon as Stop is pressed
+        self.live_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(btn_frame, text="Live transcription", variable=self.live_var).pack(side=tk.RIGHT, padx=8)
+
         # Status
         self.status = tk.StringVar(value="Ready")
         ttk.Label(frm, textvariable=self.status).pack(fill=tk.X)
@@ -194,8 +153,10 @@ class App(tk.Tk):
         self.summary_text = tk.Text(result_frame, height=4, width=95)
         self.summary_text.grid(row=5, column=0, padx=4, pady=4)
 
-        # Keep last recorded file path
+        # Keep last recorded file path (and its samples while in memory)
         self.last_audio = None
+        self.last_samples = None
+        self.live = None
 
     # UI actions
     def on_record(self):
@@ -205,28 +166,35 @@ class App(tk.Tk):
             self.stop_btn.config(state=tk.NORMAL)
             self.process_btn.config(state=tk.DISABLED)
             self.status.set("Recording... Click Stop when finished.")
-            # start recording thread
-            threading.Thread(target=self._record_thread, daemon=True).start()
+            self.live = None
+            # Load the models in the background while the user is speaking
+            models.prewarm()
+            if self.live_var.get():
+                self.raw_text.delete("1.0", tk.END)
+                self.live = LiveTranscriber(on_text=self._append_raw)
+            start_recording(self._ui_update, live=self.live)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to start recording: {e}")
             self.record_btn.config(state=tk.NORMAL)
             self.stop_btn.config(state=tk.DISABLED)
 
-    def _record_thread(self):
-        fname = start_recording(self._ui_update)
-        # wait here while recording; start_recording returns immediately — stop via button
-        # Nothing else to do here.
-        return
-
     def on_stop(self):
         try:
             self.stop_btn.config(state=tk.DISABLED)
             self.record_btn.config(state=tk.NORMAL)
             saved = stop_recording(self._ui_update)
             if saved:
-                self.last_audio = saved
+                self.last_audio, self.last_samples = saved
+                if self.live is not None:
+                    # Most of the audio is already transcribed; finish the tail
+                    self.record_btn.config(state=tk.DISABLED)
+                    self.status.set("Finishing transcript...")
+                    threading.Thread(target=self._finish_live_thread, daemon=True,
+                                     args=(self.live, self.last_audio, self.last_samples)).start()
+                    self.live = None
+                    return
                 self.process_btn.config(state=tk.NORMAL)
-                self.status.set(f"Saved: {saved} — click Process to transcribe & summarize.")
+                self.status.set(f"Saved: {self.last_audio} — click Process to transcribe & summarize.")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to stop recording: {e}")
 
@@ -243,17 +211,11 @@ class App(tk.Tk):
 
     def _process_thread(self):
         try:
-            raw, corrected, summary = process_audio_file(self.last_audio)
-            # update UI (must be done in main thread)
-            self.after(0, lambda: self.raw_text.delete("1.0", tk.END))
-            self.after(0, lambda: self.raw_text.insert(tk.END, raw))
-            self.after(0, lambda: self.corrected_text.delete("1.0", tk.END))
-            self.after(0, lambda: self.corrected_text.insert(tk.END, corrected))
-            self.after(0, lambda: self.summary_text.delete("1.0", tk.END))
-            self.after(0, lambda: self.summary_text.insert(tk.END, summary))
-            csv_path = save_result_csv(raw, corrected, summary, self.last_audio)
-            self.after(0, lambda: self.status.set(f"Done. Saved results to {csv_path}"))
+            timings = {}
+            raw, corrected, summary = process_audio_file(self.last_audio, timings, self.last_samples)
+            self._show_results(raw, corrected, summary, timings)
         except Exception as e:
+            print("Processing error:", e)
             self.after(0, lambda: messagebox.showerror("Processing Error", str(e)))
             self.after(0, lambda: self.status.set("Error during processing."))
         finally:
@@ -261,6 +223,42 @@ class App(tk.Tk):
             self.after(0, lambda: self.record_btn.config(state=tk.NORMAL))
             self.after(0, lambda: self.stop_btn.config(state=tk.DISABLED))
 
+    def _append_raw(self, text):
+        self.after(0, lambda: self.raw_text.insert(tk.END, text + " "))
+
+    def _finish_live_thread(self, live, audio_path, samples):
+        try:
+            timings = {}
+            with metrics.stage("transcribe", timings):
+                raw = live.finish()
+            if live.complete:
+                corrected, summary = process_transcript(raw, timings)
+            else:
+                # The live transcript has gaps; the recording itself is whole
+                self._ui_update("Live transcription fell behind; transcribing the recording...")
+                timings = {}
+                raw, corrected, summary = process_audio_file(audio_path, timings, samples)
+            self._show_results(raw, corrected, summary, timings)
+        except Exception as e:
+            print("Processing error:", e)
+            self.after(0, lambda: messagebox.showerror("Processing Error", str(e)))
+            self.after(0, lambda: self.status.set("Error during processing."))
+        finally:
+            self.after(0, lambda: self.process_btn.config(state=tk.NORMAL))
+            self.after(0, lambda: self.record_btn.config(state=tk.NORMAL))
+
+    def _show_results(self, raw, corrected, summary, timings):
+        # update UI (must be done in main thread)
+        self.after(0, lambda: self.raw_text.delete("1.0", tk.END))
+        self.after(0, lambda: self.raw_text.insert(tk.END, raw))
+        self.after(0, lambda: self.corrected_text.delete("1.0", tk.END))
+        self.after(0, lambda: self.corrected_text.insert(tk.END, corrected))
+        self.after(0, lambda: self.summary_text.delete("1.0", tk.END))
+        self.after(0, lambda: self.summary_text.insert(tk.END, summary))
+        db_path = save_result(raw, corrected, summary, self.last_audio, timings)
+        breakdown = ", ".join(f"{k} {v['wall']:.1f}s" for k, v in timings.items())
+        self.after(0, lambda: self.status.set(f"Done ({breakdown}). Saved results to {db_path}"))
+
     def _ui_update(self, text):
         self.after(0, lambda: self.status.set(text))
 